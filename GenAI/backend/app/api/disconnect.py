@@ -0,0 +1,27 @@
+"""
+Cancelling request handlers whose client has gone away
+"""
+import asyncio
+import logging
+from fastapi import HTTPException, Request
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# How often a waiting request checks that its client is still connected
+DISCONNECT_POLL_SECONDS = 1.0
+
+async def cancel_on_disconnect(request: Request, awaitable):
+    """Await a handler's work, cancelling it (and its queued LLM calls) if the client goes away"""
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                logger.info("Client disconnected, cancelling its request")
+                task.cancel()
+                raise HTTPException(status_code=499, detail="Client closed request")
+    finally:
+        task.cancel()
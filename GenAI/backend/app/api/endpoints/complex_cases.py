@@ -1,27 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import Dict, Any
+import asyncio
+import os
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from typing import Dict, Any, Optional
 
-from app.database.database import get_db
+from app.api.disconnect import cancel_on_disconnect
+from app.database.database import db_session
 from app.models.insurance import InsuranceApplication
 from app.schemas.insurance import InsuranceApplicationCreate, InsuranceApplicationResponse
-from app.services.crewai_orchestration import process_complex_application_sync
+from app.services.crewai_orchestration import process_complex_application
 from app.services.ai_underwriting import UnderwritingRuleEngine
+from app.services.job_queue import job_queue
 
 router = APIRouter()
 
-@router.post("/complex-application/", response_model=Dict[str, Any], status_code=status.HTTP_201_CREATED)
-def process_complex_case(application: InsuranceApplicationCreate, db: Session = Depends(get_db)):
-    """
-    Process a complex insurance application using multiple AI agents
-    
-    This endpoint:
-    1. Takes the application data
-    2. Processes it through CrewAI orchestration
-    3. Stores the application with the decision in the database
-    """
-    # Process through CrewAI orchestration
-    application_data = {
+# Longest a GET /jobs/{job_id}?wait= request is held open
+JOB_LONG_POLL_MAX_SECONDS = float(os.getenv("JOB_LONG_POLL_MAX_SECONDS", "60"))
+
+def _application_data(application: InsuranceApplicationCreate) -> Dict[str, Any]:
+    """Application details passed to the agents"""
+    return {
         "applicant_name": application.applicant_name,
         "applicant_age": application.applicant_age,
         "email": application.email,
@@ -30,11 +28,14 @@ def process_complex_case(application: InsuranceApplicationCreate, db: Session =
         "risk_factors": application.risk_factors.dict(),
         "coverage_amount": application.coverage_amount
     }
+
+def _save_application(application: InsuranceApplicationCreate, crew_result: Dict[str, Any]) -> int:
+    """
+    Store the application with the crew's decision and return its id (blocking; run off the event loop)
     
-    # Process using CrewAI
-    crew_result = process_complex_application_sync(application_data)
-    
-    # Create database entry
+    Opens its own session, like job_queue.save_application_decision, so no
+    connection is held while the agents work.
+    """
     db_application = InsuranceApplication(
         applicant_name=application.applicant_name,
         applicant_age=application.applicant_age,
@@ -48,18 +49,88 @@ def process_complex_case(application: InsuranceApplicationCreate, db: Session =
         ai_recommendation=crew_result.get("recommendation", "")
     )
     
-    db.add(db_application)
-    db.commit()
-    db.refresh(db_application)
+    with db_session() as db:
+        db.add(db_application)
+        db.flush()
+        return db_application.id
+
+@router.post("/complex-application/", response_model=Dict[str, Any], status_code=status.HTTP_201_CREATED)
+async def process_complex_case(request: Request, application: InsuranceApplicationCreate):
+    """
+    Process a complex insurance application using multiple AI agents
+    
+    This endpoint:
+    1. Takes the application data
+    2. Processes it through CrewAI orchestration
+    3. Stores the application with the decision in the database
+    
+    The agents run on the event loop, so a request waiting on the model
+    holds no worker thread or database session; only the database write
+    uses the thread pool. If the client disconnects the agents are cancelled.
+    """
+    # Process using CrewAI
+    crew_result = await cancel_on_disconnect(request, process_complex_application(_application_data(application)))
+    
+    # Create database entry
+    application_id = await run_in_threadpool(_save_application, application, crew_result)
     
     # Return the CrewAI result together with the application ID
     result = {
-        "application_id": db_application.id,
+        "application_id": application_id,
         **crew_result
     }
     
     return result
 
+@router.post("/jobs/", response_model=Dict[str, Any], status_code=status.HTTP_202_ACCEPTED)
+async def submit_complex_case_job(
+    request: Request,
+    application: InsuranceApplicationCreate,
+    callback_url: Optional[str] = None
+):
+    """
+    Queue a complex insurance application for processing by the AI agents
+    
+    This endpoint:
+    1. Stores the application as pending
+    2. Queues it for the multi-agent workers and returns the job at once
+    3. Updates the application with the decision when the job finishes
+    
+    Follow the job with GET /jobs/{job_id}, optionally long-polling with
+    ?wait=seconds, or pass callback_url to have the finished job POSTed to it.
+    Callback hosts must be public, or listed in JOB_CALLBACK_ALLOWED_HOSTS.
+    """
+    if callback_url is not None:
+        try:
+            await asyncio.to_thread(job_queue.check_callback_url, callback_url)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    
+    application_id = await run_in_threadpool(_save_application, application, {})
+    job = await job_queue.submit(_application_data(application), application_id=application_id, callback_url=callback_url)
+    
+    return {
+        **job,
+        "status_url": str(request.url_for("get_complex_case_job", job_id=job["id"]))
+    }
+
+@router.get("/jobs/{job_id}", response_model=Dict[str, Any])
+async def get_complex_case_job(job_id: str, wait: float = 0):
+    """
+    Get the state of a complex application job
+    
+    With wait > 0 the request is held until the job finishes or wait
+    seconds (at most JOB_LONG_POLL_MAX_SECONDS) pass.
+    """
+    if wait > 0:
+        job = await job_queue.wait(job_id, min(wait, JOB_LONG_POLL_MAX_SECONDS))
+    else:
+        job = await asyncio.to_thread(job_queue.get, job_id)
+    
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Job {job_id} not found")
+    return job
+
 @router.post("/apply-underwriting-rules/", response_model=Dict[str, Any])
 def apply_underwriting_rules(application_data: Dict[str, Any]):
     """
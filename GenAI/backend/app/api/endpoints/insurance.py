@@ -1,6 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import json
+import logging
+import os
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
-from typing import List
+from typing import Any, Dict, List, Tuple
 
 from app.database.database import get_db
 from app.models.insurance import InsuranceApplication
@@ -10,11 +16,18 @@ from app.schemas.insurance import (
     PremiumCalculationRequest,
     PremiumCalculationResponse
 )
-from app.services.premium_calculator import calculate_premium
-from app.services.medical_risk_analysis import analyze_medical_risk
+from app.services.premium_calculator import calculate_premium, calculate_premium_quotes
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Number of batch items priced per threadpool hop before results are streamed
+BATCH_CHUNK_SIZE = 256
+
+# Largest batch accepted by /calculate-premium/batch
+PREMIUM_BATCH_MAX_ITEMS = int(os.getenv("PREMIUM_BATCH_MAX_ITEMS", "10000"))
+
 @router.post("/applications/", response_model=InsuranceApplicationResponse, status_code=status.HTTP_201_CREATED)
 def create_application(application: InsuranceApplicationCreate, db: Session = Depends(get_db)):
     # Calculate premium using AI
@@ -55,22 +68,126 @@ def get_application(application_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Application not found")
     return db_application
 
-@router.post("/calculate-premium/", response_model=PremiumCalculationResponse)
-def premium_calculation(request: PremiumCalculationRequest):
-    # Analyze medical risk
-    risk_analysis = analyze_medical_risk(request.medical_history.dict())
-    
-    # Calculate premium
+def _quote(request: PremiumCalculationRequest) -> Dict[str, Any]:
+    """Price a single validated request; repeated profiles are answered from the quote cache"""
     premium_data = calculate_premium({
         "applicant_age": request.applicant_age,
         "coverage_amount": request.coverage_amount,
         "medical_history": request.medical_history.dict(),
-        "risk_factors": request.risk_factors.dict(),
-        "risk_analysis": risk_analysis
+        "risk_factors": request.risk_factors.dict()
     })
     
     return {
         "premium_amount": premium_data["premium_amount"],
         "risk_assessment": premium_data["risk_assessment"],
-        "ai_recommendation": premium_data["ai_recommendation"]
-    } 
\ No newline at end of file
+        "ai_recommendation": premium_data["ai_recommendation"],
+        "factors": premium_data.get("factors", {})
+    }
+
+@router.post("/calculate-premium/", response_model=PremiumCalculationResponse)
+def premium_calculation(request: PremiumCalculationRequest):
+    return _quote(request)
+
+def _validate_batch(items: List[Any]) -> List[Any]:
+    """Validate every batch item, returning a request or an error entry for each"""
+    validated = []
+    for index, item in enumerate(items):
+        if isinstance(item, Exception):
+            validated.append({"index": index, "error": f"Invalid JSON: {item}"})
+            continue
+        try:
+            validated.append(PremiumCalculationRequest.model_validate(item))
+        except ValidationError as e:
+            validated.append({"index": index, "error": e.errors()})
+    return validated
+
+def _quote_batch(requests: List[PremiumCalculationRequest]) -> List[Dict[str, Any]]:
+    """Price many validated requests with the batch engine, sharing the quote cache with _quote"""
+    quotes = calculate_premium_quotes([
+        {
+            "applicant_age": request.applicant_age,
+            "coverage_amount": request.coverage_amount,
+            "medical_history": request.medical_history.dict(),
+            "risk_factors": request.risk_factors.dict()
+        }
+        for request in requests
+    ])
+    return [
+        {
+            "premium_amount": quote["premium_amount"],
+            "risk_assessment": quote["risk_assessment"],
+            "ai_recommendation": quote["ai_recommendation"],
+            "factors": quote.get("factors", {})
+        }
+        for quote in quotes
+    ]
+
+def _quote_chunk(chunk: List[Tuple[int, Any]]) -> List[str]:
+    """Price the valid items of a chunk, returning one NDJSON line per item in order"""
+    entries = {index: item for index, item in chunk if isinstance(item, dict)}
+    valid = [(index, item) for index, item in chunk if not isinstance(item, dict)]
+    if valid:
+        try:
+            quotes = _quote_batch([request for _, request in valid])
+        except Exception as e:
+            # Fall back to pricing one at a time so one bad item only fails itself
+            logger.error(f"Batch pricing failed, pricing items individually: {e}")
+            quotes = []
+            for index, request in valid:
+                try:
+                    quotes.append(_quote(request))
+                except Exception as item_error:
+                    quotes.append({"error": str(item_error)})
+        for (index, _), quote in zip(valid, quotes):
+            entries[index] = {"index": index, **quote}
+    return [json.dumps(entries[index], default=str) + "\n" for index, _ in chunk]
+
+def _parse_ndjson(body: bytes) -> List[Any]:
+    """Parse one JSON document per non-empty line, keeping parse errors in place"""
+    items = []
+    for line in body.splitlines():
+        if not line.strip():
+            continue
+        try:
+            items.append(json.loads(line))
+        except ValueError as e:
+            items.append(e)
+    return items
+
+@router.post("/calculate-premium/batch")
+async def premium_calculation_batch(request: Request):
+    """
+    Calculate premiums for many applicants in one request
+    
+    Accepts a JSON array of premium calculation requests, or one request per
+    line when sent as application/x-ndjson. Results are streamed back as
+    NDJSON in input order, each tagged with its index. Items that fail
+    validation or pricing get an "error" entry instead of failing the batch.
+    Batches larger than PREMIUM_BATCH_MAX_ITEMS are rejected with 413.
+    """
+    # The body is read up front; the streaming response owns receive() afterwards
+    if "ndjson" in request.headers.get("content-type", ""):
+        items = _parse_ndjson(await request.body())
+    else:
+        try:
+            items = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Request body must be a JSON array")
+        if not isinstance(items, list):
+            raise HTTPException(status_code=422, detail="Request body must be a JSON array")
+    if len(items) > PREMIUM_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch of {len(items)} items exceeds the limit of {PREMIUM_BATCH_MAX_ITEMS}"
+        )
+    
+    # Validate everything before the first result is sent
+    validated = await run_in_threadpool(_validate_batch, items)
+    
+    async def results():
+        for start in range(0, len(validated), BATCH_CHUNK_SIZE):
+            chunk = list(enumerate(validated[start:start + BATCH_CHUNK_SIZE], start))
+            for line in await run_in_threadpool(_quote_chunk, chunk):
+                yield line
+    
+    return StreamingResponse(results(), media_type="application/x-ndjson")
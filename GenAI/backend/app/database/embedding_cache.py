@@ -0,0 +1,204 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class EmbeddingCache:
+    """
+    Process-wide store of text embeddings
+
+    Vectors are keyed by model name and SHA-256 of the text and kept in an
+    in-memory LRU of read-only float32 arrays (4 bytes per dimension, about
+    1.5 KB for a 384-dimension model), bounded by both entry count and
+    max_bytes. With a path set they are also written to a SQLite file,
+    so they survive restarts and are shared between worker processes.
+    """
+    def __init__(self, maxsize: int = 10000, path: Optional[str] = None, max_bytes: int = 64 * 1024 * 1024):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.path = path
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with self._connection() as connection:
+                connection.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB)")
+
+    def _connection(self) -> sqlite3.Connection:
+        # SQLite connections can't be shared across threads
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            self._local.connection = connection
+        return connection
+
+    @staticmethod
+    def make_key(model_name: str, text: str) -> str:
+        return f"{model_name}:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+
+    @staticmethod
+    def _as_array(vector) -> np.ndarray:
+        array = np.array(vector, dtype=np.float32)
+        array.setflags(write=False)
+        return array
+
+    def _remember(self, key: str, vector: np.ndarray):
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._bytes -= previous.nbytes
+        self._memory[key] = vector
+        self._bytes += vector.nbytes
+        while self._memory and (len(self._memory) > self.maxsize or self._bytes > self.max_bytes):
+            _, evicted = self._memory.popitem(last=False)
+            self._bytes -= evicted.nbytes
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Look up cached vectors, checking memory first and then disk"""
+        found = {}
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+            self.hits += len(found)
+
+        missing = [key for key in keys if key not in found]
+        if missing and self.path:
+            rows = []
+            # Stay under SQLite's bound parameter limit
+            for start in range(0, len(missing), 500):
+                chunk = missing[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows.extend(self._connection().execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall())
+            with self._lock:
+                for key, blob in rows:
+                    vector = self._as_array(np.frombuffer(blob, dtype=np.float32))
+                    self._remember(key, vector)
+                    found[key] = vector
+                self.disk_hits += len(rows)
+
+        with self._lock:
+            self.misses += len(keys) - len(found)
+        return found
+
+    def set_many(self, items: Dict[str, Any]) -> Dict[str, np.ndarray]:
+        """Store newly computed vectors, returning them as the cached float32 arrays"""
+        arrays = {key: self._as_array(vector) for key, vector in items.items()}
+        with self._lock:
+            for key, vector in arrays.items():
+                self._remember(key, vector)
+
+        if self.path and arrays:
+            connection = self._connection()
+            with connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                    [(key, vector.tobytes()) for key, vector in arrays.items()]
+                )
+        return arrays
+
+    def clear(self):
+        """Drop the in-memory entries"""
+        with self._lock:
+            self._memory.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cache counters"""
+        with self._lock:
+            return {
+                "size": len(self._memory),
+                "maxsize": self.maxsize,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "path": self.path,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses
+            }
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that only runs the model for texts not seen before
+
+    Used as the Chroma embedding function, so repeated queries and
+    re-seeded documents skip the transformer forward pass.
+    """
+    def __init__(self, embeddings: Embeddings, model_name: str, cache: Optional[EmbeddingCache] = None):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.cache = cache or embedding_cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [EmbeddingCache.make_key(self.model_name, text) for text in texts]
+        found = self.cache.get_many(list(dict.fromkeys(keys)))
+
+        # Embed each distinct uncached text once, in a single batch
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            found.update(self.cache.set_many(dict(zip(missing.keys(), vectors))))
+
+        # Callers (Chroma, langchain) expect plain lists
+        return [found[key].tolist() for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = EmbeddingCache.make_key(f"{self.model_name}:query", text)
+        found = self.cache.get_many([key])
+        if key in found:
+            return found[key].tolist()
+
+        computed = self.cache.set_many({key: self.embeddings.embed_query(text)})
+        return computed[key].tolist()
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed many queries, running the model once for all uncached ones"""
+        keys = [EmbeddingCache.make_key(f"{self.model_name}:query", text) for text in texts]
+        found = self.cache.get_many(list(dict.fromkeys(keys)))
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        if len(missing) == 1:
+            # Keep single queries on the model's query path
+            (key, text), = missing.items()
+            computed = {key: self.embeddings.embed_query(text)}
+        elif missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+        else:
+            computed = {}
+        if computed:
+            found.update(self.cache.set_many(computed))
+
+        return [found[key].tolist() for key in keys]
+
+# Process-wide cache shared by every CachedEmbeddings instance
+embedding_cache = EmbeddingCache(
+    maxsize=int(os.getenv("EMBEDDING_CACHE_SIZE", "10000")),
+    max_bytes=int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    path=os.getenv("EMBEDDING_CACHE_PATH") or None
+)
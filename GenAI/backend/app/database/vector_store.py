@@ -1,15 +1,42 @@
 import os
+import time
+import uuid
+import asyncio
 import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from typing import List, Dict, Any, Optional
-import chromadb
-from chromadb.config import Settings
-from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Collection metadata key stamped with a fresh value on every write, so
+# retrieval caches in every process see changes made by any of them
+CONTENT_VERSION_KEY = "content_version"
+
+# Upper bound on embedding / Chroma calls running at once for the async API
+VECTOR_STORE_CONCURRENCY = int(os.getenv("VECTOR_STORE_CONCURRENCY", "4"))
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+def get_vector_store_executor() -> ThreadPoolExecutor:
+    """Bounded thread pool shared by the async vector store methods"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=max(1, VECTOR_STORE_CONCURRENCY),
+                    thread_name_prefix="vector-store"
+                )
+    return _executor
+
 class VectorStore:
     """
     Production-ready vector database implementation using ChromaDB
@@ -18,17 +45,26 @@ class VectorStore:
         """
         Initialize the vector store with HuggingFace embeddings
         """
+        # Imported here so that importing this module stays cheap
+        from langchain_chroma import Chroma
+        from langchain_huggingface import HuggingFaceEmbeddings
+        from .embedding_cache import CachedEmbeddings
+        
+        started = time.perf_counter()
         self.persist_directory = persist_directory
         self.collection_name = collection_name
         
         # Create persist directory if it doesn't exist
         os.makedirs(self.persist_directory, exist_ok=True)
         
-        # Initialize embedding model
+        # Initialize embedding model behind the process-wide embedding cache
         logger.info("Initializing embedding model")
-        self.embedding_model = HuggingFaceEmbeddings(
-            model_name="all-MiniLM-L6-v2",  # Lightweight but effective model
-            model_kwargs={"device": "cpu"}  # Use GPU if available: "cuda"
+        self.embedding_model = CachedEmbeddings(
+            HuggingFaceEmbeddings(
+                model_name=EMBEDDING_MODEL_NAME,  # Lightweight but effective model
+                model_kwargs={"device": "cpu"}  # Use GPU if available: "cuda"
+            ),
+            model_name=EMBEDDING_MODEL_NAME
         )
         
         # Initialize ChromaDB with persistent storage
@@ -38,7 +74,48 @@ class VectorStore:
             embedding_function=self.embedding_model,
             persist_directory=self.persist_directory
         )
-        logger.info("Vector store initialized")
+        self.init_seconds = time.perf_counter() - started
+        logger.info(f"Vector store initialized in {self.init_seconds:.2f}s")
+        
+        self._init_search_cache()
+    
+    def _init_search_cache(self):
+        # Retrieval cache keyed by (collection, query, k, collection version)
+        self.search_cache_size = int(os.getenv("RETRIEVAL_CACHE_SIZE", "256"))
+        self.search_cache_ttl = float(os.getenv("RETRIEVAL_CACHE_TTL_SECONDS", "3600"))
+        self._search_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._search_cache_lock = threading.Lock()
+        self.search_cache_hits = 0
+        self.search_cache_misses = 0
+    
+    def _collection_version(self) -> Optional[tuple]:
+        """
+        Version of the collection as stored by Chroma, or None if it can't be read
+        
+        Combines the collection id (new after a delete), the content stamp
+        written by add_documents and the document count (which also catches
+        writes made without the stamp).
+        """
+        try:
+            collection = self.db._client.get_collection(self.collection_name)
+            return (str(collection.id), (collection.metadata or {}).get(CONTENT_VERSION_KEY), collection.count())
+        except Exception as e:
+            logger.debug(f"Could not read collection version: {e}")
+            return None
+    
+    def _bump_version(self):
+        """Mark the collection as changed, dropping cached retrieval results here and in other processes"""
+        with self._search_cache_lock:
+            self._search_cache.clear()
+        try:
+            collection = self.db._client.get_collection(self.collection_name)
+            # Chroma rejects hnsw: settings in modify(); they live in the collection configuration
+            metadata = {key: value for key, value in (collection.metadata or {}).items() if not key.startswith("hnsw:")}
+            metadata[CONTENT_VERSION_KEY] = uuid.uuid4().hex
+            collection.modify(metadata=metadata)
+        except Exception as e:
+            # Deleted collections have nothing to stamp; the count still changes otherwise
+            logger.debug(f"Could not stamp collection version: {e}")
     
     def add_documents(self, texts: List[str], metadatas: Optional[List[Dict[str, Any]]] = None) -> List[str]:
         """
@@ -57,6 +134,9 @@ class VectorStore:
         except Exception as e:
             logger.error(f"Error adding documents to vector store: {e}")
             raise
+        finally:
+            # Even a failed add may have written part of the batch
+            self._bump_version()
     
     def similarity_search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
         """
@@ -86,6 +166,129 @@ class VectorStore:
             logger.error(f"Error during similarity search: {e}")
             raise
     
+    def similarity_search_batch(self, queries: List[str], k: int = 5) -> List[List[Dict[str, Any]]]:
+        """
+        Perform a similarity search for many queries at once
+        
+        All queries are embedded in one batched call and looked up with a
+        single multi-query Chroma request. langchain-chroma has no public
+        multi-query search, so this goes through its underlying Chroma
+        collection; if it is unset (deleted, or a langchain-chroma release
+        that no longer exposes it), each distinct query falls back to
+        similarity_search.
+        
+        Args:
+            queries: The search query texts
+            k: Number of results to return per query
+            
+        Returns:
+            One list of documents per query, in input order
+        """
+        if not queries:
+            return []
+        
+        logger.info(f"Performing batched similarity search for {len(queries)} queries")
+        try:
+            distinct = list(dict.fromkeys(queries))
+            # The _collection property raises ValueError once the collection is
+            # deleted, so read the attribute behind it
+            collection = getattr(self.db, "_chroma_collection", None)
+            if collection is None:
+                logger.warning("Chroma collection handle unavailable, searching one query at a time")
+                by_query = {query: self.similarity_search(query, k=k) for query in distinct}
+                return [[dict(result) for result in by_query[query]] for query in queries]
+            
+            if hasattr(self.embedding_model, "embed_queries"):
+                embeddings = self.embedding_model.embed_queries(distinct)
+            else:
+                embeddings = self.embedding_model.embed_documents(distinct)
+            
+            response = collection.query(
+                query_embeddings=embeddings,
+                n_results=k,
+                include=["documents", "metadatas", "distances"]
+            )
+            
+            by_query = {}
+            for query, documents, metadatas, distances in zip(
+                distinct, response["documents"], response["metadatas"], response["distances"]
+            ):
+                by_query[query] = [
+                    {
+                        "content": document,
+                        "metadata": metadata or {},
+                        "similarity": float(distance)
+                    }
+                    for document, metadata, distance in zip(documents, metadatas, distances)
+                ]
+            
+            return [[dict(result) for result in by_query[query]] for query in queries]
+        except Exception as e:
+            logger.error(f"Error during batched similarity search: {e}")
+            raise
+    
+    def cached_similarity_search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+        """
+        Similarity search that reuses results for repeated queries
+        
+        Results are cached until the collection changes, or until
+        RETRIEVAL_CACHE_TTL_SECONDS pass. The version is read from Chroma on
+        each call, so writes from other processes (a reseed, another worker)
+        invalidate it too; if it can't be read the search is not cached.
+        
+        Args:
+            query: The search query text
+            k: Number of results to return
+            
+        Returns:
+            List of documents with their content and metadata
+        """
+        version = self._collection_version()
+        if version is None:
+            return self.similarity_search(query, k=k)
+        
+        with self._search_cache_lock:
+            key = (self.collection_name, query, k, version)
+            entry = self._search_cache.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._search_cache.move_to_end(key)
+                self.search_cache_hits += 1
+                return [dict(result) for result in entry[1]]
+            self.search_cache_misses += 1
+        
+        results = self.similarity_search(query, k=k)
+        
+        # Skip storing if the collection changed while searching
+        if self._collection_version() != version:
+            return results
+        with self._search_cache_lock:
+            if self.search_cache_size > 0:
+                self._search_cache[key] = (time.monotonic() + self.search_cache_ttl, [dict(result) for result in results])
+                self._search_cache.move_to_end(key)
+                while len(self._search_cache) > self.search_cache_size:
+                    self._search_cache.popitem(last=False)
+        return results
+    
+    async def _run_in_executor(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_vector_store_executor(), partial(func, *args, **kwargs))
+    
+    async def aadd_documents(self, texts: List[str], metadatas: Optional[List[Dict[str, Any]]] = None) -> List[str]:
+        """Async add_documents; embedding and Chroma writes run on the vector store thread pool"""
+        return await self._run_in_executor(self.add_documents, texts, metadatas=metadatas)
+    
+    async def asimilarity_search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+        """Async similarity_search that does not block the event loop"""
+        return await self._run_in_executor(self.similarity_search, query, k=k)
+    
+    async def asimilarity_search_batch(self, queries: List[str], k: int = 5) -> List[List[Dict[str, Any]]]:
+        """Async similarity_search_batch that does not block the event loop"""
+        return await self._run_in_executor(self.similarity_search_batch, queries, k=k)
+    
+    async def acached_similarity_search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+        """Async cached_similarity_search that does not block the event loop"""
+        return await self._run_in_executor(self.cached_similarity_search, query, k=k)
+    
     def delete_collection(self):
         """Delete the entire collection"""
         logger.info(f"Deleting collection {self.collection_name}")
@@ -95,10 +298,33 @@ class VectorStore:
         except Exception as e:
             logger.error(f"Error deleting collection: {e}")
             raise
+        finally:
+            self._bump_version()
 
-# Create a singleton instance for global use
-vector_store = VectorStore()
+# Singleton instance, created on first use
+_vector_store: Optional[VectorStore] = None
+_vector_store_lock = threading.Lock()
 
 def get_vector_store() -> VectorStore:
-    """Dependency to get vector store instance"""
-    return vector_store 
\ No newline at end of file
+    """Dependency to get vector store instance, loading the embedding model and Chroma on first call"""
+    global _vector_store
+    if _vector_store is None:
+        with _vector_store_lock:
+            if _vector_store is None:
+                _vector_store = VectorStore()
+    return _vector_store
+
+async def aget_vector_store() -> VectorStore:
+    """Async get_vector_store; a first-time load runs on the vector store thread pool"""
+    if _vector_store is not None:
+        return _vector_store
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_vector_store_executor(), get_vector_store)
+
+def vector_store_status() -> Dict[str, Any]:
+    """Report whether the vector store has been loaded, without loading it"""
+    store = _vector_store
+    return {
+        "initialized": store is not None,
+        "init_seconds": round(store.init_seconds, 3) if store is not None else None
+    } 
\ No newline at end of file
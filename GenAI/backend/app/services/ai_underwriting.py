@@ -1,5 +1,5 @@
 import logging
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Tuple, AsyncIterator
 import json
 from .llm_service import get_llm_service, ResponseSchema
 
@@ -111,22 +111,7 @@ class UnderwritingRuleEngine:
 # Initialize the rule engine
 rule_engine = UnderwritingRuleEngine()
 
-async def evaluate_application_with_llm(application_data: Dict[str, Any]) -> Dict[str, Any]:
-    """
-    Evaluate an insurance application using DeepSeek-R1 LLM for enhanced decision making
-    
-    This combines rule-based logic with LLM-based analysis for better insights
-    """
-    logger.info("Evaluating application with AI underwriting logic using DeepSeek-R1")
-    
-    # First run the application through the rule engine for baseline decision
-    rule_evaluation = rule_engine.evaluate_application(application_data)
-    
-    # Prepare data for the LLM
-    simplified_rules = [{"name": rule["name"], "description": rule["description"]} 
-                        for rule in UNDERWRITING_RULES]
-    
-    prompt_template = """
+UNDERWRITING_PROMPT_TEMPLATE = """
     You are an expert insurance underwriter. Your task is to evaluate an insurance application 
     and provide a professional underwriting decision. 
     
@@ -151,71 +136,134 @@ async def evaluate_application_with_llm(application_data: Dict[str, Any]) -> Dic
     
     Think step by step through your evaluation process.
     """
+
+# Define output schemas for structured generation
+UNDERWRITING_OUTPUT_SCHEMAS = [
+    ResponseSchema(name="decision", description="The final underwriting decision: 'approve', 'refer', or 'decline'"),
+    ResponseSchema(name="reasoning", description="Detailed reasoning explaining the underwriting decision"),
+    ResponseSchema(name="premium_amount", description="If approved, the justified premium amount, otherwise null"),
+    ResponseSchema(name="special_conditions", description="Any special conditions or exclusions that should apply to the policy")
+]
+
+def _llm_input_variables(application_data: Dict[str, Any], rule_evaluation: Dict[str, Any]) -> Dict[str, Any]:
+    """Prepare data for the LLM"""
+    simplified_rules = [{"name": rule["name"], "description": rule["description"]} 
+                        for rule in UNDERWRITING_RULES]
+    
+    return {
+        "rule_evaluation": json.dumps(rule_evaluation, indent=2, sort_keys=True),
+        "rules": json.dumps(simplified_rules, indent=2),
+        "age": application_data.get("applicant_age", "Unknown"),
+        "coverage_amount": application_data.get("coverage_amount", 0),
+        "medical_history": json.dumps(application_data.get("medical_history", {}), indent=2, sort_keys=True),
+        "risk_factors": json.dumps(application_data.get("risk_factors", {}), indent=2, sort_keys=True),
+        "risk_score": application_data.get("risk_score", 0)
+    }
+
+def _combine_evaluations(
+    application_data: Dict[str, Any],
+    rule_evaluation: Dict[str, Any],
+    llm_evaluation: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Combine rule-based and LLM evaluations for final decision"""
+    premium = None
+    if llm_evaluation["decision"] == "approve":
+        premium = llm_evaluation.get("premium_amount")
     
-    # Define output schemas for structured generation
-    output_schemas = [
-        ResponseSchema(name="decision", description="The final underwriting decision: 'approve', 'refer', or 'decline'"),
-        ResponseSchema(name="reasoning", description="Detailed reasoning explaining the underwriting decision"),
-        ResponseSchema(name="premium_amount", description="If approved, the justified premium amount, otherwise null"),
-        ResponseSchema(name="special_conditions", description="Any special conditions or exclusions that should apply to the policy")
-    ]
+    # Prepare the final result combining both approaches
+    return {
+        "application_id": application_data.get("id", "unknown"),
+        "decision": llm_evaluation["decision"],
+        "premium_amount": premium,
+        "decision_factors": llm_evaluation["reasoning"],
+        "rule_engine_decision": rule_evaluation["decision"],
+        "rule_engine_factors": rule_evaluation["reasons"],
+        "special_conditions": llm_evaluation.get("special_conditions", []),
+        "requires_review": llm_evaluation["decision"] == "refer"
+    }
+
+def _rule_based_result(application_data: Dict[str, Any], rule_evaluation: Dict[str, Any], error: Exception) -> Dict[str, Any]:
+    """Fallback to rule-based decision if LLM fails"""
+    # Calculate basic premium if not declined
+    premium = None
+    if rule_evaluation["decision"] != "decline":
+        # Basic premium calculation
+        base_premium = application_data.get("coverage_amount", 100000) * 0.01
+        age_factor = 1.0 + (application_data.get("applicant_age", 40) / 100)
+        risk_factor = 1.0 + (application_data.get("risk_score", 0.3) * 2)
+        
+        premium = round(base_premium * age_factor * risk_factor, 2)
+    
+    return {
+        "application_id": application_data.get("id", "unknown"),
+        "decision": rule_evaluation["decision"],
+        "premium_amount": premium,
+        "decision_factors": rule_evaluation["reasons"],
+        "rule_engine_decision": rule_evaluation["decision"],
+        "rule_engine_factors": rule_evaluation["reasons"],
+        "special_conditions": [],
+        "requires_review": rule_evaluation["decision"] == "refer",
+        "error": f"LLM evaluation failed: {str(error)}"
+    }
+
+async def evaluate_application_with_llm(application_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Evaluate an insurance application using DeepSeek-R1 LLM for enhanced decision making
+    
+    This combines rule-based logic with LLM-based analysis for better insights
+    """
+    logger.info("Evaluating application with AI underwriting logic using DeepSeek-R1")
+    
+    # First run the application through the rule engine for baseline decision
+    rule_evaluation = rule_engine.evaluate_application(application_data)
     
     # Get service and generate structured output
     llm_service = get_llm_service()
     
     try:
         llm_evaluation = await llm_service.structured_generation(
-            input_variables={
-                "rule_evaluation": json.dumps(rule_evaluation, indent=2),
-                "rules": json.dumps(simplified_rules, indent=2),
-                "age": application_data.get("applicant_age", "Unknown"),
-                "coverage_amount": application_data.get("coverage_amount", 0),
-                "medical_history": json.dumps(application_data.get("medical_history", {}), indent=2),
-                "risk_factors": json.dumps(application_data.get("risk_factors", {}), indent=2),
-                "risk_score": application_data.get("risk_score", 0)
-            },
-            prompt_template=prompt_template,
-            output_schemas=output_schemas
+            input_variables=_llm_input_variables(application_data, rule_evaluation),
+            prompt_template=UNDERWRITING_PROMPT_TEMPLATE,
+            output_schemas=UNDERWRITING_OUTPUT_SCHEMAS
         )
-        
-        # Combine rule-based and LLM evaluations for final decision
-        premium = None
-        if llm_evaluation["decision"] == "approve":
-            premium = llm_evaluation.get("premium_amount")
-        
-        # Prepare the final result combining both approaches
-        return {
-            "application_id": application_data.get("id", "unknown"),
-            "decision": llm_evaluation["decision"],
-            "premium_amount": premium,
-            "decision_factors": llm_evaluation["reasoning"],
-            "rule_engine_decision": rule_evaluation["decision"],
-            "rule_engine_factors": rule_evaluation["reasons"],
-            "special_conditions": llm_evaluation.get("special_conditions", []),
-            "requires_review": llm_evaluation["decision"] == "refer"
-        }
+        return _combine_evaluations(application_data, rule_evaluation, llm_evaluation)
     except Exception as e:
         logger.error(f"Error in LLM evaluation: {e}")
-        # Fallback to rule-based decision if LLM fails
-        
-        # Calculate basic premium if not declined
-        premium = None
-        if rule_evaluation["decision"] != "decline":
-            # Basic premium calculation
-            base_premium = application_data.get("coverage_amount", 100000) * 0.01
-            age_factor = 1.0 + (application_data.get("applicant_age", 40) / 100)
-            risk_factor = 1.0 + (application_data.get("risk_score", 0.3) * 2)
-            
-            premium = round(base_premium * age_factor * risk_factor, 2)
-        
-        return {
-            "application_id": application_data.get("id", "unknown"),
-            "decision": rule_evaluation["decision"],
-            "premium_amount": premium,
-            "decision_factors": rule_evaluation["reasons"],
-            "rule_engine_decision": rule_evaluation["decision"],
-            "rule_engine_factors": rule_evaluation["reasons"],
-            "special_conditions": [],
-            "requires_review": rule_evaluation["decision"] == "refer",
-            "error": f"LLM evaluation failed: {str(e)}"
-        } 
\ No newline at end of file
+        return _rule_based_result(application_data, rule_evaluation, e)
+
+async def evaluate_application_with_llm_stream(application_data: Dict[str, Any]) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Streaming variant of evaluate_application_with_llm
+    
+    Yields (event, data) pairs: "progress" for each stage, "rule_evaluation",
+    the model's "reasoning" and "field" events as they are generated (so the
+    decision arrives before the rest of the answer), and finally "result"
+    with the same payload evaluate_application_with_llm returns.
+    """
+    logger.info("Streaming application evaluation with AI underwriting logic using DeepSeek-R1")
+    
+    yield "progress", {"stage": "rule_engine"}
+    rule_evaluation = rule_engine.evaluate_application(application_data)
+    yield "rule_evaluation", rule_evaluation
+    
+    yield "progress", {"stage": "llm_evaluation"}
+    llm_service = get_llm_service()
+    
+    try:
+        llm_evaluation = None
+        async for event, data in llm_service.stream_structured_generation(
+            input_variables=_llm_input_variables(application_data, rule_evaluation),
+            prompt_template=UNDERWRITING_PROMPT_TEMPLATE,
+            output_schemas=UNDERWRITING_OUTPUT_SCHEMAS
+        ):
+            if event == "result":
+                llm_evaluation = data
+            else:
+                yield event, data
+        result = _combine_evaluations(application_data, rule_evaluation, llm_evaluation)
+    except Exception as e:
+        logger.error(f"Error in streamed LLM evaluation: {e}")
+        yield "error", {"message": f"LLM evaluation failed: {str(e)}"}
+        result = _rule_based_result(application_data, rule_evaluation, e)
+    
+    yield "result", result
@@ -0,0 +1,64 @@
+import re
+from functools import lru_cache
+from typing import List
+
+# Condition risk classes
+CONDITION_CODE_NONE = 0
+CONDITION_CODE_MEDIUM = 1
+CONDITION_CODE_HIGH = 2
+
+class ConditionClassifier:
+    """
+    Precompiled keyword classifier for reported medical conditions
+
+    Each risk class is compiled once into a single regex alternation, so a
+    condition is classified in one scan of its text instead of one substring
+    check per keyword. Results are cached per normalized condition string.
+    A condition is high risk if it contains any high-risk keyword, otherwise
+    medium risk if it contains any medium-risk keyword.
+    """
+    def __init__(self, high_risk_conditions: List[str], medium_risk_conditions: List[str], cache_size: int = 4096):
+        self.high_risk_conditions = list(high_risk_conditions)
+        self.medium_risk_conditions = list(medium_risk_conditions)
+        self._high_pattern = self._compile(self.high_risk_conditions)
+        self._medium_pattern = self._compile(self.medium_risk_conditions)
+        self._classify_normalized = lru_cache(maxsize=cache_size)(self._match)
+
+    @staticmethod
+    def _compile(keywords: List[str]):
+        if not keywords:
+            return None
+        # Longest first so overlapping keywords prefer the most specific match
+        alternation = "|".join(re.escape(keyword.lower()) for keyword in sorted(keywords, key=len, reverse=True))
+        return re.compile(alternation)
+
+    def _match(self, condition: str) -> int:
+        if self._high_pattern is not None and self._high_pattern.search(condition):
+            return CONDITION_CODE_HIGH
+        if self._medium_pattern is not None and self._medium_pattern.search(condition):
+            return CONDITION_CODE_MEDIUM
+        return CONDITION_CODE_NONE
+
+    def classify(self, condition: str) -> int:
+        """Return the risk class code for a reported condition"""
+        return self._classify_normalized(condition.strip().lower())
+
+    def cache_info(self):
+        """Return hit/miss statistics for the classification cache"""
+        return self._classify_normalized.cache_info()
+
+    def cache_clear(self):
+        """Clear cached classifications"""
+        self._classify_normalized.cache_clear()
+
+# Keyword tables used by premium pricing
+PRICING_HIGH_RISK_CONDITIONS = ["diabetes", "heart disease", "cancer", "stroke", "hypertension"]
+PRICING_MEDIUM_RISK_CONDITIONS = ["asthma", "depression", "anxiety", "obesity"]
+
+# Keyword tables used by the risk analyst agent fallback
+RISK_ANALYST_HIGH_RISK_CONDITIONS = ["diabetes", "heart disease", "cancer", "stroke"]
+RISK_ANALYST_MEDIUM_RISK_CONDITIONS = ["hypertension", "asthma", "depression", "obesity"]
+
+# Shared classifier instances
+pricing_classifier = ConditionClassifier(PRICING_HIGH_RISK_CONDITIONS, PRICING_MEDIUM_RISK_CONDITIONS)
+risk_analyst_classifier = ConditionClassifier(RISK_ANALYST_HIGH_RISK_CONDITIONS, RISK_ANALYST_MEDIUM_RISK_CONDITIONS)
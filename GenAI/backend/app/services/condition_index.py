@@ -0,0 +1,184 @@
+from collections import defaultdict
+from typing import Dict, List, Any, Sequence
+import numpy as np
+
+# Longest n-gram stored in the substring index
+MAX_GRAM = 3
+
+EXACT_MATCH_SIMILARITY = 0.9
+PARTIAL_MATCH_SIMILARITY = 0.7
+
+_EMPTY = np.empty(0, dtype=np.int32)
+_EMPTY_CODES = np.empty(0, dtype=np.int64)
+
+def _intersect_sorted(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Intersection of two sorted unique arrays, without np.intersect1d's concatenate and sort"""
+    if not len(a) or not len(b):
+        return a[:0]
+    found = np.searchsorted(b, a)
+    found[found == len(b)] = 0
+    return a[b[found] == a]
+
+class ConditionIndex:
+    """
+    Immutable substring index over a medical condition catalogue
+
+    Gives the same results as comparing a query against every condition:
+    - exact match (0.9): the query contains the condition name, or the
+      condition name contains the query
+    - partial match (0.7): any word of the query occurs in the condition name
+
+    Condition names are normalized to lower case once at build time. Names
+    are looked up in three structures instead of scanned:
+    - a hash map of normalized name -> ids, probed with every window of the
+      query whose length is a catalogue name length ("condition in query")
+    - an n-gram index (1 to MAX_GRAM characters) of sorted id arrays,
+      intersected to find names containing a query or word ("query in
+      condition") up to MAX_GRAM characters long
+    - for longer text, a positional index of every MAX_GRAM-gram occurrence,
+      encoded as condition_id * stride + position. The text's grams at
+      offsets covering every character are looked up, shifted back by their
+      offset and intersected; a code left in every list is a position where
+      the whole text occurs, so no candidate needs a substring check
+    Ties keep catalogue order, as in the original linear scan.
+
+    Condition attributes are stored column-wise (risk scores in a float
+    array, text in flat lists) and result records are only built for the
+    conditions a search returns, so memory grows with the catalogue's data
+    rather than with one dict per condition.
+    """
+    def __init__(
+        self,
+        names: List[str],
+        risk_scores: Sequence[float],
+        descriptions: Sequence[str],
+        complications: Sequence[Sequence[str]],
+        version: Any = None
+    ):
+        self.names: List[str] = list(names)
+        self.risk_scores = np.asarray(risk_scores, dtype=np.float64)
+        self.descriptions: List[str] = list(descriptions)
+        self.complications: List[tuple] = [tuple(items) for items in complications]
+        self.keys: List[str] = [name.lower() for name in self.names]
+        self.version = version
+
+        by_key: Dict[str, List[int]] = defaultdict(list)
+        grams: Dict[str, List[int]] = defaultdict(list)
+        positions: Dict[str, List[int]] = defaultdict(list)
+        self._stride = max((len(key) for key in self.keys), default=0) + 1
+        for condition_id, key in enumerate(self.keys):
+            by_key[key].append(condition_id)
+            # Ids are appended in increasing order, so every posting list stays sorted
+            for gram in self._grams(key):
+                grams[gram].append(condition_id)
+            base = condition_id * self._stride
+            for start in range(len(key) - MAX_GRAM + 1):
+                positions[key[start:start + MAX_GRAM]].append(base + start)
+
+        self._by_key = {key: np.array(ids, dtype=np.int32) for key, ids in by_key.items()}
+        self._key_lengths = sorted({len(key) for key in self.keys})
+        self._gram_index = {gram: np.array(ids, dtype=np.int32) for gram, ids in grams.items()}
+        self._gram_positions = {gram: np.array(codes, dtype=np.int64) for gram, codes in positions.items()}
+        self._all_ids = np.arange(len(self.keys), dtype=np.int32)
+
+    @classmethod
+    def from_dict(cls, conditions: Dict[str, Dict[str, Any]], version: Any = None) -> "ConditionIndex":
+        """Build an index from a {name: {risk_score, description, complications}} mapping"""
+        return cls(
+            names=list(conditions),
+            risk_scores=[data["risk_score"] for data in conditions.values()],
+            descriptions=[data.get("description", "") for data in conditions.values()],
+            complications=[data.get("complications", []) for data in conditions.values()],
+            version=version
+        )
+
+    def record(self, condition_id: int) -> Dict[str, Any]:
+        """Condition data in the shape the catalogue dict used"""
+        return {
+            "risk_score": float(self.risk_scores[condition_id]),
+            "description": self.descriptions[condition_id],
+            "complications": list(self.complications[condition_id])
+        }
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @staticmethod
+    def _grams(key: str) -> set:
+        grams = set()
+        for size in range(1, MAX_GRAM + 1):
+            grams.update(key[i:i + size] for i in range(len(key) - size + 1))
+        return grams
+
+    def _containing(self, text: str) -> np.ndarray:
+        """Sorted ids of conditions whose normalized name contains text"""
+        if not text:
+            return self._all_ids
+
+        if len(text) > MAX_GRAM:
+            return self._containing_long(text)
+        # Every name's grams of up to MAX_GRAM characters are indexed, text included
+        return self._gram_index.get(text, _EMPTY)
+
+    def _containing_long(self, text: str) -> np.ndarray:
+        """_containing for text longer than MAX_GRAM, from the positional index"""
+        last = len(text) - MAX_GRAM
+        offsets = sorted(set(range(0, last, MAX_GRAM)) | {last})
+        # Shifting by the offset turns each occurrence into the text's start.
+        # The offset-0 list only holds real starts, so codes that a shift
+        # pushes into the previous name's range never survive the intersection.
+        postings = sorted(
+            (self._gram_positions.get(text[offset:offset + MAX_GRAM], _EMPTY_CODES) - offset for offset in offsets),
+            key=len
+        )
+
+        starts = postings[0]
+        for posting in postings[1:]:
+            if not len(starts):
+                return _EMPTY
+            starts = _intersect_sorted(starts, posting)
+        return np.unique(starts // self._stride).astype(np.int32)
+
+    def _contained_in(self, text: str) -> np.ndarray:
+        """Sorted ids of conditions whose normalized name occurs within text"""
+        matches = []
+        for length in self._key_lengths:
+            if length > len(text):
+                break
+            for start in range(len(text) - length + 1):
+                ids = self._by_key.get(text[start:start + length])
+                if ids is not None:
+                    matches.append(ids)
+        if not matches:
+            return _EMPTY
+        return np.unique(np.concatenate(matches))
+
+    def search(self, query: str, top_k: int = 3) -> List[Dict[str, Any]]:
+        """Search for conditions matching the query, best matches first"""
+        query = query.lower()
+
+        exact = np.union1d(self._containing(query), self._contained_in(query))
+        ranked = [(condition_id, EXACT_MATCH_SIMILARITY) for condition_id in exact[:top_k]]
+
+        # Partial matches are only needed when exact matches don't fill top_k
+        if len(ranked) < top_k:
+            # Only the lowest ids are returned and exact holds fewer than top_k,
+            # so each word's sorted matches can be cut down before the union
+            needed = top_k - len(ranked) + len(exact)
+            partial = _EMPTY
+            for word in set(query.split()):
+                partial = np.union1d(partial, self._containing(word)[:needed])
+            partial = np.setdiff1d(partial, exact, assume_unique=True)
+            ranked.extend(
+                (condition_id, PARTIAL_MATCH_SIMILARITY)
+                for condition_id in partial[:top_k - len(ranked)]
+            )
+
+        return [
+            {
+                "condition": self.names[condition_id],
+                "similarity": similarity,
+                "data": self.record(condition_id)
+            }
+            for condition_id, similarity in ranked
+        ]
@@ -1,34 +1,187 @@
 import logging
 import json
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Callable, Tuple, AsyncIterator
 import asyncio
-from .llm_service import get_llm_service, ResponseSchema
-from ..database.vector_store import get_vector_store
-from langchain_core.output_parsers.json import JsonOutputParser
+import threading
+from .llm_service import get_llm_service, compile_prompt, ResponseSchema
+from .condition_classifier import risk_analyst_classifier, CONDITION_CODE_HIGH, CONDITION_CODE_MEDIUM
+from ..database.vector_store import aget_vector_store
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Receives (event, data) pairs while a crew runs in streaming mode
+EventCallback = Callable[[str, Any], None]
+
+# Prompt templates and output schemas per agent role, fixed so that
+# LLMService.structured_generation can reuse their compiled prompts
+UNDERWRITER_PROMPT_TEMPLATE = """
+            You are {name}, an experienced insurance underwriter with the goal: {goal}.
+            
+            Your task is to evaluate an insurance application with the following details:
+            Applicant Age: {applicant_age}
+            Coverage Amount: ${coverage_amount}
+            Risk Score: {risk_score}
+            Medical History: {medical_history}
+            Risk Factors: {risk_factors}
+            
+            The risk analyst's assessment:
+            {risk_assessment}
+            
+            The medical expert's review:
+            {medical_review}
+            
+            Consider these relevant underwriting guidelines:
+            {guidelines}
+            
+            Based on the application details and guidelines, please determine:
+            1. Whether to approve, refer for further review, or decline the application
+            2. The reasoning behind your decision
+            3. If approved, calculate an appropriate premium amount
+            4. Any additional notes or concerns
+            
+            Think step by step through your underwriting process.
+            """
+
+UNDERWRITER_OUTPUT_SCHEMAS = [
+    ResponseSchema(name="decision", description="The underwriting decision: 'approve', 'refer', or 'decline'"),
+    ResponseSchema(name="reason", description="Detailed reasoning explaining the underwriting decision"),
+    ResponseSchema(name="premium_amount", description="If approved, the calculated premium amount"),
+    ResponseSchema(name="underwriting_notes", description="Additional notes about the underwriting decision")
+]
+
+RISK_ANALYST_PROMPT_TEMPLATE = """
+            You are {name}, a skilled risk assessment specialist with the goal: {goal}.
+            
+            Your task is to analyze the risk profile of an insurance applicant with the following details:
+            Applicant Age: {applicant_age}
+            Medical History: {medical_history}
+            Risk Factors: {risk_factors}
+            
+            Based on this information, please provide:
+            1. An overall risk score (0.0 to 1.0, where 1.0 is highest risk)
+            2. A detailed assessment of the applicant's risk profile
+            3. Breakdown of individual risk factors and their contributions
+            4. Additional notes or concerns about your analysis
+            
+            Consider both medical and lifestyle factors in your assessment.
+            """
+
+RISK_ANALYST_OUTPUT_SCHEMAS = [
+    ResponseSchema(name="risk_score", description="The overall risk score as a decimal between 0 and 1"),
+    ResponseSchema(name="risk_assessment", description="Detailed assessment of the applicant's risk profile"),
+    ResponseSchema(name="risk_factors", description="Breakdown of individual risk factors and their contributions"),
+    ResponseSchema(name="analysis_notes", description="Additional notes about the risk analysis")
+]
+
+MEDICAL_EXPERT_PROMPT_TEMPLATE = """
+            You are {name}, a medical expert with the goal: {goal}.
+            
+            Your task is to evaluate the medical information of an insurance applicant with the following details:
+            Applicant Age: {applicant_age}
+            Medical History: {medical_history}
+            
+            Based on this information, please provide:
+            1. An assessment of the consistency and completeness of the medical information
+            2. Medical recommendation for the underwriting process
+            3. Detailed notes about your medical evaluation
+            4. Recommended level of medical review (standard or detailed)
+            5. Whether underwriting should proceed, or the application should be declined on medical grounds alone
+            
+            Focus on identifying any inconsistencies, missing information, or concerning medical conditions.
+            """
+
+MEDICAL_EXPERT_OUTPUT_SCHEMAS = [
+    ResponseSchema(name="consistency_check", description="Assessment of the consistency of the medical information provided"),
+    ResponseSchema(name="recommendation", description="Medical recommendation based on the evaluation"),
+    ResponseSchema(name="notes", description="Detailed notes about the medical evaluation"),
+    ResponseSchema(name="review_level", description="Recommended level of medical review (standard or detailed)"),
+    ResponseSchema(name="medical_decision", description="'proceed' to continue underwriting, or 'decline' if the medical findings alone rule out cover")
+]
+
+# Template, output schemas and prompt variable names per agent role
+ROLE_PROMPTS: Dict[str, Tuple[str, List[ResponseSchema], Tuple[str, ...]]] = {
+    "underwriter": (
+        UNDERWRITER_PROMPT_TEMPLATE,
+        UNDERWRITER_OUTPUT_SCHEMAS,
+        ("name", "goal", "applicant_age", "coverage_amount", "risk_score", "medical_history",
+         "risk_factors", "risk_assessment", "medical_review", "guidelines")
+    ),
+    "risk_analyst": (
+        RISK_ANALYST_PROMPT_TEMPLATE,
+        RISK_ANALYST_OUTPUT_SCHEMAS,
+        ("name", "goal", "applicant_age", "medical_history", "risk_factors")
+    ),
+    "medical_expert": (
+        MEDICAL_EXPERT_PROMPT_TEMPLATE,
+        MEDICAL_EXPERT_OUTPUT_SCHEMAS,
+        ("name", "goal", "applicant_age", "medical_history")
+    )
+}
+
+def _as_float(*values: Any) -> Optional[float]:
+    """First of values that reads as a number (the model may answer "0.45" or 0.45)"""
+    for value in values:
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            continue
+    return None
+
 class Agent:
     """
     Production Agent class for CrewAI integration with DeepSeek-R1
     Represents a specialized AI agent with a specific role and goal
+    
+    Agents hold no per-request state: the role's prompt is compiled when
+    the agent is created and one instance serves every request (see
+    AgentRegistry).
     """
     def __init__(self, name: str, role: str, goal: str):
         self.name = name
         self.role = role
         self.goal = goal
         self.llm_service = get_llm_service()
-        self.vector_store = get_vector_store()
+        
+        self.prompt_template, self.output_schemas, variables = ROLE_PROMPTS.get(role, (None, [], ()))
+        self.compiled_prompt = compile_prompt(
+            self.prompt_template,
+            tuple((schema.name, schema.description) for schema in self.output_schemas),
+            tuple(sorted(variables))
+        ) if self.prompt_template else None
     
-    async def execute_task(self, task: str, context: Dict[str, Any]) -> Dict[str, Any]:
+    async def _generate(self, input_variables: Dict[str, Any], emit: Optional[EventCallback] = None) -> Dict[str, Any]:
+        """Run structured generation with the role's prompt, forwarding reasoning and fields to emit when streaming"""
+        if emit is None:
+            return await self.llm_service.structured_generation(
+                input_variables=input_variables,
+                prompt_template=self.prompt_template,
+                output_schemas=self.output_schemas,
+                compiled_prompt=self.compiled_prompt
+            )
+        
+        result = None
+        async for event, data in self.llm_service.stream_structured_generation(
+            input_variables=input_variables,
+            prompt_template=self.prompt_template,
+            output_schemas=self.output_schemas,
+            compiled_prompt=self.compiled_prompt
+        ):
+            if event == "result":
+                result = data
+            else:
+                emit(event, data)
+        return result
+    
+    async def execute_task(self, task: str, context: Dict[str, Any], emit: Optional[EventCallback] = None) -> Dict[str, Any]:
         """
         Execute a task using the DeepSeek-R1 model
         
         Args:
             task: Description of the task to perform
             context: Dictionary of context data needed for the task
+            emit: Optional callback receiving the model's streamed events
             
         Returns:
             Dictionary containing the task results
@@ -37,19 +190,21 @@ class Agent:
         
         # Route task to appropriate handler
         if self.role == "underwriter":
-            return await self._process_underwriter_task(task, context)
+            return await self._process_underwriter_task(task, context, emit)
         elif self.role == "risk_analyst":
-            return await self._process_risk_analyst_task(task, context)
+            return await self._process_risk_analyst_task(task, context, emit)
         elif self.role == "medical_expert":
-            return await self._process_medical_expert_task(task, context)
+            return await self._process_medical_expert_task(task, context, emit)
         else:
             return {"status": "error", "message": f"Unknown role: {self.role}"}
     
-    async def _process_underwriter_task(self, task: str, context: Dict[str, Any]) -> Dict[str, Any]:
+    async def _process_underwriter_task(self, task: str, context: Dict[str, Any], emit: Optional[EventCallback] = None) -> Dict[str, Any]:
         """Process tasks specific to the underwriter role"""
         if "evaluate_application" in task.lower():
-            # Fetch relevant underwriting guidelines from vector store
-            search_results = self.vector_store.similarity_search(
+            # Fetch relevant underwriting guidelines from vector store (cached between reseeds);
+            # the store itself is loaded on first use, off the event loop
+            vector_store = await aget_vector_store()
+            search_results = await vector_store.acached_similarity_search(
                 query="insurance underwriting guidelines for determining premium and eligibility",
                 k=3
             )
@@ -57,43 +212,29 @@ class Agent:
             # Extract relevant guidelines
             guidelines = "\n".join([result["content"] for result in search_results])
             
-            # Define output schema
-            output_schemas = [
-                ResponseSchema(name="decision", description="The underwriting decision: 'approve', 'refer', or 'decline'"),
-                ResponseSchema(name="reason", description="Detailed reasoning explaining the underwriting decision"),
-                ResponseSchema(name="premium_amount", description="If approved, the calculated premium amount"),
-                ResponseSchema(name="underwriting_notes", description="Additional notes about the underwriting decision")
-            ]
-            
-            # Create prompt
-            prompt = f"""
-            You are {self.name}, an experienced insurance underwriter with the goal: {self.goal}.
-            
-            Your task is to evaluate an insurance application with the following details:
-            Applicant Age: {context.get('applicant_age', 'Unknown')}
-            Coverage Amount: ${context.get('coverage_amount', 'Unknown')}
-            Risk Score: {context.get('risk_score', 'Unknown')}
-            Medical History: {json.dumps(context.get('medical_history', {}), indent=2)}
-            Risk Factors: {json.dumps(context.get('risk_factors', {}), indent=2)}
-            
-            Consider these relevant underwriting guidelines:
-            {guidelines}
-            
-            Based on the application details and guidelines, please determine:
-            1. Whether to approve, refer for further review, or decline the application
-            2. The reasoning behind your decision
-            3. If approved, calculate an appropriate premium amount
-            4. Any additional notes or concerns
-            
-            Think step by step through your underwriting process.
-            """
+            # Prefer the risk analyst's score over one supplied with the application
+            upstream = context.get("upstream", {})
+            risk_analysis = upstream.get("analyze_risk", {})
+            medical_review = upstream.get("evaluate_medical", {})
+            risk_score = _as_float(risk_analysis.get("risk_score"), context.get("risk_score"))
+            context = {**context, "risk_score": risk_score} if risk_score is not None else context
             
             try:
                 # Generate structured output using LLM
-                result = await self.llm_service.structured_generation(
-                    input_variables={},  # No variables needed since prompt is complete
-                    prompt_template=prompt,
-                    output_schemas=output_schemas
+                result = await self._generate(
+                    input_variables={
+                        "name": self.name,
+                        "goal": self.goal,
+                        "applicant_age": context.get('applicant_age', 'Unknown'),
+                        "coverage_amount": context.get('coverage_amount', 'Unknown'),
+                        "risk_score": context.get('risk_score', 'Unknown'),
+                        "medical_history": json.dumps(context.get('medical_history', {}), indent=2, sort_keys=True),
+                        "risk_factors": json.dumps(context.get('risk_factors', {}), indent=2, sort_keys=True),
+                        "risk_assessment": json.dumps(risk_analysis, indent=2, sort_keys=True, default=str) if risk_analysis else "Not available",
+                        "medical_review": json.dumps(medical_review, indent=2, sort_keys=True, default=str) if medical_review else "Not available",
+                        "guidelines": guidelines
+                    },
+                    emit=emit
                 )
                 
                 # Calculate premium if needed
@@ -146,41 +287,20 @@ class Agent:
             "underwriting_notes": f"Application evaluated by automated underwriting fallback. Risk score: {risk_score}."
         }
     
-    async def _process_risk_analyst_task(self, task: str, context: Dict[str, Any]) -> Dict[str, Any]:
+    async def _process_risk_analyst_task(self, task: str, context: Dict[str, Any], emit: Optional[EventCallback] = None) -> Dict[str, Any]:
         """Process tasks specific to the risk analyst role"""
         if "analyze_risk" in task.lower():
-            # Define output schema
-            output_schemas = [
-                ResponseSchema(name="risk_score", description="The overall risk score as a decimal between 0 and 1"),
-                ResponseSchema(name="risk_assessment", description="Detailed assessment of the applicant's risk profile"),
-                ResponseSchema(name="risk_factors", description="Breakdown of individual risk factors and their contributions"),
-                ResponseSchema(name="analysis_notes", description="Additional notes about the risk analysis")
-            ]
-            
-            # Create prompt
-            prompt = f"""
-            You are {self.name}, a skilled risk assessment specialist with the goal: {self.goal}.
-            
-            Your task is to analyze the risk profile of an insurance applicant with the following details:
-            Applicant Age: {context.get('applicant_age', 'Unknown')}
-            Medical History: {json.dumps(context.get('medical_history', {}), indent=2)}
-            Risk Factors: {json.dumps(context.get('risk_factors', {}), indent=2)}
-            
-            Based on this information, please provide:
-            1. An overall risk score (0.0 to 1.0, where 1.0 is highest risk)
-            2. A detailed assessment of the applicant's risk profile
-            3. Breakdown of individual risk factors and their contributions
-            4. Additional notes or concerns about your analysis
-            
-            Consider both medical and lifestyle factors in your assessment.
-            """
-            
             try:
                 # Generate structured output using LLM
-                return await self.llm_service.structured_generation(
-                    input_variables={},  # No variables needed since prompt is complete
-                    prompt_template=prompt,
-                    output_schemas=output_schemas
+                return await self._generate(
+                    input_variables={
+                        "name": self.name,
+                        "goal": self.goal,
+                        "applicant_age": context.get('applicant_age', 'Unknown'),
+                        "medical_history": json.dumps(context.get('medical_history', {}), indent=2, sort_keys=True),
+                        "risk_factors": json.dumps(context.get('risk_factors', {}), indent=2, sort_keys=True)
+                    },
+                    emit=emit
                 )
             except Exception as e:
                 logger.error(f"Error in risk analyst LLM evaluation: {e}")
@@ -196,16 +316,13 @@ class Agent:
         
         conditions = medical_history.get("conditions", [])
         
-        # Risk categories
-        high_risk_conditions = ["diabetes", "heart disease", "cancer", "stroke"]
-        medium_risk_conditions = ["hypertension", "asthma", "depression", "obesity"]
-        
         # Calculate condition risk
         condition_risk = 0.0
         for condition in conditions:
-            if any(hr in condition.lower() for hr in high_risk_conditions):
+            risk_class = risk_analyst_classifier.classify(condition)
+            if risk_class == CONDITION_CODE_HIGH:
                 condition_risk += 0.2
-            elif any(mr in condition.lower() for mr in medium_risk_conditions):
+            elif risk_class == CONDITION_CODE_MEDIUM:
                 condition_risk += 0.1
         
         # Calculate lifestyle risk
@@ -241,40 +358,19 @@ class Agent:
             "analysis_notes": "Automated risk analysis based on self-reported conditions and lifestyle factors"
         }
     
-    async def _process_medical_expert_task(self, task: str, context: Dict[str, Any]) -> Dict[str, Any]:
+    async def _process_medical_expert_task(self, task: str, context: Dict[str, Any], emit: Optional[EventCallback] = None) -> Dict[str, Any]:
         """Process tasks specific to the medical expert role"""
         if "evaluate_medical" in task.lower():
-            # Define output schema
-            output_schemas = [
-                ResponseSchema(name="consistency_check", description="Assessment of the consistency of the medical information provided"),
-                ResponseSchema(name="recommendation", description="Medical recommendation based on the evaluation"),
-                ResponseSchema(name="notes", description="Detailed notes about the medical evaluation"),
-                ResponseSchema(name="review_level", description="Recommended level of medical review (standard or detailed)")
-            ]
-            
-            # Create prompt
-            prompt = f"""
-            You are {self.name}, a medical expert with the goal: {self.goal}.
-            
-            Your task is to evaluate the medical information of an insurance applicant with the following details:
-            Applicant Age: {context.get('applicant_age', 'Unknown')}
-            Medical History: {json.dumps(context.get('medical_history', {}), indent=2)}
-            
-            Based on this information, please provide:
-            1. An assessment of the consistency and completeness of the medical information
-            2. Medical recommendation for the underwriting process
-            3. Detailed notes about your medical evaluation
-            4. Recommended level of medical review (standard or detailed)
-            
-            Focus on identifying any inconsistencies, missing information, or concerning medical conditions.
-            """
-            
             try:
                 # Generate structured output using LLM
-                return await self.llm_service.structured_generation(
-                    input_variables={},  # No variables needed since prompt is complete
-                    prompt_template=prompt,
-                    output_schemas=output_schemas
+                return await self._generate(
+                    input_variables={
+                        "name": self.name,
+                        "goal": self.goal,
+                        "applicant_age": context.get('applicant_age', 'Unknown'),
+                        "medical_history": json.dumps(context.get('medical_history', {}), indent=2, sort_keys=True)
+                    },
+                    emit=emit
                 )
             except Exception as e:
                 logger.error(f"Error in medical expert LLM evaluation: {e}")
@@ -329,43 +425,123 @@ class Agent:
             },
             "recommendation": recommendation,
             "notes": f"{age_notes} {medication_notes}".strip(),
-            "review_level": "detailed" if not age_appropriate or not medication_match else "standard"
+            "review_level": "detailed" if not age_appropriate or not medication_match else "standard",
+            "medical_decision": "proceed"
         }
 
 
+# Decides from upstream results whether a task should be skipped; returns the reason or None
+SkipCondition = Callable[[Dict[str, Any]], Optional[str]]
+
 class Crew:
     """
     Production-ready Crew class for orchestrating multiple agents
+    
+    Tasks form a dependency graph. Each task is a dict with:
+    - "agent": name (or role) of the agent that performs it
+    - "task": the action passed to Agent.execute_task
+    - "name": key of its result (defaults to "task")
+    - "depends_on": names of tasks that must finish first (optional)
+    - "skip_if": SkipCondition called with the upstream results (optional)
+    
+    Tasks whose dependencies are done run concurrently. A task sees its
+    dependencies' results in context["upstream"], keyed by task name. It is
+    skipped, without calling its agent, when skip_if returns a reason or
+    when a dependency failed or was skipped.
     """
     def __init__(self, agents: List[Agent], tasks: List[Dict[str, Any]]):
         self.agents = agents
         self.tasks = tasks
+        self._validate()
+        # Resolved once, so runs don't search the agent list
+        self._assignments = {self._task_name(task): self._find_agent(task) for task in tasks}
+    
+    @staticmethod
+    def _task_name(task: Dict[str, Any]) -> str:
+        return task.get("name") or task.get("task")
     
-    async def run(self, context: Dict[str, Any]) -> Dict[str, Any]:
+    def _validate(self):
+        """Reject unknown dependencies and cycles up front"""
+        names = [self._task_name(task) for task in self.tasks]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Duplicate task names: {names}")
+        
+        dependencies = {self._task_name(task): task.get("depends_on", []) for task in self.tasks}
+        for name, depends_on in dependencies.items():
+            unknown = [dependency for dependency in depends_on if dependency not in dependencies]
+            if unknown:
+                raise ValueError(f"Task {name} depends on unknown tasks: {unknown}")
+        
+        visiting, done = set(), set()
+        def visit(name: str):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Task dependencies form a cycle through {name}")
+            visiting.add(name)
+            for dependency in dependencies[name]:
+                visit(dependency)
+            visiting.discard(name)
+            done.add(name)
+        for name in dependencies:
+            visit(name)
+    
+    def _find_agent(self, task: Dict[str, Any]) -> Optional[Agent]:
+        wanted = task.get("agent")
+        return next((a for a in self.agents if wanted in (a.name, a.role)), None)
+    
+    async def run(self, context: Dict[str, Any], emit: Optional[EventCallback] = None) -> Dict[str, Any]:
         """
-        Run all tasks with the assigned agents asynchronously
+        Run the tasks in dependency order, independent tasks concurrently
         
         Args:
             context: Shared context for all agents
+            emit: Optional callback receiving task progress and model events
             
         Returns:
-            Dictionary of task results
+            Dictionary of task results, keyed by task name
         """
         logger.info("CrewAI Orchestration starting")
-        results = {}
-        
-        # Execute tasks asynchronously
-        tasks = []
-        for task in self.tasks:
-            agent = next((a for a in self.agents if a.role == task.get("role")), None)
-            if agent:
-                # Create task for asyncio.gather
-                tasks.append(self._execute_agent_task(agent, task, context, results))
+        results: Dict[str, Any] = {}
+        runs: Dict[str, asyncio.Task] = {}
+        
+        async def run_task(task: Dict[str, Any]):
+            name = self._task_name(task)
+            depends_on = task.get("depends_on", [])
+            if depends_on:
+                await asyncio.gather(*[runs[dependency] for dependency in depends_on])
+            upstream = {dependency: results[dependency] for dependency in depends_on}
+            
+            failed = [dependency for dependency in depends_on if upstream[dependency].get("status") in ("error", "skipped")]
+            if failed:
+                reason = f"Upstream task did not complete: {', '.join(failed)}"
             else:
-                logger.error(f"No agent found for role: {task.get('role')}")
+                skip_if = task.get("skip_if")
+                reason = skip_if(upstream) if skip_if else None
+            if reason:
+                logger.info(f"Skipping task {name}: {reason}")
+                results[name] = {"status": "skipped", "reason": reason}
+                if emit is not None:
+                    emit("progress", {"task": name, "status": "skipped", "reason": reason})
+                return
+            
+            agent = self._assignments[name]
+            if agent is None:
+                logger.error(f"No agent found for task {name}: {task.get('agent')}")
+                results[name] = {"status": "error", "message": f"No agent found: {task.get('agent')}"}
+                return
+            
+            task_context = {**context, "upstream": upstream} if depends_on else context
+            await self._execute_agent_task(agent, task, task_context, results, emit)
         
-        # Wait for all tasks to complete
-        await asyncio.gather(*tasks)
+        for task in self.tasks:
+            runs[self._task_name(task)] = asyncio.ensure_future(run_task(task))
+        try:
+            await asyncio.gather(*runs.values())
+        finally:
+            # Stop the remaining agents if the crew itself is cancelled
+            for run in runs.values():
+                run.cancel()
         
         return results
     
@@ -374,98 +550,205 @@ class Crew:
         agent: Agent, 
         task: Dict[str, Any], 
         context: Dict[str, Any],
-        results: Dict[str, Any]
+        results: Dict[str, Any],
+        emit: Optional[EventCallback] = None
     ):
         """Execute a single agent task and add result to results dict"""
+        name = self._task_name(task)
+        agent_emit = None
+        if emit is not None:
+            emit("progress", {"task": name, "agent": agent.name, "status": "started"})
+            # Tag the agent's model events with the task they belong to
+            agent_emit = lambda event, data: emit(
+                event, {"task": name, **data} if isinstance(data, dict) else {"task": name, "text": data}
+            )
+        
         try:
-            task_result = await agent.execute_task(task.get("description"), context)
-            results[task.get("name")] = task_result
+            task_result = await agent.execute_task(task.get("task"), context, agent_emit)
+            results[name] = task_result
         except Exception as e:
-            logger.error(f"Error executing task {task.get('name')}: {e}")
-            results[task.get("name")] = {"status": "error", "message": str(e)}
+            logger.error(f"Error executing task {name}: {e}")
+            results[name] = {"status": "error", "message": str(e)}
+        
+        if emit is not None:
+            emit("progress", {"task": name, "agent": agent.name, "status": "completed", "result": results[name]})
+
 
+def _declined_on_medical_grounds(upstream: Dict[str, Any]) -> Optional[str]:
+    """Skip underwriting when the medical expert has already ruled out cover"""
+    medical = upstream.get("evaluate_medical", {})
+    if str(medical.get("medical_decision", "")).strip().lower() == "decline":
+        return "Declined on medical grounds by the medical expert"
+    return None
 
-async def process_complex_application(application_data: Dict[str, Any]) -> Dict[str, Any]:
+# Risk analysis and medical review run in parallel; the underwriter decides on both
+COMPLEX_APPLICATION_TASKS = [
+    {
+        "name": "analyze_risk",
+        "agent": "Risk Analyzer",
+        "task": "analyze_risk",
+        "description": "Analyze the risk profile of the applicant"
+    },
+    {
+        "name": "evaluate_medical",
+        "agent": "Medical Expert",
+        "task": "evaluate_medical",
+        "description": "Evaluate the medical information provided"
+    },
+    {
+        "name": "evaluate_application",
+        "agent": "Underwriter",
+        "task": "evaluate_application",
+        "description": "Make final underwriting decision",
+        "depends_on": ["analyze_risk", "evaluate_medical"],
+        "skip_if": _declined_on_medical_grounds
+    }
+]
+
+# Name, role and goal of each agent in the complex-application crew
+AGENT_SPECS = [
+    ("Risk Analyzer", "risk_analyst", "Accurately assess risk profiles"),
+    ("Medical Expert", "medical_expert", "Evaluate medical information for consistency and risk"),
+    ("Underwriter", "underwriter", "Make appropriate underwriting decisions")
+]
+
+class AgentRegistry:
+    """
+    Long-lived agents and crew for complex applications
+    
+    Built once per worker process, so a request only allocates its own
+    context and result dicts instead of agents, compiled prompts, schemas
+    and a validated task graph.
+    """
+    def __init__(self, agents: Optional[List[Agent]] = None, tasks: Optional[List[Dict[str, Any]]] = None):
+        self.agents = agents if agents is not None else [Agent(name, role, goal) for name, role, goal in AGENT_SPECS]
+        self.crew = Crew(self.agents, tasks if tasks is not None else COMPLEX_APPLICATION_TASKS)
+    
+    def get(self, name: str) -> Optional[Agent]:
+        """Agent by name or role"""
+        return next((agent for agent in self.agents if name in (agent.name, agent.role)), None)
+
+# Singleton instance, created on first use
+_agent_registry: Optional[AgentRegistry] = None
+_agent_registry_lock = threading.Lock()
+
+def get_agent_registry() -> AgentRegistry:
+    """Get the process-wide agent registry"""
+    global _agent_registry
+    if _agent_registry is None:
+        with _agent_registry_lock:
+            if _agent_registry is None:
+                _agent_registry = AgentRegistry()
+    return _agent_registry
+
+def _summarize_crew_results(results: Dict[str, Any], application_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Overall decision from the agents' results, alongside the results themselves"""
+    risk = results.get("analyze_risk", {})
+    medical = results.get("evaluate_medical", {})
+    underwriting = results.get("evaluate_application", {})
+    
+    if underwriting.get("status") == "skipped" and _declined_on_medical_grounds({"evaluate_medical": medical}):
+        decision = "decline"
+        recommendation = medical.get("recommendation") or underwriting["reason"]
+    elif underwriting.get("status") in ("error", "skipped") or "decision" not in underwriting:
+        decision = "refer"
+        recommendation = "Underwriting did not complete. Please review manually."
+    else:
+        decision = str(underwriting["decision"]).strip().lower()
+        recommendation = underwriting.get("reason", "")
+    
+    premium = underwriting.get("premium_amount") if decision == "approve" else None
+    if isinstance(premium, str):
+        try:
+            # Try to convert string to number if needed
+            premium = float(premium.replace("$", "").replace(",", ""))
+        except ValueError:
+            # Fallback premium calculation
+            premium = application_data.get("coverage_amount", 100000) * 0.02
+    
+    return {
+        "approved": decision == "approve",
+        "decision": decision,
+        "premium_amount": premium,
+        "recommendation": recommendation,
+        "risk_score": _as_float(risk.get("risk_score")),
+        "requires_review": decision == "refer",
+        "agent_results": results
+    }
+
+async def process_complex_application(application_data: Dict[str, Any], emit: Optional[EventCallback] = None) -> Dict[str, Any]:
     """
     Process a complex insurance application using specialized AI agents
     
     Args:
         application_data: Dictionary containing application details
+        emit: Optional callback receiving task progress and model events
         
     Returns:
         Dictionary with processing results, recommendation, and premium
     """
     logger.info("Processing complex application with CrewAI orchestration")
     try:
-        # Create specialized agents
-        agents = [
-            Agent("Risk Analyzer", "risk_analyst", "Accurately assess risk profiles"),
-            Agent("Medical Expert", "medical_expert", "Evaluate medical information for consistency and risk"),
-            Agent("Underwriter", "underwriter", "Make appropriate underwriting decisions")
-        ]
-        
-        # Define tasks
-        tasks = [
-            {
-                "agent": "Risk Analyzer",
-                "task": "analyze_risk",
-                "description": "Analyze the risk profile of the applicant"
-            },
-            {
-                "agent": "Medical Expert",
-                "task": "evaluate_medical",
-                "description": "Evaluate the medical information provided"
-            },
-            {
-                "agent": "Underwriter",
-                "task": "evaluate_application",
-                "description": "Make final underwriting decision"
-            }
-        ]
-        
-        # Create and run crew
-        crew = Crew(agents, tasks)
-        result = await crew.run(application_data)
-        
-        # Ensure premium amount is a number if approved
-        if result.get("approved", False) and isinstance(result.get("premium_amount"), str):
-            try:
-                # Try to convert string to number if needed
-                result["premium_amount"] = float(result["premium_amount"].replace("$", "").replace(",", ""))
-            except:
-                # Fallback premium calculation
-                result["premium_amount"] = application_data.get("coverage_amount", 100000) * 0.02
+        # Run the shared crew of specialized agents
+        results = await get_agent_registry().crew.run(application_data, emit)
+        result = _summarize_crew_results(results, application_data)
         
-        logger.info(f"Complex application processing complete: {result}")
+        logger.info(f"Complex application processing complete: {result['decision']}")
         return result
     
     except Exception as e:
         logger.error(f"Error in complex application processing: {e}")
-        # Fallback response
+        # Fallback response, shaped like _summarize_crew_results and referred
+        # like ai_underwriting's rule-based fallback
         return {
             "approved": False,
+            "decision": "refer",
             "premium_amount": None,
             "recommendation": f"Application processing error: {str(e)}. Please review manually.",
             "risk_score": None,
+            "requires_review": True,
+            "agent_results": {},
             "error": str(e)
         }
 
-# Add a synchronous version for use in non-async endpoints
+async def process_complex_application_stream(application_data: Dict[str, Any]) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Streaming variant of process_complex_application
+    
+    Yields (event, data) pairs as the agents work: "progress" when each task
+    starts and completes, the agents' "reasoning" and "field" events tagged
+    with their task, and finally "result" with the same payload
+    process_complex_application returns.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    run = asyncio.create_task(
+        process_complex_application(application_data, emit=lambda event, data: queue.put_nowait((event, data)))
+    )
+    run.add_done_callback(lambda _: queue.put_nowait(None))
+    
+    try:
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            yield item
+        yield "result", run.result()
+    finally:
+        # Stop the agents if the client goes away mid-stream
+        run.cancel()
+
+# Synchronous entry point for scripts; request handlers await process_complex_application
 def process_complex_application_sync(application_data: Dict[str, Any]) -> Dict[str, Any]:
     """
     Synchronous wrapper for process_complex_application
     
+    Runs the crew on a fresh event loop and blocks the calling thread until
+    it finishes, so it must not be called from a running event loop.
+    
     Args:
         application_data: Dictionary containing application details
         
     Returns:
         Dictionary with processing results, recommendation, and premium
     """
-    try:
-        loop = asyncio.get_event_loop()
-    except RuntimeError:
-        # If no event loop is set for the current thread, create a new one
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-    
-    return loop.run_until_complete(process_complex_application(application_data)) 
\ No newline at end of file
+    return asyncio.run(process_complex_application(application_data))
@@ -0,0 +1,131 @@
+"""
+HTTP stand-in for the Ollama API, backed by FakeLLMBackend
+
+Point OLLAMA_HOST at it to exercise the real client path (langchain_ollama,
+HTTP, NDJSON streaming) without a model server:
+
+    python -m app.services.fake_ollama_server --port 11435
+
+Latency, token rate and error injection come from the FAKE_LLM_*
+environment variables, as for LLM_BACKEND=fake.
+"""
+import argparse
+import json
+import os
+import time
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from .llm_backends import FakeLLMBackend, FakeLLMError
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+def create_fake_ollama_app(backend: Optional[FakeLLMBackend] = None, model: Optional[str] = None) -> FastAPI:
+    """
+    Build an app serving /api/generate, /api/chat, /api/tags and /api/version
+
+    Args:
+        backend: Fake model to answer with; configured from the environment if omitted
+        model: Model name reported by /api/tags
+    """
+    backend = backend or FakeLLMBackend.from_env()
+    model = model or os.getenv("OLLAMA_MODEL", "deepseek-r1:32b")
+    app = FastAPI(title="Fake Ollama API")
+    app.state.backend = backend
+
+    def _final(model_name: str, started: float, eval_count: int, prompt: str) -> Dict[str, Any]:
+        total = int((time.perf_counter() - started) * 1e9)
+        return {
+            "model": model_name,
+            "created_at": _now(),
+            "done": True,
+            "done_reason": "stop",
+            "total_duration": total,
+            "load_duration": 0,
+            "prompt_eval_count": len(prompt.split()),
+            "prompt_eval_duration": 0,
+            "eval_count": eval_count,
+            "eval_duration": total
+        }
+
+    async def _respond(body: Dict[str, Any], prompt: str, chat: bool):
+        model_name = body.get("model", model)
+        started = time.perf_counter()
+        stream = backend.astream(prompt)
+
+        # Pull the first chunk before answering, so injected errors become an HTTP error like Ollama's
+        try:
+            first = await stream.__anext__()
+        except StopAsyncIteration:
+            first = None
+        except FakeLLMError as e:
+            return JSONResponse(status_code=500, content={"error": str(e)})
+
+        def _chunk(text: str) -> Dict[str, Any]:
+            content = {"message": {"role": "assistant", "content": text}} if chat else {"response": text}
+            return {"model": model_name, "created_at": _now(), **content, "done": False}
+
+        if not body.get("stream", True):
+            chunks = [] if first is None else [first] + [chunk async for chunk in stream]
+            final = _final(model_name, started, len(chunks), prompt)
+            text = "".join(chunks)
+            final.update({"message": {"role": "assistant", "content": text}} if chat else {"response": text})
+            return final
+
+        async def lines():
+            count = 0
+            if first is not None:
+                count += 1
+                yield json.dumps(_chunk(first)) + "\n"
+                async for chunk in stream:
+                    count += 1
+                    yield json.dumps(_chunk(chunk)) + "\n"
+            final = _final(model_name, started, count, prompt)
+            final.update({"message": {"role": "assistant", "content": ""}} if chat else {"response": ""})
+            yield json.dumps(final) + "\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    @app.post("/api/generate")
+    async def generate(request: Request):
+        body = await request.json()
+        return await _respond(body, body.get("prompt", ""), chat=False)
+
+    @app.post("/api/chat")
+    async def chat(request: Request):
+        body = await request.json()
+        prompt = "\n".join(message.get("content", "") for message in body.get("messages", []))
+        return await _respond(body, prompt, chat=True)
+
+    @app.get("/api/tags")
+    async def tags():
+        return {"models": [{
+            "name": model,
+            "model": model,
+            "modified_at": _now(),
+            "size": 0,
+            "digest": "fake",
+            "details": {"family": "fake", "parameter_size": "0B", "quantization_level": "none"}
+        }]}
+
+    @app.get("/api/version")
+    async def version():
+        return {"version": "0.0.0-fake"}
+
+    @app.get("/api/fake/stats")
+    async def stats():
+        return backend.stats()
+
+    return app
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve a fake Ollama API for load testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    args = parser.parse_args()
+
+    uvicorn.run(create_fake_ollama_app(), host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,403 @@
+import asyncio
+import ipaddress
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+import weakref
+from typing import Dict, Any, Awaitable, Callable, List, Optional
+from urllib.parse import urlparse
+from .llm_scheduler import PRIORITY_BATCH, llm_request_options
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+TERMINAL_STATUSES = (JOB_COMPLETED, JOB_FAILED)
+
+# Runs a job's payload and returns its result
+JobProcessor = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+# Stores a finished job's result against its application (blocking; run on a thread)
+ResultSaver = Callable[[int, Dict[str, Any]], None]
+
+def _default_processor(payload: Dict[str, Any]) -> Awaitable[Dict[str, Any]]:
+    from .crewai_orchestration import process_complex_application
+    return process_complex_application(payload)
+
+def save_application_decision(application_id: int, result: Dict[str, Any]):
+    """Write a complex-application result to its InsuranceApplication row"""
+    from ..database.database import db_session
+    from ..models.insurance import ApplicationStatus, InsuranceApplication
+
+    statuses = {"approve": ApplicationStatus.APPROVED, "decline": ApplicationStatus.DECLINED}
+    with db_session() as db:
+        application = db.query(InsuranceApplication).filter(InsuranceApplication.id == application_id).first()
+        if application is None:
+            logger.warning(f"Application {application_id} no longer exists, dropping its result")
+            return
+        application.premium_amount = result.get("premium_amount")
+        application.is_approved = result.get("approved", False)
+        application.ai_recommendation = result.get("recommendation", "")
+        application.status = statuses.get(result.get("decision"), ApplicationStatus.REVIEW)
+
+def check_callback_url(url: str, allowed_hosts: Optional[List[str]] = None):
+    """
+    Raise ValueError unless url is safe to POST a job result to (blocking)
+
+    The URL must be http(s). With allowed_hosts, its host must be one of
+    them; otherwise every address the host resolves to must be public, so
+    results can't be sent to loopback, link-local (cloud metadata) or
+    private-network services.
+    """
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        raise ValueError("callback_url must be an http(s) URL")
+
+    host = parsed.hostname.lower()
+    if allowed_hosts:
+        if host not in allowed_hosts:
+            raise ValueError(f"callback_url host {host} is not in JOB_CALLBACK_ALLOWED_HOSTS")
+        return
+
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, parsed.port or 443, proto=socket.IPPROTO_TCP)}
+    except (socket.gaierror, UnicodeError) as e:
+        raise ValueError(f"callback_url host {host} could not be resolved: {e}")
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split("%", 1)[0])
+        if not ip.is_global or ip.is_multicast:
+            raise ValueError(f"callback_url host {host} resolves to a non-public address")
+
+class JobQueue:
+    """
+    Persistent queue of complex-application jobs in a SQLite file
+
+    submit() stores a job and returns at once; a pool of worker tasks on the
+    server's event loop claims jobs, runs them at batch priority (so
+    interactive requests overtake them at the LLM scheduler), saves the
+    result to the job and its InsuranceApplication row, and POSTs the job
+    to its callback URL if one was given.
+
+    Callback URLs are checked with check_callback_url when the job is
+    submitted and again before every delivery.
+
+    Jobs survive restarts. A running job's worker renews its lease; a job
+    whose lease lapses (its process died) is claimed again, up to
+    max_attempts times. Several processes can share the file: claiming a
+    job is a single atomic UPDATE.
+    """
+    def __init__(
+        self,
+        path: str,
+        workers: int = 2,
+        poll_seconds: float = 2.0,
+        lease_seconds: float = 60.0,
+        max_attempts: int = 3,
+        job_timeout_seconds: float = 1800.0,
+        processor: Optional[JobProcessor] = None,
+        save_result: Optional[ResultSaver] = save_application_decision,
+        callback_allowed_hosts: Optional[List[str]] = None
+    ):
+        self.path = path
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.job_timeout_seconds = job_timeout_seconds
+        self.processor = processor or _default_processor
+        self.save_result = save_result
+        self.callback_allowed_hosts = [host.lower() for host in callback_allowed_hosts or []]
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._worker_id = uuid.uuid4().hex[:12]
+        self._tasks: List[asyncio.Task] = []
+        self._callbacks: set = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        # Events of jobs someone is long-polling; an entry goes away with its last waiter
+        self._finished: "weakref.WeakValueDictionary[str, asyncio.Event]" = weakref.WeakValueDictionary()
+
+        self.processed = 0
+        self.failed = 0
+        self.recovered = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        # SQLite connections can't be shared across threads; the file is
+        # created on first use rather than on import
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.row_factory = sqlite3.Row
+            with connection:
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS jobs ("
+                    "id TEXT PRIMARY KEY, status TEXT, payload TEXT, application_id INTEGER, "
+                    "callback_url TEXT, callback_status TEXT, result TEXT, error TEXT, attempts INTEGER, "
+                    "worker TEXT, lease_expires_at REAL, created_at REAL, started_at REAL, finished_at REAL)"
+                )
+                connection.execute("CREATE INDEX IF NOT EXISTS jobs_status_created_at ON jobs (status, created_at)")
+            self._local.connection = connection
+        return connection
+
+    @staticmethod
+    def _view(row: sqlite3.Row) -> Dict[str, Any]:
+        """Public representation of a job row"""
+        return {
+            "id": row["id"],
+            "status": row["status"],
+            "application_id": row["application_id"],
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "attempts": row["attempts"],
+            "callback_url": row["callback_url"],
+            "callback_status": row["callback_status"],
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"]
+        }
+
+    def enqueue(self, payload: Dict[str, Any], application_id: Optional[int] = None, callback_url: Optional[str] = None) -> Dict[str, Any]:
+        """Store a new job (blocking); use submit() from async code"""
+        job_id = uuid.uuid4().hex
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                "INSERT INTO jobs (id, status, payload, application_id, callback_url, attempts, created_at) "
+                "VALUES (?, ?, ?, ?, ?, 0, ?)",
+                (job_id, JOB_QUEUED, json.dumps(payload, default=str), application_id, callback_url, time.time())
+            )
+        return self.get(job_id)
+
+    async def submit(self, payload: Dict[str, Any], application_id: Optional[int] = None, callback_url: Optional[str] = None) -> Dict[str, Any]:
+        """Store a new job and wake an idle worker"""
+        job = await asyncio.to_thread(self.enqueue, payload, application_id, callback_url)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Current state of a job, or None if unknown"""
+        row = self._connection().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._view(row) if row is not None else None
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """Long-poll: return once the job finishes or timeout seconds pass"""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = await asyncio.to_thread(self.get, job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job["status"] in TERMINAL_STATUSES or remaining <= 0:
+                return job
+            # Woken at once if a worker in this process finishes the job; the
+            # poll interval covers jobs finished by other processes
+            finished = self._finished.setdefault(job_id, asyncio.Event())
+            try:
+                await asyncio.wait_for(finished.wait(), min(remaining, self.poll_seconds))
+            except asyncio.TimeoutError:
+                pass
+
+    def _claim(self) -> Optional[sqlite3.Row]:
+        """Atomically take the oldest queued job, or one whose worker's lease lapsed"""
+        now = time.time()
+        connection = self._connection()
+        with connection:
+            lost = connection.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? "
+                "WHERE status = ? AND lease_expires_at < ? AND attempts >= ?",
+                (JOB_FAILED, "Worker stopped before the job finished", now, JOB_RUNNING, now, self.max_attempts)
+            ).rowcount
+            # Each claim gets its own token, so a worker whose lease was taken
+            # over can tell, even when the new owner is in the same process
+            claim = f"{self._worker_id}-{uuid.uuid4().hex[:8]}"
+            row = connection.execute(
+                "UPDATE jobs SET status = ?, worker = ?, attempts = attempts + 1, started_at = ?, lease_expires_at = ? "
+                "WHERE id = (SELECT id FROM jobs WHERE status = ? OR (status = ? AND lease_expires_at < ?) "
+                "ORDER BY created_at LIMIT 1) "
+                "RETURNING *",
+                (JOB_RUNNING, claim, now, now + self.lease_seconds, JOB_QUEUED, JOB_RUNNING, now)
+            ).fetchone()
+        if row is not None and row["attempts"] > 1:
+            with self._lock:
+                self.recovered += 1
+            logger.warning(f"Re-running job {row['id']} (attempt {row['attempts']}) after its worker stopped")
+        if lost:
+            logger.error(f"{lost} job(s) failed after {self.max_attempts} attempts")
+        return row
+
+    def _renew_lease(self, job_id: str, claim: str) -> bool:
+        """Extend the lease; False if the job is no longer held by this claim"""
+        connection = self._connection()
+        with connection:
+            return connection.execute(
+                "UPDATE jobs SET lease_expires_at = ? WHERE id = ? AND worker = ? AND status = ?",
+                (time.time() + self.lease_seconds, job_id, claim, JOB_RUNNING)
+            ).rowcount > 0
+
+    def _finish(self, job_id: str, claim: str, status: str, result: Optional[Dict[str, Any]], error: Optional[str]) -> bool:
+        """Record the outcome; False (and nothing written) if another worker took the job over"""
+        connection = self._connection()
+        with connection:
+            return connection.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, lease_expires_at = NULL "
+                "WHERE id = ? AND worker = ? AND status = ?",
+                (status, json.dumps(result, default=str) if result is not None else None, error, time.time(),
+                 job_id, claim, JOB_RUNNING)
+            ).rowcount > 0
+
+    def _set_callback_status(self, job_id: str, callback_status: str):
+        connection = self._connection()
+        with connection:
+            connection.execute("UPDATE jobs SET callback_status = ? WHERE id = ?", (callback_status, job_id))
+
+    async def _keep_lease(self, job_id: str, claim: str):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                if not await asyncio.to_thread(self._renew_lease, job_id, claim):
+                    logger.warning(f"Lost the lease on job {job_id} to another worker; its result will be dropped")
+                    return
+            except Exception as e:
+                # A locked or briefly unavailable database must not let a healthy job's lease lapse
+                logger.error(f"Could not renew the lease on job {job_id}: {e}")
+
+    async def _run(self, row: sqlite3.Row):
+        job_id, claim = row["id"], row["worker"]
+        logger.info(f"Worker {claim} running job {job_id}")
+        lease = asyncio.create_task(self._keep_lease(job_id, claim))
+        result = None
+        try:
+            with llm_request_options(PRIORITY_BATCH, timeout=self.job_timeout_seconds):
+                result = await self.processor(json.loads(row["payload"]))
+            # A stale worker must not overwrite the result of the job's new owner
+            if not await asyncio.to_thread(self._renew_lease, job_id, claim):
+                logger.warning(f"Job {job_id} was taken over by another worker, dropping this result")
+                return
+            if row["application_id"] is not None and self.save_result is not None:
+                await asyncio.to_thread(self.save_result, row["application_id"], result)
+            status, error = (JOB_FAILED, result["error"]) if "error" in result else (JOB_COMPLETED, None)
+        except asyncio.CancelledError:
+            # Shutting down; the lapsed lease hands the job to the next worker
+            raise
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}")
+            status, error = JOB_FAILED, str(e)
+        finally:
+            lease.cancel()
+
+        if not await asyncio.to_thread(self._finish, job_id, claim, status, result, error):
+            logger.warning(f"Job {job_id} was taken over by another worker, dropping this result")
+            return
+        with self._lock:
+            if status == JOB_COMPLETED:
+                self.processed += 1
+            else:
+                self.failed += 1
+        finished = self._finished.pop(job_id, None)
+        if finished is not None:
+            finished.set()
+
+        if row["callback_url"]:
+            # Delivered in the background so a slow endpoint doesn't hold the worker
+            callback = asyncio.create_task(self._deliver_callback(job_id, row["callback_url"]))
+            self._callbacks.add(callback)
+            callback.add_done_callback(self._callbacks.discard)
+
+    def check_callback_url(self, url: str):
+        """Raise ValueError unless url is an acceptable callback (blocking; resolves the host)"""
+        check_callback_url(url, self.callback_allowed_hosts)
+
+    async def _post_callback(self, url: str, job: Dict[str, Any]):
+        import httpx
+
+        # Checked again at delivery: the host may resolve differently than at submission
+        await asyncio.to_thread(self.check_callback_url, url)
+        async with httpx.AsyncClient(timeout=10) as client:
+            response = await client.post(url, json=job)
+            response.raise_for_status()
+
+    async def _deliver_callback(self, job_id: str, url: str, attempts: int = 3):
+        job = await asyncio.to_thread(self.get, job_id)
+        for attempt in range(1, attempts + 1):
+            try:
+                await self._post_callback(url, job)
+                await asyncio.to_thread(self._set_callback_status, job_id, "delivered")
+                return
+            except Exception as e:
+                logger.warning(f"Callback for job {job_id} failed (attempt {attempt}): {e}")
+                if attempt < attempts:
+                    await asyncio.sleep(2 ** (attempt - 1))
+                else:
+                    await asyncio.to_thread(self._set_callback_status, job_id, f"failed: {e}")
+
+    async def _worker(self):
+        while True:
+            try:
+                row = await asyncio.to_thread(self._claim)
+            except Exception as e:
+                logger.error(f"Could not claim a job: {e}")
+                row = None
+            if row is not None:
+                try:
+                    await self._run(row)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    # The job's lease lapses and another worker retries it
+                    logger.error(f"Could not record the outcome of job {row['id']}: {e}")
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        """Start the worker tasks on the running event loop"""
+        if self._tasks or self.workers <= 0:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        logger.info(f"Started {self.workers} job worker(s) on {self.path}")
+
+    async def stop(self):
+        """Stop the workers; jobs they were running are picked up again after a restart"""
+        tasks, self._tasks = self._tasks + list(self._callbacks), []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._wakeup = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Return job counts by status and this process's worker counters"""
+        counts = {status: 0 for status in (JOB_QUEUED, JOB_RUNNING) + TERMINAL_STATUSES}
+        for status, count in self._connection().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"):
+            counts[status] = count
+        with self._lock:
+            return {
+                "path": self.path,
+                "workers": len(self._tasks),
+                "jobs": counts,
+                "processed": self.processed,
+                "failed": self.failed,
+                "recovered": self.recovered
+            }
+
+# Process-wide queue for complex applications
+job_queue = JobQueue(
+    path=os.getenv("JOB_QUEUE_PATH", "./jobs/jobs.sqlite3"),
+    workers=int(os.getenv("JOB_WORKERS", "2")),
+    poll_seconds=float(os.getenv("JOB_POLL_SECONDS", "2")),
+    lease_seconds=float(os.getenv("JOB_LEASE_SECONDS", "60")),
+    max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", "3")),
+    job_timeout_seconds=float(os.getenv("JOB_TIMEOUT_SECONDS", "1800")),
+    callback_allowed_hosts=[host.strip() for host in os.getenv("JOB_CALLBACK_ALLOWED_HOSTS", "").split(",") if host.strip()]
+)
@@ -0,0 +1,255 @@
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+import re
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Any, Callable, List, Optional, AsyncIterator
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class LLMBackend(ABC):
+    """
+    Interface LLMService expects from a model client
+
+    Matches the subset of langchain's LLM API the service uses, so
+    langchain_ollama.OllamaLLM can be used as a backend as it is.
+    """
+    @abstractmethod
+    async def ainvoke(self, prompt: str) -> str:
+        """Return the complete answer to a prompt"""
+
+    @abstractmethod
+    def astream(self, prompt: str) -> AsyncIterator[str]:
+        """Yield the answer to a prompt chunk by chunk"""
+
+    @abstractmethod
+    async def agenerate(self, prompts: List[str]):
+        """Answer several prompts; returns a langchain LLMResult"""
+
+class FakeLLMError(ConnectionError):
+    """Injected model server failure"""
+
+class LatencyDistribution:
+    """
+    Random delay before the first token, parsed from a spec string:
+    - "constant:S"
+    - "uniform:LOW,HIGH"
+    - "normal:MEAN,STDDEV" (clamped at zero)
+    - "lognormal:MEDIAN,SIGMA" (heavy right tail, like a loaded model server)
+    All values are in seconds.
+    """
+    KINDS = {"constant": 1, "uniform": 2, "normal": 2, "lognormal": 2}
+
+    def __init__(self, kind: str, params: List[float]):
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown latency distribution: {kind}")
+        if len(params) != self.KINDS[kind]:
+            raise ValueError(f"Latency distribution {kind} takes {self.KINDS[kind]} parameter(s)")
+        self.kind = kind
+        self.params = params
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyDistribution":
+        kind, _, params = spec.strip().partition(":")
+        return cls(kind.strip().lower(), [float(param) for param in params.split(",") if param.strip()])
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "constant":
+            return self.params[0]
+        if self.kind == "uniform":
+            return rng.uniform(*self.params)
+        if self.kind == "normal":
+            return max(0.0, rng.gauss(*self.params))
+        median, sigma = self.params
+        return rng.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+
+    def __repr__(self) -> str:
+        return f"{self.kind}:{','.join(str(param) for param in self.params)}"
+
+# The field list structured_generation appends to every prompt
+_OUTPUT_KEYS = re.compile(r"Return a JSON object with the following keys:\s*([^\n]+)")
+
+def default_responder(prompt: str, rng: random.Random) -> Dict[str, Any]:
+    """Plausible answer for the output keys a structured_generation prompt asks for"""
+    match = _OUTPUT_KEYS.search(prompt)
+    keys = [key.strip() for key in match.group(1).split(",")] if match else ["response"]
+    answer: Dict[str, Any] = {}
+    for key in keys:
+        if key == "decision":
+            answer[key] = rng.choices(["approve", "refer", "decline"], weights=[6, 3, 1])[0]
+        elif key == "risk_score":
+            answer[key] = round(rng.uniform(0.05, 0.9), 2)
+        elif key == "premium_amount":
+            answer[key] = round(rng.uniform(300, 5000), 2)
+        elif key == "medical_decision":
+            answer[key] = rng.choices(["proceed", "decline"], weights=[19, 1])[0]
+        elif key == "review_level":
+            answer[key] = rng.choice(["standard", "detailed"])
+        elif key == "risk_factors":
+            answer[key] = {"medical_risk": round(rng.uniform(0, 0.5), 2), "lifestyle_risk": round(rng.uniform(0, 0.4), 2)}
+        else:
+            answer[key] = f"Simulated {key.replace('_', ' ')}"
+    return answer
+
+class FakeLLMBackend(LLMBackend):
+    """
+    In-process stand-in for the model server, for load tests and CI
+
+    Each call waits a time-to-first-token drawn from latency, then emits
+    the answer at tokens_per_second (one token per whitespace-separated
+    word). The answer is optional <think> reasoning followed by JSON built
+    by responder from the keys the prompt asks for. error_rate and
+    malformed_rate inject FakeLLMError failures and unparseable answers.
+
+    Calls are deterministic for a given seed: the random draws for a prompt
+    depend only on the prompt and how many times it was seen before, not
+    on how concurrent calls interleave. Repeat counts are kept for the
+    PROMPT_HISTORY_SIZE most recently seen prompts, so a long load test
+    doesn't grow memory; a prompt that dropped out starts over at zero.
+    """
+    PROMPT_HISTORY_SIZE = 10000
+
+    def __init__(
+        self,
+        latency: Optional[LatencyDistribution] = None,
+        tokens_per_second: float = 0.0,
+        error_rate: float = 0.0,
+        malformed_rate: float = 0.0,
+        reasoning_tokens: int = 0,
+        seed: int = 0,
+        responder: Callable[[str, random.Random], Dict[str, Any]] = default_responder
+    ):
+        self.latency = latency or LatencyDistribution("constant", [0.0])
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.reasoning_tokens = reasoning_tokens
+        self.seed = seed
+        self.responder = responder
+
+        self._seen: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.malformed = 0
+        self.tokens = 0
+        self.active = 0
+        self.peak_active = 0
+
+    @classmethod
+    def from_env(cls) -> "FakeLLMBackend":
+        """Build a backend configured by the FAKE_LLM_* environment variables"""
+        backend = cls(
+            latency=LatencyDistribution.parse(os.getenv("FAKE_LLM_LATENCY", "lognormal:1.0,0.5")),
+            tokens_per_second=float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "40")),
+            error_rate=float(os.getenv("FAKE_LLM_ERROR_RATE", "0")),
+            malformed_rate=float(os.getenv("FAKE_LLM_MALFORMED_RATE", "0")),
+            reasoning_tokens=int(os.getenv("FAKE_LLM_REASONING_TOKENS", "64")),
+            seed=int(os.getenv("FAKE_LLM_SEED", "0"))
+        )
+        logger.info(
+            f"Using fake LLM backend: latency={backend.latency!r}, tokens_per_second={backend.tokens_per_second}, "
+            f"error_rate={backend.error_rate}, malformed_rate={backend.malformed_rate}"
+        )
+        return backend
+
+    def _rng(self, prompt: str) -> random.Random:
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        with self._lock:
+            occurrence = self._seen.get(digest, 0)
+            self._seen[digest] = occurrence + 1
+            self._seen.move_to_end(digest)
+            if len(self._seen) > self.PROMPT_HISTORY_SIZE:
+                self._seen.popitem(last=False)
+            self.calls += 1
+        return random.Random(f"{self.seed}:{digest}:{occurrence}")
+
+    def _plan(self, prompt: str):
+        """Draw one call's delay, failure and answer tokens"""
+        rng = self._rng(prompt)
+        delay = self.latency.sample(rng)
+        if rng.random() < self.error_rate:
+            return delay, None
+
+        if rng.random() < self.malformed_rate:
+            with self._lock:
+                self.malformed += 1
+            answer = "I am unable to produce a structured answer for this application."
+        else:
+            answer = "```json\n" + json.dumps(self.responder(prompt, rng), indent=2) + "\n```"
+        if self.reasoning_tokens:
+            reasoning = " ".join(rng.choice(("considering", "the", "applicant", "risk", "profile", "and", "guidelines"))
+                                 for _ in range(self.reasoning_tokens))
+            answer = f"<think>\n{reasoning}\n</think>\n\n{answer}"
+
+        # Whitespace stays attached to the token before it, so chunks join back to the answer
+        return delay, re.findall(r"\S+\s*|\s+", answer)
+
+    def _token_delay(self, count: int) -> float:
+        return count / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    @contextmanager
+    def _running(self):
+        with self._lock:
+            self.active += 1
+            self.peak_active = max(self.peak_active, self.active)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        delay, tokens = self._plan(prompt)
+        with self._running():
+            await asyncio.sleep(delay)
+            if tokens is None:
+                with self._lock:
+                    self.errors += 1
+                raise FakeLLMError("Injected model server error")
+            for token in tokens:
+                await asyncio.sleep(self._token_delay(1))
+                with self._lock:
+                    self.tokens += 1
+                yield token
+
+    async def ainvoke(self, prompt: str) -> str:
+        # One sleep for the whole answer keeps timer load low under heavy concurrency
+        delay, tokens = self._plan(prompt)
+        with self._running():
+            if tokens is None:
+                await asyncio.sleep(delay)
+                with self._lock:
+                    self.errors += 1
+                raise FakeLLMError("Injected model server error")
+            await asyncio.sleep(delay + self._token_delay(len(tokens)))
+            with self._lock:
+                self.tokens += len(tokens)
+            return "".join(tokens)
+
+    async def agenerate(self, prompts: List[str]):
+        from langchain_core.outputs import Generation, LLMResult
+
+        texts = await asyncio.gather(*[self.ainvoke(prompt) for prompt in prompts])
+        return LLMResult(generations=[[Generation(text=text)] for text in texts])
+
+    def stats(self) -> Dict[str, Any]:
+        """Return call counters"""
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "errors": self.errors,
+                "malformed": self.malformed,
+                "tokens": self.tokens,
+                "active": self.active,
+                "peak_active": self.peak_active
+            }
@@ -0,0 +1,144 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class LLMResponseCache:
+    """
+    Persistent cache of raw LLM responses in a SQLite file
+
+    Entries are keyed by model name, temperature and SHA-256 of the fully
+    rendered prompt, so identical requests are answered without calling the
+    model, across restarts and worker processes. Entries older than
+    ttl_seconds are ignored and purged; above maxsize the least recently
+    used entries are deleted.
+    """
+    def __init__(self, path: Optional[str], maxsize: int = 10000, ttl_seconds: float = 86400):
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path) and self.maxsize > 0
+
+    def _connection(self) -> sqlite3.Connection:
+        # SQLite connections can't be shared across threads; the file is
+        # created on first use rather than on import
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30)
+            with connection:
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS responses "
+                    "(key TEXT PRIMARY KEY, response TEXT, created_at REAL, accessed_at REAL)"
+                )
+                connection.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+            self._local.connection = connection
+        return connection
+
+    @staticmethod
+    def make_key(model_name: str, prompt: str, temperature: float, backend: str = "") -> str:
+        """Cache key for a prompt; backend identifies the client and server that answer it"""
+        prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        return f"{backend}|{model_name}:{float(temperature)}:{prompt_hash}"
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response, or None if missing or expired"""
+        if not self.enabled:
+            return None
+
+        now = time.time()
+        connection = self._connection()
+        with connection:
+            row = connection.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[1] + self.ttl_seconds < now:
+                connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                with self._lock:
+                    self.expirations += 1
+                row = None
+            if row is not None:
+                connection.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return row[0]
+
+    def set(self, key: str, response: str):
+        """Store a response, purging expired and least recently used entries"""
+        if not self.enabled:
+            return
+
+        now = time.time()
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, response, now, now)
+            )
+            expired = connection.execute(
+                "DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,)
+            ).rowcount
+            overflow = connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.maxsize
+            evicted = 0
+            if overflow > 0:
+                evicted = connection.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY accessed_at LIMIT ?)",
+                    (overflow,)
+                ).rowcount
+
+        with self._lock:
+            self.expirations += max(expired, 0)
+            self.evictions += max(evicted, 0)
+
+    def clear(self):
+        """Delete every cached response"""
+        if not self.path:
+            return
+        connection = self._connection()
+        with connection:
+            connection.execute("DELETE FROM responses")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cache counters"""
+        size = 0
+        if self.enabled:
+            size = self._connection().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "path": self.path,
+                "size": size,
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "expirations": self.expirations,
+                "evictions": self.evictions
+            }
+
+# Process-wide cache used by LLMService; an empty path disables it
+llm_response_cache = LLMResponseCache(
+    path=os.getenv("LLM_RESPONSE_CACHE_PATH", "./llm_cache/responses.sqlite3") or None,
+    maxsize=int(os.getenv("LLM_RESPONSE_CACHE_SIZE", "10000")),
+    ttl_seconds=float(os.getenv("LLM_RESPONSE_CACHE_TTL_SECONDS", "86400"))
+)
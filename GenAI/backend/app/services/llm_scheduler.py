@@ -0,0 +1,191 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, List, Optional, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Priority classes, lower runs first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_BATCH: "batch"}
+
+class LLMDeadlineExceeded(asyncio.TimeoutError):
+    """Raised when an LLM request's deadline passes before or while it runs"""
+
+# (priority, deadline) for LLM calls made in the current context; asyncio
+# tasks inherit it, so one setting covers every agent call of a request
+_request_options: ContextVar[Tuple[int, Optional[float]]] = ContextVar(
+    "llm_request_options", default=(PRIORITY_INTERACTIVE, None)
+)
+
+@contextmanager
+def llm_request_options(priority: int = PRIORITY_INTERACTIVE, timeout: Optional[float] = None):
+    """
+    Set the priority class and deadline for LLM calls made inside the block
+
+    Args:
+        priority: PRIORITY_INTERACTIVE or PRIORITY_BATCH
+        timeout: Seconds from now after which queued or running calls are cancelled
+    """
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    token = _request_options.set((priority, deadline))
+    try:
+        yield
+    finally:
+        _request_options.reset(token)
+
+def current_request_options() -> Tuple[int, Optional[float]]:
+    """Priority and deadline (time.monotonic) for LLM calls in the current context"""
+    return _request_options.get()
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "future", "state", "queued_at")
+
+    def __init__(self, priority: int, seq: int, future: asyncio.Future):
+        self.priority = priority
+        self.seq = seq
+        self.future = future
+        self.state = "waiting"
+        self.queued_at = time.monotonic()
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+class LLMScheduler:
+    """
+    Admission control for calls to the model server
+
+    At most max_concurrency calls run at once. Further calls wait in a
+    priority queue (interactive before batch, FIFO within a class) and a
+    freed slot is handed straight to the next waiter. A waiter whose
+    deadline passes or whose task is cancelled (for example because the
+    client disconnected) leaves the queue without ever reaching the model.
+
+    Calls may come from several event loops (the sync crew wrapper runs its
+    own), so state is guarded by a thread lock and waiters are woken on
+    their own loop.
+    """
+    def __init__(self, max_concurrency: int = 2):
+        self.max_concurrency = max(1, max_concurrency)
+        self._active = 0
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+        self.queued: Dict[int, int] = {priority: 0 for priority in PRIORITY_NAMES}
+        self.max_queue_depth = 0
+        self.admitted = 0
+        self.completed = 0
+        self.expired = 0
+        self.cancelled = 0
+        self._total_wait = 0.0
+
+    def _grant_next(self) -> bool:
+        """Hand the caller's slot to the next live waiter; returns False if none"""
+        while self._waiters:
+            waiter = heapq.heappop(self._waiters)
+            if waiter.state != "waiting":
+                continue
+            waiter.state = "granted"
+            self.queued[waiter.priority] -= 1
+            self.admitted += 1
+            self._total_wait += time.monotonic() - waiter.queued_at
+            future = waiter.future
+            future.get_loop().call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+            return True
+        return False
+
+    def _release(self):
+        with self._lock:
+            if not self._grant_next():
+                self._active -= 1
+
+    async def acquire(self, priority: int = PRIORITY_INTERACTIVE, deadline: Optional[float] = None):
+        """Wait for a slot; raises LLMDeadlineExceeded if the deadline passes first"""
+        with self._lock:
+            if deadline is not None and deadline <= time.monotonic():
+                self.expired += 1
+                raise LLMDeadlineExceeded("LLM request deadline passed before it was scheduled")
+            if self._active < self.max_concurrency and not sum(self.queued.values()):
+                self._active += 1
+                self.admitted += 1
+                return
+
+            waiter = _Waiter(priority, next(self._seq), asyncio.get_running_loop().create_future())
+            heapq.heappush(self._waiters, waiter)
+            self.queued[priority] = self.queued.get(priority, 0) + 1
+            self.max_queue_depth = max(self.max_queue_depth, sum(self.queued.values()))
+
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        try:
+            await asyncio.wait_for(waiter.future, timeout)
+        except BaseException as e:
+            with self._lock:
+                if waiter.state == "granted":
+                    # The slot arrived as we gave up; pass it on
+                    if not self._grant_next():
+                        self._active -= 1
+                else:
+                    waiter.state = "abandoned"
+                    self.queued[priority] -= 1
+                if isinstance(e, asyncio.TimeoutError):
+                    self.expired += 1
+                else:
+                    self.cancelled += 1
+            if isinstance(e, asyncio.TimeoutError):
+                raise LLMDeadlineExceeded("LLM request deadline passed while queued") from None
+            raise
+
+    @asynccontextmanager
+    async def slot(self, priority: Optional[int] = None, deadline: Optional[float] = None):
+        """
+        Hold a model slot for the duration of the block
+
+        Priority and deadline default to the current llm_request_options.
+        """
+        if priority is None:
+            priority, context_deadline = current_request_options()
+            deadline = deadline if deadline is not None else context_deadline
+        await self.acquire(priority, deadline)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.completed += 1
+            self._release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth and admission counters"""
+        with self._lock:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "active": self._active,
+                "queued": {PRIORITY_NAMES.get(priority, str(priority)): count for priority, count in self.queued.items()},
+                "max_queue_depth": self.max_queue_depth,
+                "admitted": self.admitted,
+                "completed": self.completed,
+                "expired": self.expired,
+                "cancelled": self.cancelled,
+                "average_wait_ms": round(1000 * self._total_wait / self.admitted, 2) if self.admitted else 0.0
+            }
+
+async def run_with_deadline(awaitable, deadline: Optional[float]):
+    """Await with the remaining time before deadline; raises LLMDeadlineExceeded on expiry"""
+    if deadline is None:
+        return await awaitable
+    try:
+        return await asyncio.wait_for(awaitable, max(0.0, deadline - time.monotonic()))
+    except asyncio.TimeoutError:
+        raise LLMDeadlineExceeded("LLM request deadline passed while the model was running") from None
+
+# Process-wide scheduler in front of the model server
+llm_scheduler = LLMScheduler(max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "2")))
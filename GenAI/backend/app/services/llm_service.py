@@ -1,12 +1,17 @@
+import asyncio
 import logging
 import os
-from typing import Dict, Any, List, Optional
-from langchain_core.language_models.llms import LLM
-from langchain_ollama import OllamaLLM
-from langchain.chains import LLMChain, SequentialChain
-from langchain_core.prompts import PromptTemplate
+import re
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, Any, Callable, List, Optional, Tuple, AsyncIterator
 from pydantic import BaseModel, Field
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import retry, retry_if_not_exception_type, stop_after_attempt, wait_exponential
+from .llm_response_cache import LLMResponseCache, llm_response_cache
+from .streaming_json import IncrementalJSONParser
+from .llm_scheduler import LLMDeadlineExceeded, current_request_options, llm_scheduler, run_with_deadline
+from .single_flight import SingleFlight
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -15,35 +20,153 @@ logger = logging.getLogger(__name__)
 # Model configuration
 OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
 MODEL_NAME = os.getenv("OLLAMA_MODEL", "deepseek-r1:32b")
+TEMPERATURE = 0.1  # Low temperature for more deterministic outputs
+
+# Deadline for LLM calls that don't set one through llm_request_options (0 disables it)
+LLM_REQUEST_TIMEOUT_SECONDS = float(os.getenv("LLM_REQUEST_TIMEOUT_SECONDS", "300"))
+
+# Reasoning that DeepSeek-R1 emits before its answer
+THINK_BLOCK = re.compile(r"<think>.*?</think>", re.DOTALL)
 
 # Define ResponseSchema class since it's not available in langchain_core 0.3.x
 class ResponseSchema(BaseModel):
     name: str = Field(description="The name of the field to be returned")
     description: str = Field(description="The description of the field to be returned")
 
+class CompiledPrompt:
+    """
+    Prompt template and JSON output parser for one template and schema set
+    
+    Built once and reused, so a structured_generation call only fills in
+    the variables and calls the model.
+    """
+    def __init__(self, prompt_template: str, output_schemas: Tuple[Tuple[str, str], ...], input_variables: Tuple[str, ...]):
+        from langchain_core.output_parsers.json import JsonOutputParser
+        from langchain_core.prompts import PromptTemplate
+        
+        format_instructions = f"""
+            Return a JSON object with the following keys:
+            {', '.join([name for name, _ in output_schemas])}
+            """
+        
+        self.output_parser = JsonOutputParser()
+        self.prompt = PromptTemplate(
+            template=prompt_template + "\n{format_instructions}\n",
+            input_variables=list(input_variables),
+            partial_variables={"format_instructions": format_instructions}
+        )
+    
+    def render(self, input_variables: Dict[str, Any]) -> str:
+        """Fill the template with the request's variables"""
+        return self.prompt.format(**input_variables)
+    
+    def parse(self, text: str) -> Dict[str, Any]:
+        """Parse the model's JSON answer, ignoring DeepSeek-R1's <think> block"""
+        return self.output_parser.parse(THINK_BLOCK.sub("", text))
+
+@lru_cache(maxsize=64)
+def compile_prompt(
+    prompt_template: str,
+    output_schemas: Tuple[Tuple[str, str], ...],
+    input_variables: Tuple[str, ...]
+) -> CompiledPrompt:
+    """Cached CompiledPrompt keyed by template, (name, description) schema pairs and variable names"""
+    return CompiledPrompt(prompt_template, output_schemas, input_variables)
+
+def _create_ollama_llm():
+    """Build the Ollama client; langchain_ollama is imported here to keep module import cheap"""
+    from langchain_ollama import OllamaLLM
+    
+    return OllamaLLM(
+        model=MODEL_NAME,
+        base_url=OLLAMA_HOST,
+        temperature=TEMPERATURE,
+        num_predict=2048,  # Maximum token length for predictions
+        keep_alive=-1,     # Keep model loaded indefinitely
+        repeat_penalty=1.1 # Slightly penalize repetition
+    )
+
+def _create_fake_llm():
+    """Build the in-process stand-in model configured by FAKE_LLM_* (see llm_backends)"""
+    from .llm_backends import FakeLLMBackend
+    
+    return FakeLLMBackend.from_env()
+
+# Model clients by LLM_BACKEND name; anything implementing llm_backends.LLMBackend can be registered
+LLM_BACKENDS: Dict[str, Callable[[], Any]] = {
+    "ollama": _create_ollama_llm,
+    "fake": _create_fake_llm
+}
+
+def _backend_identity() -> str:
+    """
+    Name and server of the selected backend, part of every response cache key
+    
+    Answers from the fake backend, or from an Ollama-compatible stand-in on
+    another host, must never be served once the service points at the real
+    model again.
+    """
+    name = os.getenv("LLM_BACKEND", "ollama").lower()
+    return f"{name}@{OLLAMA_HOST}" if name == "ollama" else name
+
+def _create_llm():
+    """Build the model client selected by LLM_BACKEND"""
+    name = os.getenv("LLM_BACKEND", "ollama").lower()
+    if name not in LLM_BACKENDS:
+        raise ValueError(f"Unknown LLM_BACKEND '{name}', expected one of: {', '.join(LLM_BACKENDS)}")
+    return LLM_BACKENDS[name]()
+
+def _call_options() -> Tuple[int, Optional[float]]:
+    """Priority and deadline for a model call made now"""
+    priority, deadline = current_request_options()
+    if deadline is None and LLM_REQUEST_TIMEOUT_SECONDS > 0:
+        deadline = time.monotonic() + LLM_REQUEST_TIMEOUT_SECONDS
+    return priority, deadline
+
+# Identical prompts in flight at the same time share one model call
+llm_inflight = SingleFlight()
+
+# Retrying an expired request would only add load
+_retry_policy = retry(
+    retry=retry_if_not_exception_type(LLMDeadlineExceeded),
+    stop=stop_after_attempt(3),
+    wait=wait_exponential(multiplier=1, min=1, max=10)
+)
+
 class LLMService:
     """
     Production-ready LLM service using DeepSeek-R1 via Ollama
+    
+    The model client (Ollama unless LLM_BACKEND selects another backend) is
+    created on first use, so importing or constructing the service does not
+    pull in langchain.
     """
     def __init__(self):
         """Initialize the LLM service with DeepSeek-R1 model"""
-        logger.info(f"Initializing LLM service with model: {MODEL_NAME}")
-        
-        try:
-            self.llm = OllamaLLM(
-                model=MODEL_NAME,
-                base_url=OLLAMA_HOST,
-                temperature=0.1,  # Low temperature for more deterministic outputs
-                num_predict=2048,  # Maximum token length for predictions
-                keep_alive=-1,     # Keep model loaded indefinitely
-                repeat_penalty=1.1 # Slightly penalize repetition
-            )
-            logger.info("LLM initialized successfully")
-        except Exception as e:
-            logger.error(f"Error initializing LLM: {e}")
-            raise
+        logger.info(f"Initializing LLM service with model: {MODEL_NAME} (backend: {os.getenv('LLM_BACKEND', 'ollama')})")
+        self._llm = None
+        self._llm_lock = threading.Lock()
+    
+    @property
+    def llm(self):
+        """The Ollama client, created on first access"""
+        if self._llm is None:
+            with self._llm_lock:
+                if self._llm is None:
+                    try:
+                        self._llm = _create_llm()
+                        logger.info("LLM initialized successfully")
+                    except Exception as e:
+                        logger.error(f"Error initializing LLM: {e}")
+                        raise
+        return self._llm
+    
+    def backend_stats(self) -> Optional[Dict[str, Any]]:
+        """Counters of the model client, if it has been created and keeps any"""
+        stats = getattr(self._llm, "stats", None)
+        return stats() if callable(stats) else None
     
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=1, max=10))
+    @_retry_policy
     async def generate_text(self, prompt: str, temperature: float = 0.1) -> str:
         """
         Generate text from the LLM using a simple prompt
@@ -57,17 +180,43 @@ class LLMService:
         """
         logger.info(f"Generating text with prompt: {prompt[:50]}...")
         try:
-            return await self.llm.agenerate([prompt])
+            priority, deadline = _call_options()
+            async with llm_scheduler.slot(priority, deadline):
+                return await run_with_deadline(self.llm.agenerate([prompt]), deadline)
         except Exception as e:
             logger.error(f"Error generating text: {e}")
             raise
     
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=1, max=10))
+    async def _invoke(self, prompt: str, priority: int, deadline: Optional[float]) -> str:
+        """Send a prompt to the model once a scheduler slot is free"""
+        async with llm_scheduler.slot(priority, deadline):
+            return await run_with_deadline(self.llm.ainvoke(prompt), deadline)
+    
+    def _prepare(
+        self,
+        input_variables: Dict[str, Any],
+        prompt_template: str,
+        output_schemas: List[ResponseSchema],
+        compiled: Optional[CompiledPrompt] = None
+    ) -> Tuple[CompiledPrompt, str, str]:
+        """Compiled prompt, rendered prompt text and response cache key for a request"""
+        if compiled is None:
+            compiled = compile_prompt(
+                prompt_template,
+                tuple((schema.name, schema.description) for schema in output_schemas),
+                tuple(sorted(input_variables))
+            )
+        prompt = compiled.render(input_variables)
+        return compiled, prompt, LLMResponseCache.make_key(MODEL_NAME, prompt, TEMPERATURE, _backend_identity())
+    
+    @_retry_policy
     async def structured_generation(
         self, 
         input_variables: Dict[str, Any],
         prompt_template: str,
-        output_schemas: List[ResponseSchema]
+        output_schemas: List[ResponseSchema],
+        use_cache: bool = True,
+        compiled_prompt: Optional[CompiledPrompt] = None
     ) -> Dict[str, Any]:
         """
         Generate structured output from the LLM
@@ -76,6 +225,10 @@ class LLMService:
             input_variables: Dictionary of variables to fill in the prompt template
             prompt_template: Template string with placeholders for variables
             output_schemas: List of ResponseSchema objects defining the expected output
+            use_cache: Reuse a stored answer for an identical rendered prompt;
+                pass False to always call the model (the answer is still stored)
+            compiled_prompt: compile_prompt() result for this template and schemas,
+                for callers that hold one; skips the compiled prompt lookup
             
         Returns:
             Structured output as a dictionary
@@ -83,38 +236,99 @@ class LLMService:
         logger.info(f"Generating structured output for input: {str(input_variables)[:50]}...")
         
         try:
-            # Updated implementation for structured output using newer API
-            from langchain_core.output_parsers import StructuredOutputParser as SOParser
-            from langchain_core.output_parsers.json import JsonOutputParser
+            compiled, prompt, cache_key = self._prepare(input_variables, prompt_template, output_schemas, compiled_prompt)
             
-            format_instructions = f"""
-            Return a JSON object with the following keys:
-            {', '.join([schema.name for schema in output_schemas])}
-            """
+            if use_cache:
+                text = await asyncio.to_thread(llm_response_cache.get, cache_key)
+                if text is not None:
+                    logger.info("Returning cached LLM response")
+                    return compiled.parse(text)
             
-            output_parser = JsonOutputParser()
-            
-            # Create prompt with format instructions
-            prompt = PromptTemplate(
-                template=prompt_template + "\n{format_instructions}\n",
-                input_variables=list(input_variables.keys()),
-                partial_variables={"format_instructions": format_instructions}
+            # Run the model on the rendered prompt, sharing the call with identical
+            # requests of the same priority class already in flight, and parse its
+            # JSON answer. An interactive request never joins a queued batch call.
+            # The shared call has no deadline of its own: each caller stops
+            # waiting at its own deadline, and the call is cancelled once every
+            # caller has gone.
+            priority, deadline = _call_options()
+            text = await run_with_deadline(
+                llm_inflight.do((cache_key, priority), lambda: self._invoke(prompt, priority, None)),
+                deadline
             )
+            result = compiled.parse(text)
             
-            # Setup chain
-            chain = LLMChain(llm=self.llm, prompt=prompt, output_parser=output_parser)
-            
-            # Run chain
-            result = await chain.ainvoke(input_variables)
-            
+            # Only answers that parsed are worth reusing
+            await asyncio.to_thread(llm_response_cache.set, cache_key, text)
             return result
         except Exception as e:
             logger.error(f"Error in structured generation: {e}")
             raise
 
-# Create a singleton instance for global use
-llm_service = LLMService()
+    async def stream_structured_generation(
+        self,
+        input_variables: Dict[str, Any],
+        prompt_template: str,
+        output_schemas: List[ResponseSchema],
+        use_cache: bool = True,
+        compiled_prompt: Optional[CompiledPrompt] = None
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Stream structured output from the LLM as it is generated
+        
+        Takes the same arguments as structured_generation and yields
+        (event, data) pairs:
+        - ("reasoning", text): the model's <think> output, chunk by chunk
+        - ("field", {"name": ..., "value": ...}): each top-level output field
+          as soon as its value is complete
+        - ("result", dict): the fully parsed output, always last
+        
+        A cached answer is replayed as field events followed by the result.
+        """
+        logger.info(f"Streaming structured output for input: {str(input_variables)[:50]}...")
+        compiled, prompt, cache_key = self._prepare(input_variables, prompt_template, output_schemas, compiled_prompt)
+        
+        if use_cache:
+            text = await asyncio.to_thread(llm_response_cache.get, cache_key)
+            if text is not None:
+                logger.info("Returning cached LLM response")
+                result = compiled.parse(text)
+                for name, value in result.items():
+                    yield "field", {"name": name, "value": value}
+                yield "result", result
+                return
+        
+        parser = IncrementalJSONParser()
+        chunks = []
+        priority, deadline = _call_options()
+        async with llm_scheduler.slot(priority, deadline):
+            stream = self.llm.astream(prompt).__aiter__()
+            while True:
+                try:
+                    chunk = await run_with_deadline(stream.__anext__(), deadline)
+                except StopAsyncIteration:
+                    break
+                chunks.append(chunk)
+                for event, data in parser.feed(chunk):
+                    if event == "field":
+                        name, value = data
+                        yield "field", {"name": name, "value": value}
+                    else:
+                        yield event, data
+        
+        text = "".join(chunks)
+        result = compiled.parse(text)
+        await asyncio.to_thread(llm_response_cache.set, cache_key, text)
+        yield "result", result
+
+# Singleton instance, created on first use
+_llm_service: Optional[LLMService] = None
+_llm_service_lock = threading.Lock()
 
 def get_llm_service() -> LLMService:
     """Dependency to get LLM service instance"""
-    return llm_service 
\ No newline at end of file
+    global _llm_service
+    if _llm_service is None:
+        with _llm_service_lock:
+            if _llm_service is None:
+                _llm_service = LLMService()
+    return _llm_service 
\ No newline at end of file
@@ -1,18 +1,56 @@
 import json
 import logging
-from typing import Dict, List, Any
+import os
+import threading
+from typing import Dict, List, Any, Sequence
+import numpy as np
+from sqlalchemy import func
+from .condition_index import ConditionIndex
+from .semantic_condition_matcher import SemanticConditionMatcher
+from ..database.database import SessionLocal
+from ..models.insurance import MedicalCondition
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Overall risk assessment labels
+NO_CONDITIONS_ASSESSMENT = "No medical conditions reported. Minimal risk."
+HIGH_RISK_ASSESSMENT = "High risk due to serious medical conditions."
+MODERATE_RISK_ASSESSMENT = "Moderate risk. Standard medical review recommended."
+LOW_RISK_ASSESSMENT = "Low risk. Routine underwriting sufficient."
+
+# Embedding fallback for conditions the substring index can't match
+SEMANTIC_CONDITION_MATCHING = os.getenv("SEMANTIC_CONDITION_MATCHING", "false").lower() == "true"
+SEMANTIC_MATCH_THRESHOLD = float(os.getenv("SEMANTIC_MATCH_THRESHOLD", "0.5"))
+CONDITION_EMBEDDING_DIR = os.getenv("CONDITION_EMBEDDING_DIR", "./vector_db/condition_embeddings")
+
 class VectorStore:
     """
     Simulated vector store for medical condition embeddings
     In a real implementation, this would use a proper vector database
     such as Pinecone, Weaviate, or FAISS
+    
+    The catalogue is served from an immutable in-memory snapshot. It starts
+    with the built-in conditions below and is replaced by the rows of the
+    MedicalCondition table once load_from_database() finds any, so searches
+    never query the database.
+    
+    With semantic matching enabled, queries that match no condition by name
+    (e.g. "high blood pressure") fall back to embedding similarity.
     """
-    def __init__(self):
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        semantic_matching: bool = SEMANTIC_CONDITION_MATCHING,
+        embeddings=None
+    ):
+        self.session_factory = session_factory
+        self.semantic_matching = semantic_matching
+        self.embeddings = embeddings
+        self._semantic_matcher = None
+        self._reload_lock = threading.Lock()
+        
         # Pre-defined medical conditions with risk scores
         self.medical_conditions = {
             "diabetes": {
@@ -66,31 +104,124 @@ class VectorStore:
                 "complications": ["anaphylaxis", "asthma"]
             }
         }
+        
+        # Build the lookup index once; search never scans the catalogue
+        self.index = ConditionIndex.from_dict(self.medical_conditions, version="builtin")
     
-    def search(self, query: str, top_k: int = 3) -> List[Dict[str, Any]]:
-        """Search for similar medical conditions"""
-        results = []
-        query = query.lower()
+    def _catalogue_version(self, db) -> tuple:
+        """Cheap fingerprint of the table that changes on any insert, update or delete"""
+        return tuple(db.query(
+            func.count(MedicalCondition.id),
+            func.max(MedicalCondition.id),
+            func.max(MedicalCondition.created_at),
+            func.max(MedicalCondition.updated_at)
+        ).one())
+    
+    def load_from_database(self, force: bool = False) -> bool:
+        """
+        Reload the catalogue snapshot from the MedicalCondition table
         
-        for condition, data in self.medical_conditions.items():
-            # Exact match
-            if query in condition or condition in query:
-                results.append({
-                    "condition": condition,
-                    "similarity": 0.9,
-                    "data": data
-                })
-            # Partial match
-            elif any(word in condition for word in query.split()):
-                results.append({
-                    "condition": condition,
-                    "similarity": 0.7,
-                    "data": data
-                })
+        Builds a new index off to the side and swaps it in with a single
+        assignment, so concurrent searches see either the old or the new
+        snapshot. Does nothing if the table hasn't changed since the last load.
         
-        # Sort by similarity and return top_k
-        results.sort(key=lambda x: x["similarity"], reverse=True)
-        return results[:top_k]
+        Args:
+            force: Rebuild even if the table fingerprint is unchanged
+            
+        Returns:
+            True if a new snapshot was installed
+        """
+        with self._reload_lock:
+            db = self.session_factory()
+            try:
+                version = self._catalogue_version(db)
+                if not force and version == self.index.version:
+                    return False
+                if version[0] == 0:
+                    # Keep serving the built-in catalogue until the table is populated
+                    if self.index.version == "builtin":
+                        return False
+                    index = ConditionIndex.from_dict(self.medical_conditions, version="builtin")
+                else:
+                    names, risk_scores, descriptions = [], [], []
+                    rows = (
+                        db.query(MedicalCondition.name, MedicalCondition.base_risk_score, MedicalCondition.description)
+                        .order_by(MedicalCondition.id)
+                        .yield_per(1000)
+                    )
+                    for name, risk_score, description in rows:
+                        if not name:
+                            continue
+                        names.append(name)
+                        risk_scores.append(risk_score or 0.0)
+                        descriptions.append(description or "")
+                    index = ConditionIndex(names, risk_scores, descriptions, [()] * len(names), version=version)
+            finally:
+                db.close()
+            
+            # The new snapshot's embeddings are ready before it serves searches;
+            # each matcher carries its own index, so results stay consistent
+            # while the two assignments happen
+            self._semantic_matcher = self._build_semantic_matcher(index)
+            self.index = index
+            logger.info(f"Loaded medical condition catalogue snapshot with {len(index)} conditions")
+            if self._semantic_matcher is not None:
+                self._semantic_matcher.remove_stale_matrices()
+            return True
+    
+    def _build_semantic_matcher(self, index: ConditionIndex):
+        """Matcher with its catalogue matrix loaded, or None if disabled or embedding failed"""
+        if not self.semantic_matching:
+            return None
+        try:
+            return SemanticConditionMatcher(index, embeddings=self.embeddings, cache_dir=CONDITION_EMBEDDING_DIR).build()
+        except Exception as e:
+            # The catalogue still reloads; semantic matching builds on first use instead
+            logger.error(f"Error embedding medical condition catalogue: {e}")
+            return None
+    
+    def prepare_semantic_matcher(self):
+        """Build the current snapshot's matcher if it hasn't been, e.g. for the built-in catalogue"""
+        with self._reload_lock:
+            if self._semantic_matcher is None and self.semantic_matching:
+                self._semantic_matcher = self._build_semantic_matcher(self.index)
+                if self._semantic_matcher is not None:
+                    self._semantic_matcher.remove_stale_matrices()
+    
+    def refresh(self) -> bool:
+        """
+        Poll the table and reload the snapshot if it changed, logging rather than raising errors
+        
+        Runs off the request path (startup and the catalogue poller), so it
+        also embeds the catalogue for semantic matching.
+        """
+        try:
+            return self.load_from_database()
+        except Exception as e:
+            logger.error(f"Error reloading medical condition catalogue: {e}")
+            return False
+        finally:
+            self.prepare_semantic_matcher()
+    
+    @property
+    def semantic_matcher(self) -> SemanticConditionMatcher:
+        """Embedding matcher installed with the current snapshot, built here only if none was"""
+        matcher = self._semantic_matcher
+        if matcher is None:
+            matcher = SemanticConditionMatcher(self.index, embeddings=self.embeddings, cache_dir=CONDITION_EMBEDDING_DIR)
+            self._semantic_matcher = matcher
+        return matcher
+    
+    def semantic_search_batch(self, queries: List[str], top_k: int = 3) -> List[List[Dict[str, Any]]]:
+        """Match many queries by embedding similarity in one batched product"""
+        return self.semantic_matcher.search_batch(queries, top_k, min_similarity=SEMANTIC_MATCH_THRESHOLD)
+    
+    def search(self, query: str, top_k: int = 3) -> List[Dict[str, Any]]:
+        """Search for similar medical conditions"""
+        results = self.index.search(query, top_k)
+        if not results and self.semantic_matching:
+            results = self.semantic_search_batch([query], top_k)[0]
+        return results
 
 # Initialize the vector store
 vector_store = VectorStore()
@@ -117,7 +248,7 @@ def analyze_medical_risk(medical_history: Dict[str, Any]) -> Dict[str, Any]:
     
     # If no conditions, return minimal risk
     if not conditions:
-        result["risk_assessment"] = "No medical conditions reported. Minimal risk."
+        result["risk_assessment"] = NO_CONDITIONS_ASSESSMENT
         return result
     
     # Analyze each condition
@@ -150,15 +281,90 @@ def analyze_medical_risk(medical_history: Dict[str, Any]) -> Dict[str, Any]:
     
     # Determine overall risk assessment
     if max_risk_score >= 0.8:
-        risk_assessment = "High risk due to serious medical conditions."
+        risk_assessment = HIGH_RISK_ASSESSMENT
     elif max_risk_score >= 0.5 or avg_risk_score >= 0.4:
-        risk_assessment = "Moderate risk. Standard medical review recommended."
+        risk_assessment = MODERATE_RISK_ASSESSMENT
     else:
-        risk_assessment = "Low risk. Routine underwriting sufficient."
+        risk_assessment = LOW_RISK_ASSESSMENT
     
     # Populate result
     result["risk_score"] = avg_risk_score
     result["identified_conditions"] = matched_conditions
     result["risk_assessment"] = risk_assessment
     
-    return result 
\ No newline at end of file
+    return result
+
+def analyze_medical_risk_batch(histories: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Analyze medical risk for many applicants at once
+    
+    Gives the same result as calling analyze_medical_risk on each history,
+    but every distinct condition string in the batch is looked up in the
+    vector store only once, and the per-applicant average/max scores and
+    assessments are aggregated with NumPy.
+    
+    Args:
+        histories: One medical history dict per applicant
+        
+    Returns:
+        List of analysis results in input order
+    """
+    logger.info(f"Analyzing medical risk factors for batch of {len(histories)} applicants")
+    
+    # Flatten conditions, remembering which applicant each one belongs to
+    all_conditions = [history.get("conditions") or [] for history in histories]
+    owners = np.repeat(np.arange(len(histories)), [len(conditions) for conditions in all_conditions])
+    flat_conditions = [condition for conditions in all_conditions for condition in conditions]
+    
+    # Resolve each distinct condition once
+    top_matches = {}
+    for condition in flat_conditions:
+        if condition not in top_matches:
+            matches = vector_store.index.search(condition, top_k=1)
+            top_matches[condition] = matches[0] if matches else None
+    
+    # Conditions with no name match share one embedding lookup
+    unmatched = [condition for condition, match in top_matches.items() if match is None]
+    if unmatched and vector_store.semantic_matching:
+        for condition, matches in zip(unmatched, vector_store.semantic_search_batch(unmatched, top_k=1)):
+            top_matches[condition] = matches[0] if matches else None
+    logger.info(f"Resolved {len(top_matches)} distinct conditions out of {len(flat_conditions)} reported")
+    
+    # Unmatched conditions count towards the average with a score of zero
+    scores = np.array(
+        [top_matches[condition]["data"]["risk_score"] if top_matches[condition] else 0.0 for condition in flat_conditions],
+        dtype=np.float64
+    )
+    counts = np.bincount(owners, minlength=len(histories))
+    totals = np.bincount(owners, weights=scores, minlength=len(histories))
+    max_scores = np.zeros(len(histories), dtype=np.float64)
+    np.maximum.at(max_scores, owners, scores)
+    avg_scores = np.divide(totals, counts, out=np.zeros(len(histories), dtype=np.float64), where=counts > 0)
+    
+    assessments = np.select(
+        [counts == 0, max_scores >= 0.8, (max_scores >= 0.5) | (avg_scores >= 0.4)],
+        [NO_CONDITIONS_ASSESSMENT, HIGH_RISK_ASSESSMENT, MODERATE_RISK_ASSESSMENT],
+        default=LOW_RISK_ASSESSMENT
+    )
+    
+    results = []
+    for applicant, conditions in enumerate(all_conditions):
+        matched_conditions = []
+        for condition in conditions:
+            top_match = top_matches[condition]
+            if top_match:
+                matched_conditions.append({
+                    "reported_condition": condition,
+                    "matched_condition": top_match["condition"],
+                    "risk_score": top_match["data"]["risk_score"],
+                    "description": top_match["data"]["description"],
+                    "complications": list(top_match["data"]["complications"])
+                })
+        
+        results.append({
+            "risk_score": float(avg_scores[applicant]),
+            "identified_conditions": matched_conditions,
+            "risk_assessment": str(assessments[applicant])
+        })
+    
+    return results
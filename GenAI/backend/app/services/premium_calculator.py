@@ -1,17 +1,62 @@
 import json
 import logging
-from typing import Dict, Any
+import os
+from typing import Dict, Any, List, Sequence, Union
+import numpy as np
+from ..schemas.insurance import PremiumCalculationRequest
+from .condition_classifier import (
+    pricing_classifier,
+    CONDITION_CODE_NONE,
+    CONDITION_CODE_MEDIUM,
+    CONDITION_CODE_HIGH
+)
+from .quote_cache import QuoteCache, make_quote_key
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Pricing table shared by LLMService and calculate_premiums_batch
+BASE_PREMIUM = 500
+SMOKING_MULTIPLIER = 1.5
+CONDITION_MULTIPLIERS = {
+    CONDITION_CODE_NONE: 1.0,
+    CONDITION_CODE_MEDIUM: 1.1,
+    CONDITION_CODE_HIGH: 1.3
+}
+
+RISK_RECOMMENDATIONS = {
+    "high": "Applicant has significant risk factors. Consider additional medical examination before approval.",
+    "medium": "Moderate risk profile. Standard approval process recommended.",
+    "low": "Low risk profile. Fast-track approval recommended."
+}
+
+def rating_tables_version():
+    """Snapshot of every rating input; a change invalidates cached quotes"""
+    return (
+        BASE_PREMIUM,
+        SMOKING_MULTIPLIER,
+        tuple(sorted(CONDITION_MULTIPLIERS.items())),
+        tuple(sorted(RISK_RECOMMENDATIONS.items())),
+        tuple(pricing_classifier.high_risk_conditions),
+        tuple(pricing_classifier.medium_risk_conditions)
+    )
+
+# Cache of recent quotes keyed by canonical applicant profile, shared by
+# calculate_premium and calculate_premium_quotes
+QUOTE_NAMESPACE = "calculate_premium"
+quote_cache = QuoteCache(
+    maxsize=int(os.getenv("QUOTE_CACHE_SIZE", "10000")),
+    ttl_seconds=float(os.getenv("QUOTE_CACHE_TTL_SECONDS", "300")),
+    version_func=rating_tables_version
+)
+
 # In a production environment, you would use a proper LLM API client
 # For this example, we're creating a simulated LLM service
 class LLMService:
     def generate_response(self, prompt, system_prompt=None):
         """Simulate an LLM response for premium calculations"""
-        logger.info(f"LLM Prompt: {prompt}")
+        logger.debug(f"LLM Prompt: {prompt}")
         
         # Extract data from prompt using simple parsing
         age = self._extract_age(prompt)
@@ -19,13 +64,17 @@ class LLMService:
         smoking = "smoking: true" in prompt.lower()
         medical_conditions = self._extract_conditions(prompt)
             
+        return self.price(age, coverage, smoking, medical_conditions)
+    
+    def price(self, age, coverage, smoking, medical_conditions):
+        """Price a single applicant from already-extracted inputs"""
         # Calculate premium based on simple rules
-        base_premium = 500  # Base premium
+        base_premium = BASE_PREMIUM
         age_factor = self._calculate_age_factor(age)
         coverage_factor = coverage / 100000 if coverage else 1.0  # $100k = factor of 1
         
         # Risk factors
-        risk_multiplier = 1.5 if smoking else 1.0
+        risk_multiplier = SMOKING_MULTIPLIER if smoking else 1.0
             
         # Medical conditions impact
         condition_risk = self._calculate_condition_risk(medical_conditions)
@@ -40,7 +89,13 @@ class LLMService:
         return {
             "premium_amount": premium,
             "risk_assessment": risk,
-            "ai_recommendation": recommendation
+            "ai_recommendation": recommendation,
+            "factors": {
+                "age_factor": age_factor,
+                "coverage_factor": coverage_factor,
+                "risk_multiplier": risk_multiplier,
+                "condition_risk": condition_risk
+            }
         }
     
     def _extract_age(self, prompt):
@@ -80,84 +135,81 @@ class LLMService:
         else:
             return 3.0
     
+    def _classify_condition(self, condition):
+        return pricing_classifier.classify(condition)
+    
     def _calculate_condition_risk(self, medical_conditions):
         condition_risk = 1.0
-        high_risk_conditions = ["diabetes", "heart disease", "cancer", "stroke", "hypertension"]
-        medium_risk_conditions = ["asthma", "depression", "anxiety", "obesity"]
         
         for condition in medical_conditions:
-            if any(high_risk in condition.lower() for high_risk in high_risk_conditions):
-                condition_risk *= 1.3
-            elif any(medium_risk in condition.lower() for medium_risk in medium_risk_conditions):
-                condition_risk *= 1.1
+            code = self._classify_condition(condition)
+            if code != CONDITION_CODE_NONE:
+                condition_risk *= CONDITION_MULTIPLIERS[code]
         
         return condition_risk
     
     def _generate_assessment(self, condition_risk, smoking, age):
-        # Calculate final premium
-        premium = base_premium * age_factor * coverage_factor * risk_multiplier * condition_risk
-        premium = round(premium, 2)
-        
         # Generate risk assessment
         if condition_risk > 1.5 or (smoking and age > 50):
             risk = "high"
-            recommendation = "Applicant has significant risk factors. Consider additional medical examination before approval."
         elif condition_risk > 1.2 or smoking or age > 60:
             risk = "medium"
-            recommendation = "Moderate risk profile. Standard approval process recommended."
         else:
             risk = "low"
-            recommendation = "Low risk profile. Fast-track approval recommended."
         
-        return {
-            "premium_amount": premium,
-            "risk_assessment": risk,
-            "ai_recommendation": recommendation
-        }
+        return risk, RISK_RECOMMENDATIONS[risk]
 
 # Initialize the LLM service
 llm_service = LLMService()
 
-def calculate_premium(data: Dict[str, Any]) -> Dict[str, Any]:
+def price_application(application: Union[Dict[str, Any], PremiumCalculationRequest]) -> Dict[str, Any]:
+    """
+    Price an application directly from its structured fields
+    
+    No prompt is built or parsed, so condition names and other free text
+    can't leak into the age or coverage inputs.
+    
+    Args:
+        application: Application data dict or PremiumCalculationRequest
+        
+    Returns:
+        Dictionary with premium_amount, risk_assessment, ai_recommendation and factors
+    """
+    if isinstance(application, PremiumCalculationRequest):
+        application = application.to_dict()
+    
+    medical_history = application.get("medical_history") or {}
+    risk_factors = application.get("risk_factors") or {}
+    
+    return llm_service.price(
+        application["applicant_age"],
+        application["coverage_amount"],
+        risk_factors.get("smoking", False),
+        medical_history.get("conditions") or []
+    )
+
+def calculate_premium(data: Union[Dict[str, Any], PremiumCalculationRequest]) -> Dict[str, Any]:
     """
     Calculate insurance premium using AI
     
     This is an agentic AI component that:
-    1. Takes application data
-    2. Formats it for LLM processing
-    3. Sends it to the LLM for premium calculation
-    4. Processes the response
+    1. Takes application data and returns a cached quote for a known profile
+    2. Otherwise prices the structured fields directly (see price_application)
+    3. Caches the quote for the next identical profile
     """
     logger.info("Calculating premium with AI")
     
-    # Format data for LLM
-    prompt = f"""
-    Calculate an insurance premium for an applicant with the following details:
-    - Age: {data['applicant_age']}
-    - Coverage amount: ${data['coverage_amount']}
-    - Medical history:
-        - Conditions: {data['medical_history'].get('conditions', [])}
-        - Medications: {data['medical_history'].get('medications', [])}
-    - Risk factors:
-        - Smoking: {data['risk_factors'].get('smoking', False)}
-        - Alcohol consumption: {data['risk_factors'].get('alcohol_consumption', False)}
-        - Occupation risk: {data['risk_factors'].get('occupation_risk', 'low')}
-    
-    Provide the premium amount, risk assessment (low, medium, high), and a recommendation.
-    """
+    if isinstance(data, PremiumCalculationRequest):
+        data = data.to_dict()
     
-    # System prompt that would instruct the LLM on how to respond
-    system_prompt = """
-    You are an expert insurance underwriter AI. Analyze the applicant information and determine:
-    1. An appropriate premium amount based on age, coverage, and risk factors
-    2. A risk assessment categorized as low, medium, or high
-    3. A recommendation for the underwriting team
-    Format your response as JSON with keys: premium_amount, risk_assessment, ai_recommendation
-    """
+    cache_key = make_quote_key(data, namespace=QUOTE_NAMESPACE)
+    cached = quote_cache.get(cache_key)
+    if cached is not None:
+        return cached
     
-    # Get response from LLM
     try:
-        response = llm_service.generate_response(prompt, system_prompt)
+        response = price_application(data)
+        quote_cache.set(cache_key, response)
         return response
     except Exception as e:
         logger.error(f"Error calculating premium: {e}")
@@ -166,4 +218,161 @@ def calculate_premium(data: Dict[str, Any]) -> Dict[str, Any]:
             "premium_amount": data['coverage_amount'] * 0.05,
             "risk_assessment": "medium",
             "ai_recommendation": "Error in AI calculation. Manual review recommended."
-        } 
\ No newline at end of file
+        } 
+
+def encode_conditions(conditions_per_applicant: Sequence[Sequence[str]]) -> np.ndarray:
+    """
+    Encode per-applicant condition lists as a padded matrix of condition codes
+    
+    Args:
+        conditions_per_applicant: One list of condition strings per applicant
+        
+    Returns:
+        Integer array of shape (applicants, max_conditions) padded with CONDITION_CODE_NONE
+    """
+    width = max((len(conditions) for conditions in conditions_per_applicant), default=0)
+    codes = np.full((len(conditions_per_applicant), width), CONDITION_CODE_NONE, dtype=np.int8)
+    
+    # Repeated condition strings are answered from the classifier cache
+    for row, conditions in enumerate(conditions_per_applicant):
+        for col, condition in enumerate(conditions):
+            codes[row, col] = pricing_classifier.classify(condition)
+    
+    return codes
+
+
+def _round_currency(values: np.ndarray) -> np.ndarray:
+    """
+    Round to cents with the same results as Python's round(value, 2)
+    
+    np.round scales by 100 before rounding, which can disagree with round()
+    on values sitting right at a half-cent, so those few are redone in Python.
+    """
+    rounded = np.round(values, 2)
+    scaled = values * 100
+    ambiguous = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    for index in np.flatnonzero(ambiguous):
+        rounded[index] = round(float(values[index]), 2)
+    return rounded
+
+
+def calculate_premiums_batch(
+    ages: Sequence[int],
+    coverage_amounts: Sequence[float],
+    smoking: Sequence[bool],
+    condition_codes: Any
+) -> Dict[str, np.ndarray]:
+    """
+    Calculate premiums for many applicants in one vectorized pass
+    
+    Uses the same pricing rules as LLMService.price, so every element matches
+    the result of pricing that applicant on its own.
+    
+    Args:
+        ages: Applicant ages
+        coverage_amounts: Requested coverage amounts
+        smoking: Smoking flags
+        condition_codes: Matrix of condition codes (see encode_conditions), or a
+            list of condition string lists which will be encoded first
+            
+    Returns:
+        Dictionary of arrays keyed like the scalar result: premium_amount,
+        risk_assessment, ai_recommendation and, under factors, age_factor,
+        coverage_factor, risk_multiplier and condition_risk
+    """
+    ages = np.asarray(ages)
+    coverage = np.asarray(coverage_amounts, dtype=np.float64)
+    smoking = np.asarray(smoking, dtype=bool)
+    if not isinstance(condition_codes, np.ndarray):
+        condition_codes = encode_conditions(condition_codes)
+    if condition_codes.ndim == 1:
+        # One code per applicant
+        condition_codes = condition_codes[:, np.newaxis]
+    
+    logger.info(f"Calculating premiums for batch of {len(ages)} applicants")
+    
+    # Age factor bands
+    age_factor = np.select(
+        [ages < 30, ages < 45, ages < 60],
+        [1.0, 1.5, 2.0],
+        default=3.0
+    )
+    coverage_factor = np.where(coverage != 0, coverage / 100000, 1.0)
+    risk_multiplier = np.where(smoking, SMOKING_MULTIPLIER, 1.0)
+    
+    # Multiply condition factors column by column to keep the scalar path's order
+    multipliers = np.array(
+        [CONDITION_MULTIPLIERS[code] for code in sorted(CONDITION_MULTIPLIERS)],
+        dtype=np.float64
+    )
+    condition_risk = np.ones(len(ages), dtype=np.float64)
+    for column in condition_codes.T:
+        condition_risk *= multipliers[column]
+    
+    premium = BASE_PREMIUM * age_factor * coverage_factor * risk_multiplier * condition_risk
+    premium = _round_currency(premium)
+    
+    # Risk assessment and recommendation
+    risk = np.select(
+        [
+            (condition_risk > 1.5) | (smoking & (ages > 50)),
+            (condition_risk > 1.2) | smoking | (ages > 60)
+        ],
+        ["high", "medium"],
+        default="low"
+    )
+    recommendation = np.select(
+        [risk == "high", risk == "medium"],
+        [RISK_RECOMMENDATIONS["high"], RISK_RECOMMENDATIONS["medium"]],
+        default=RISK_RECOMMENDATIONS["low"]
+    )
+    
+    return {
+        "premium_amount": premium,
+        "risk_assessment": risk,
+        "ai_recommendation": recommendation,
+        "factors": {
+            "age_factor": age_factor,
+            "coverage_factor": coverage_factor,
+            "risk_multiplier": risk_multiplier,
+            "condition_risk": condition_risk
+        }
+    }
+
+
+def calculate_premium_quotes(applications: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Quote many applications, each exactly as calculate_premium would
+    
+    Profiles already in the quote cache are answered from it; the rest are
+    priced in one calculate_premiums_batch pass and cached for later single
+    or batch requests.
+    
+    Args:
+        applications: Application data dicts
+        
+    Returns:
+        One quote per application, in input order
+    """
+    keys = [make_quote_key(application, namespace=QUOTE_NAMESPACE) for application in applications]
+    quotes: List[Any] = [quote_cache.get(key) for key in keys]
+    misses = [index for index, quote in enumerate(quotes) if quote is None]
+    if not misses:
+        return quotes
+    
+    priced = calculate_premiums_batch(
+        [applications[index]["applicant_age"] for index in misses],
+        [applications[index]["coverage_amount"] for index in misses],
+        [(applications[index].get("risk_factors") or {}).get("smoking", False) for index in misses],
+        [(applications[index].get("medical_history") or {}).get("conditions") or [] for index in misses]
+    )
+    for row, index in enumerate(misses):
+        quote = {
+            "premium_amount": float(priced["premium_amount"][row]),
+            "risk_assessment": str(priced["risk_assessment"][row]),
+            "ai_recommendation": str(priced["ai_recommendation"][row]),
+            "factors": {name: float(values[row]) for name, values in priced["factors"].items()}
+        }
+        quote_cache.set(keys[index], quote)
+        quotes[index] = quote
+    return quotes
@@ -0,0 +1,133 @@
+import copy
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Callable, Hashable
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def _normalize_list(values) -> list:
+    return sorted(str(value).strip().lower() for value in values or [])
+
+def make_quote_key(data: Dict[str, Any], namespace: str = "premium") -> str:
+    """
+    Build a canonical cache key for an applicant profile
+
+    Args:
+        data: Application data with applicant_age, coverage_amount,
+            medical_history and risk_factors
+        namespace: Separates results of different callers sharing one cache
+
+    Returns:
+        SHA-256 hex digest of the canonicalized profile
+    """
+    medical_history = data.get("medical_history") or {}
+    risk_factors = {
+        name: _normalize_list(value) if isinstance(value, (list, tuple)) else value
+        for name, value in (data.get("risk_factors") or {}).items()
+    }
+
+    profile = {
+        "namespace": namespace,
+        "applicant_age": int(data["applicant_age"]),
+        "coverage_amount": float(data["coverage_amount"]),
+        "conditions": _normalize_list(medical_history.get("conditions")),
+        "medications": _normalize_list(medical_history.get("medications")),
+        "risk_factors": risk_factors
+    }
+    canonical = json.dumps(profile, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+class QuoteCache:
+    """
+    Bounded LRU cache with per-entry TTL for premium quotes
+
+    Entries are dropped when they expire, when the cache is full (least
+    recently used first), or all at once when version_func reports that
+    the rating tables have changed.
+    """
+    def __init__(
+        self,
+        maxsize: int = 10000,
+        ttl_seconds: float = 300,
+        version_func: Optional[Callable[[], Hashable]] = None
+    ):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.version_func = version_func
+        self._version = version_func() if version_func else None
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _check_version(self):
+        if self.version_func is None:
+            return
+        version = self.version_func()
+        if version != self._version:
+            logger.info("Rating tables changed, invalidating quote cache")
+            self._version = version
+            self._entries.clear()
+            self.invalidations += 1
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a deep copy of the cached quote, or None if missing or expired"""
+        with self._lock:
+            self._check_version()
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(value)
+
+    def set(self, key: str, value: Dict[str, Any]):
+        """Store a quote, evicting the least recently used entries if full"""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._check_version()
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self):
+        """Drop every cached quote"""
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cache counters"""
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations
+            }
@@ -0,0 +1,196 @@
+import glob
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Sequence
+import numpy as np
+from .condition_index import ConditionIndex
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+
+def _default_embeddings():
+    """Reuse the sentence-transformers model already loaded by the document vector store"""
+    from ..database.vector_store import get_vector_store
+    return get_vector_store().embedding_model
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+class SemanticConditionMatcher:
+    """
+    Embedding-based matcher for a condition catalogue snapshot
+
+    Every condition name is embedded once into a row-normalized float32
+    matrix, saved as .npy under cache_dir and memory-mapped on later starts,
+    keyed by model name and catalogue contents. build() does this up front,
+    so it can run off the request path. A query is matched with one
+    matrix-vector product (cosine similarity) and top-k selection with
+    argpartition; many queries share one matrix-matrix product. Query
+    embeddings are kept in an LRU cache.
+    """
+    def __init__(
+        self,
+        index: ConditionIndex,
+        embeddings: Any = None,
+        cache_dir: str = "./vector_db/condition_embeddings",
+        model_name: str = EMBEDDING_MODEL_NAME,
+        query_cache_size: int = 10000
+    ):
+        self.index = index
+        self.embeddings = embeddings
+        self.cache_dir = cache_dir
+        self.model_name = model_name
+        self.query_cache_size = query_cache_size
+        self._matrix: Optional[np.ndarray] = None
+        self._query_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_embeddings(self):
+        if self.embeddings is None:
+            self.embeddings = _default_embeddings()
+        return self.embeddings
+
+    @property
+    def _matrix_prefix(self) -> str:
+        model_slug = self.model_name.replace("/", "_").replace(":", "_")
+        return os.path.join(self.cache_dir, f"conditions_{model_slug}_")
+
+    @property
+    def matrix_path(self) -> str:
+        digest = hashlib.sha256(self.model_name.encode("utf-8"))
+        for key in self.index.keys:
+            digest.update(key.encode("utf-8"))
+            digest.update(b"\0")
+        return f"{self._matrix_prefix}{digest.hexdigest()[:16]}.npy"
+
+    def build(self) -> "SemanticConditionMatcher":
+        """Load or embed the catalogue matrix now rather than on the first search"""
+        self.matrix
+        return self
+
+    def remove_stale_matrices(self) -> int:
+        """
+        Delete this model's saved matrices for other catalogue versions
+
+        Processes still memory-mapping a deleted file keep reading it; one
+        that hasn't loaded it yet embeds its catalogue again.
+        """
+        current = self.matrix_path
+        removed = 0
+        for path in glob.glob(f"{glob.escape(self._matrix_prefix)}*.npy"):
+            if path == current or path.endswith(".tmp.npy"):
+                continue
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError as e:
+                logger.warning(f"Could not remove stale condition embeddings {path}: {e}")
+        if removed:
+            logger.info(f"Removed {removed} stale condition embedding matrices")
+        return removed
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """Normalized catalogue embeddings, one row per condition"""
+        if self._matrix is None:
+            with self._lock:
+                if self._matrix is None:
+                    self._matrix = self._load_or_build_matrix()
+        return self._matrix
+
+    def _load_or_build_matrix(self) -> np.ndarray:
+        path = self.matrix_path
+        try:
+            matrix = np.load(path, mmap_mode="r")
+            logger.info(f"Memory-mapped condition embeddings from {path}")
+            return matrix
+        except FileNotFoundError:
+            pass
+
+        logger.info(f"Embedding {len(self.index)} medical conditions")
+        vectors = self._get_embeddings().embed_documents(self.index.keys) if len(self.index) else []
+        matrix = _normalize_rows(np.asarray(vectors, dtype=np.float32).reshape(len(self.index), -1))
+
+        # Write to a temporary file first so readers never see a partial matrix
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+        np.save(tmp_path, matrix)
+        os.replace(tmp_path, path)
+        return np.load(path, mmap_mode="r")
+
+    def embed_queries(self, queries: Sequence[str]) -> np.ndarray:
+        """Normalized query embeddings; uncached queries are embedded together in one call"""
+        keys = [query.strip().lower() for query in queries]
+        if not keys:
+            return np.empty((0, 0), dtype=np.float32)
+
+        with self._lock:
+            found = {}
+            for key in set(keys):
+                if key in self._query_cache:
+                    self._query_cache.move_to_end(key)
+                    found[key] = self._query_cache[key]
+
+        missing = [key for key in dict.fromkeys(keys) if key not in found]
+        if missing:
+            vectors = _normalize_rows(np.asarray(self._get_embeddings().embed_documents(missing), dtype=np.float32))
+            found.update(zip(missing, vectors))
+            with self._lock:
+                self._query_cache.update(zip(missing, vectors))
+                while len(self._query_cache) > self.query_cache_size:
+                    self._query_cache.popitem(last=False)
+
+        return np.vstack([found[key] for key in keys])
+
+    def search_batch(
+        self,
+        queries: Sequence[str],
+        top_k: int = 3,
+        min_similarity: float = 0.0
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Find the most similar conditions for each query
+
+        Args:
+            queries: Reported condition strings
+            top_k: Number of matches per query
+            min_similarity: Drop matches with a lower cosine similarity
+
+        Returns:
+            One list of condition/similarity/data records per query, best first
+        """
+        if not queries or not len(self.index) or top_k <= 0:
+            return [[] for _ in queries]
+
+        # (conditions x queries) cosine similarities in a single product
+        scores = self.matrix @ self.embed_queries(queries).T
+        k = min(top_k, scores.shape[0])
+        candidates = np.argpartition(-scores, k - 1, axis=0)[:k]
+
+        results = []
+        for column in range(scores.shape[1]):
+            column_ids = candidates[:, column]
+            column_scores = scores[column_ids, column]
+            order = np.argsort(-column_scores, kind="stable")
+            results.append([
+                {
+                    "condition": self.index.names[column_ids[i]],
+                    "similarity": float(column_scores[i]),
+                    "data": self.index.record(column_ids[i])
+                }
+                for i in order
+                if column_scores[i] >= min_similarity
+            ])
+        return results
+
+    def search(self, query: str, top_k: int = 3, min_similarity: float = 0.0) -> List[Dict[str, Any]]:
+        """Find the most similar conditions for a single query"""
+        return self.search_batch([query], top_k, min_similarity)[0]
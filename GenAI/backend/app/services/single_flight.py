@@ -0,0 +1,84 @@
+import asyncio
+import threading
+from typing import Dict, Any, Awaitable, Callable, Hashable, Tuple
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+class SingleFlight:
+    """
+    Deduplicates concurrent calls that share a key
+
+    The first caller for a key starts the work as a task; callers arriving
+    while it runs await the same task instead of starting their own. Every
+    caller gets the result or the exception. A caller that is cancelled
+    (for example because its client disconnected) only stops waiting. The
+    shared work is cancelled only once no caller is left waiting for it.
+    Finished calls are forgotten, so a later call starts fresh.
+
+    Tasks belong to an event loop, so calls are only shared between callers
+    on the same loop.
+    """
+    def __init__(self):
+        self._calls: Dict[Tuple[int, Hashable], _Call] = {}
+        self._lock = threading.Lock()
+
+        self.started = 0
+        self.coalesced = 0
+        self.abandoned = 0
+
+    def _forget(self, flight_key: Tuple[int, Hashable], call: _Call):
+        with self._lock:
+            if self._calls.get(flight_key) is call:
+                del self._calls[flight_key]
+
+    async def do(self, key: Hashable, work: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run work() for key, or join a run of it that is already in flight
+
+        Args:
+            key: Identifies equivalent calls
+            work: Starts the call; only invoked by the first caller
+        """
+        loop = asyncio.get_running_loop()
+        flight_key = (id(loop), key)
+
+        with self._lock:
+            call = self._calls.get(flight_key)
+            if call is None:
+                call = _Call(loop.create_task(work()))
+                self._calls[flight_key] = call
+                call.task.add_done_callback(lambda _: self._forget(flight_key, call))
+                self.started += 1
+            else:
+                self.coalesced += 1
+            call.waiters += 1
+
+        try:
+            # Shielded so one caller's cancellation doesn't cancel the others
+            return await asyncio.shield(call.task)
+        finally:
+            with self._lock:
+                call.waiters -= 1
+                orphaned = call.waiters == 0 and not call.task.done()
+                if orphaned:
+                    self.abandoned += 1
+                    if self._calls.get(flight_key) is call:
+                        del self._calls[flight_key]
+            if orphaned:
+                # Nobody is waiting any more, so don't keep the model busy
+                call.task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return call counters"""
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "started": self.started,
+                "coalesced": self.coalesced,
+                "abandoned": self.abandoned
+            }
@@ -0,0 +1,160 @@
+import json
+from typing import Any, Dict, List, Tuple
+
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+
+def _partial_tag_length(text: str, tag: str) -> int:
+    """Length of the longest suffix of text that could be the start of tag"""
+    for length in range(min(len(tag) - 1, len(text)), 0, -1):
+        if tag.startswith(text[-length:]):
+            return length
+    return 0
+
+class IncrementalJSONParser:
+    """
+    Incremental parser for a model answer containing one JSON object
+
+    Feed it text chunks as they are generated. feed() returns events:
+    - ("reasoning", text): text inside <think>...</think> before the object
+    - ("field", (name, value)): a top-level field, as soon as its value is
+      complete; string, object and array values are emitted at their closing
+      character, numbers and literals at the following ',' or '}'
+    Anything else before the first '{' (such as a ```json fence) is skipped.
+    Fields whose value is not valid JSON are skipped; the caller should still
+    parse the full text once generation ends.
+    """
+    def __init__(self):
+        self.fields: Dict[str, Any] = {}
+        self.done = False
+        self._started = False
+        self._in_think = False
+        self._preamble = ""
+
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._state = "key"
+        self._token: List[str] = []
+        self._key = None
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        events: List[Tuple[str, Any]] = []
+        if self.done or not chunk:
+            return events
+
+        if not self._started:
+            chunk = self._consume_preamble(chunk, events)
+            if not self._started:
+                return events
+
+        for char in chunk:
+            self._feed_char(char, events)
+            if self.done:
+                break
+        return events
+
+    def _consume_preamble(self, chunk: str, events: List[Tuple[str, Any]]) -> str:
+        """Handle text before the object; returns the text from the opening brace on"""
+        text = self._preamble + chunk
+        self._preamble = ""
+        while True:
+            if self._in_think:
+                end = text.find(THINK_CLOSE)
+                if end == -1:
+                    # Hold back a possibly split closing tag
+                    keep = _partial_tag_length(text, THINK_CLOSE)
+                    if len(text) > keep:
+                        events.append(("reasoning", text[:len(text) - keep]))
+                    self._preamble = text[len(text) - keep:]
+                    return ""
+                if end:
+                    events.append(("reasoning", text[:end]))
+                text = text[end + len(THINK_CLOSE):]
+                self._in_think = False
+                continue
+
+            think = text.find(THINK_OPEN)
+            brace = text.find("{")
+            if think != -1 and (brace == -1 or think < brace):
+                text = text[think + len(THINK_OPEN):]
+                self._in_think = True
+                continue
+            if brace != -1:
+                self._started = True
+                return text[brace:]
+
+            keep = _partial_tag_length(text, THINK_OPEN)
+            self._preamble = text[len(text) - keep:]
+            return ""
+
+    def _emit(self, events: List[Tuple[str, Any]]):
+        text = "".join(self._token).strip()
+        self._token = []
+        self._state = "after_value"
+        try:
+            value = json.loads(text)
+        except ValueError:
+            return
+        self.fields[self._key] = value
+        events.append(("field", (self._key, value)))
+
+    def _feed_char(self, char: str, events: List[Tuple[str, Any]]):
+        if self._in_string:
+            if self._state in ("key", "value"):
+                self._token.append(char)
+            if self._escape:
+                self._escape = False
+            elif char == "\\":
+                self._escape = True
+            elif char == '"':
+                self._in_string = False
+                if self._state == "key":
+                    self._key = json.loads("".join(self._token))
+                    self._token = []
+                    self._state = "colon"
+                elif self._depth == 1:
+                    self._emit(events)
+            return
+
+        if self._depth == 0:
+            if char == "{":
+                self._depth = 1
+            return
+
+        if self._state == "key":
+            if char == '"':
+                self._in_string = True
+                self._token = [char]
+            elif char == "}":
+                self.done = True
+        elif self._state == "colon":
+            if char == ":":
+                self._state = "value"
+        elif self._state == "value":
+            if char == '"':
+                self._in_string = True
+                self._token.append(char)
+            elif char in "{[":
+                self._depth += 1
+                self._token.append(char)
+            elif char in "}]":
+                if self._depth == 1:
+                    # End of the top-level object right after a number or literal
+                    self._emit(events)
+                    self.done = True
+                    return
+                self._depth -= 1
+                self._token.append(char)
+                if self._depth == 1:
+                    self._emit(events)
+            elif char == "," and self._depth == 1:
+                self._emit(events)
+                self._state = "key"
+            else:
+                self._token.append(char)
+        elif self._state == "after_value":
+            if char == ",":
+                self._state = "key"
+            elif char == "}":
+                self.done = True
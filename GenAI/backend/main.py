@@ -1,21 +1,41 @@
 import os
+import time
+# Start of the import phase for the startup timing report
+_imports_started = time.perf_counter()
+import asyncio
+import json
 import logging
+from typing import Dict, Any, AsyncIterator, Tuple
 from fastapi import FastAPI, Depends, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 import uvicorn
 from dotenv import load_dotenv
 from app.database.database import get_db, engine
-from app.database.vector_store import get_vector_store
-from app.services.llm_service import get_llm_service
-from app.services.ai_underwriting import evaluate_application_with_llm
-from app.services.crewai_orchestration import process_complex_application, process_complex_application_sync
+from app.database.vector_store import get_vector_store, vector_store_status
+from app.services.llm_service import get_llm_service, llm_inflight
+from app.services.ai_underwriting import evaluate_application_with_llm, evaluate_application_with_llm_stream
+from app.services.premium_calculator import quote_cache
+from app.services.llm_response_cache import llm_response_cache
+from app.services.llm_scheduler import llm_scheduler
+from app.services.job_queue import job_queue
+from app.services.medical_risk_analysis import vector_store as condition_store
+from app.services.crewai_orchestration import (
+    process_complex_application,
+    process_complex_application_stream,
+    get_agent_registry
+)
 from app.middleware.rate_limiter import RateLimiter
+from app.api.disconnect import cancel_on_disconnect
 from app.api.endpoints.insurance import router as insurance_router
 from app.api.endpoints.complex_cases import router as complex_cases_router
 from app.models.insurance import Base
 from sqlalchemy import text
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+
+# Seconds spent in each startup step, reported by /api/system-status
+startup_timings: Dict[str, float] = {"imports": round(time.perf_counter() - _imports_started, 3)}
 
 # Load environment variables
 load_dotenv()
@@ -68,6 +88,7 @@ app = FastAPI(
 # Startup event handler to check database connection and create tables
 @app.on_event("startup")
 async def startup_db_client():
+    started = time.perf_counter()
     try:
         # Create database tables if they don't exist
         Base.metadata.create_all(bind=engine)
@@ -83,6 +104,75 @@ async def startup_db_client():
         logger.error(f"Failed to connect to the database: {e}")
         # Database issues are critical but we don't want to prevent the API from starting
         # as we have fallbacks for some functionality
+    startup_timings["database"] = round(time.perf_counter() - started, 3)
+
+# Poll interval for reloading the medical condition catalogue snapshot
+CONDITION_CATALOGUE_POLL_SECONDS = float(os.getenv("CONDITION_CATALOGUE_POLL_SECONDS", "60"))
+
+async def poll_condition_catalogue():
+    """Reload the medical condition snapshot whenever the table changes"""
+    while True:
+        await asyncio.sleep(CONDITION_CATALOGUE_POLL_SECONDS)
+        await run_in_threadpool(condition_store.refresh)
+
+# Startup event handler to warm the medical condition catalogue
+@app.on_event("startup")
+async def startup_condition_catalogue():
+    started = time.perf_counter()
+    await run_in_threadpool(condition_store.refresh)
+    startup_timings["condition_catalogue"] = round(time.perf_counter() - started, 3)
+    if CONDITION_CATALOGUE_POLL_SECONDS > 0:
+        app.state.condition_catalogue_poller = asyncio.create_task(poll_condition_catalogue())
+
+@app.on_event("shutdown")
+async def shutdown_condition_catalogue():
+    poller = getattr(app.state, "condition_catalogue_poller", None)
+    if poller is not None:
+        poller.cancel()
+
+# Off by default so startup stays fast; when enabled, the embedding model and
+# Chroma load in the background instead of on the first request
+VECTOR_STORE_PREWARM = os.getenv("VECTOR_STORE_PREWARM", "false").lower() == "true"
+
+async def prewarm_vector_store():
+    started = time.perf_counter()
+    try:
+        await run_in_threadpool(get_vector_store)
+        startup_timings["vector_store_prewarm"] = round(time.perf_counter() - started, 3)
+        logger.info(f"Vector store pre-warmed in {startup_timings['vector_store_prewarm']:.2f}s")
+    except Exception as e:
+        logger.error(f"Failed to pre-warm vector store: {e}")
+
+@app.on_event("startup")
+async def startup_vector_store():
+    if VECTOR_STORE_PREWARM:
+        app.state.vector_store_prewarm = asyncio.create_task(prewarm_vector_store())
+
+# Build the complex-application agents and their compiled prompts once per worker
+@app.on_event("startup")
+async def startup_agent_registry():
+    started = time.perf_counter()
+    try:
+        await run_in_threadpool(get_agent_registry)
+    except Exception as e:
+        logger.error(f"Failed to build the agent registry: {e}")
+    startup_timings["agent_registry"] = round(time.perf_counter() - started, 3)
+
+# Run queued complex-application jobs in this worker; jobs left running by a
+# previous process are picked up again once their lease lapses
+@app.on_event("startup")
+async def startup_job_queue():
+    job_queue.start()
+
+@app.on_event("shutdown")
+async def shutdown_job_queue():
+    await job_queue.stop()
+
+# Registered last so it reports every startup step above
+@app.on_event("startup")
+async def report_startup_timings():
+    report = ", ".join(f"{step}={seconds:.3f}s" for step, seconds in startup_timings.items())
+    logger.info(f"Startup timings: {report} (vector store {'pre-warming' if VECTOR_STORE_PREWARM else 'loads on first use'})")
 
 # Configure CORS
 frontend_url = os.getenv("FRONTEND_URL", "http://localhost:4200")
@@ -146,36 +236,73 @@ async def health_check():
         "api_version": app.version
     }
 
+def _sse(event: str, data: Any) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def _sse_response(events: AsyncIterator[Tuple[str, Any]]) -> StreamingResponse:
+    """Stream (event, data) pairs to the client as server-sent events"""
+    async def body():
+        # Send something immediately so the client knows the request is being worked on
+        yield _sse("progress", {"stage": "accepted"})
+        try:
+            async for event, data in events:
+                yield _sse(event, data)
+        except Exception as e:
+            logger.error(f"Error while streaming response: {e}")
+            yield _sse("error", {"message": str(e)})
+    
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # Endpoint to evaluate an application using AI underwriting
+# With ?stream=true progress, model reasoning, each output field and the final
+# result are sent as server-sent events while the model is generating
 @app.post("/api/evaluate-application")
-async def evaluate_application(application_data: dict, db: Session = Depends(get_db)):
+async def evaluate_application(request: Request, application_data: dict, stream: bool = False, db: Session = Depends(get_db)):
+    if stream:
+        logger.info(f"Received streaming application evaluation request: {application_data.get('id', 'unknown')}")
+        return _sse_response(evaluate_application_with_llm_stream(application_data))
+    
     try:
         logger.info(f"Received application evaluation request: {application_data.get('id', 'unknown')}")
         
         # Process application with AI underwriting
-        result = await evaluate_application_with_llm(application_data)
+        result = await cancel_on_disconnect(request, evaluate_application_with_llm(application_data))
         
         return {
             "success": True,
             "data": result
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing application: {e}")
         raise HTTPException(status_code=500, detail=f"Application processing error: {str(e)}")
 
 # Endpoint to process complex application using CrewAI
+# With ?stream=true agent progress and model output are sent as server-sent events
 @app.post("/api/process-complex-application")
-def process_complex_app(application_data: dict, db: Session = Depends(get_db)):
+async def process_complex_app(request: Request, application_data: dict, stream: bool = False, db: Session = Depends(get_db)):
+    if stream:
+        logger.info(f"Received streaming complex application request: {application_data.get('id', 'unknown')}")
+        return _sse_response(process_complex_application_stream(application_data))
+    
     try:
         logger.info(f"Received complex application processing request: {application_data.get('id', 'unknown')}")
         
-        # Process application with CrewAI using synchronous version
-        result = process_complex_application_sync(application_data)
+        # Process application with CrewAI on the event loop; no worker thread is held while agents wait on the model
+        result = await cancel_on_disconnect(request, process_complex_application(application_data))
         
         return {
             "success": True,
             "data": result
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing complex application: {e}")
         raise HTTPException(status_code=500, detail=f"Complex application processing error: {str(e)}")
@@ -184,7 +311,6 @@ def process_complex_app(application_data: dict, db: Session = Depends(get_db)):
 @app.get("/api/system-status")
 async def system_status():
     llm_service = get_llm_service()
-    vector_store = get_vector_store()
     
     try:
         llm_status = "available"
@@ -199,12 +325,21 @@ async def system_status():
     return {
         "llm_service": {
             "status": llm_status,
-            "model": os.getenv("OLLAMA_MODEL", "deepseek-r1:32b")
+            "model": os.getenv("OLLAMA_MODEL", "deepseek-r1:32b"),
+            "backend": os.getenv("LLM_BACKEND", "ollama"),
+            "backend_stats": llm_service.backend_stats()
         },
         "vector_store": {
             "status": vector_status,
-            "collection": os.getenv("VECTOR_COLLECTION_NAME", "insurance_data")
-        }
+            "collection": os.getenv("VECTOR_COLLECTION_NAME", "insurance_data"),
+            **vector_store_status()
+        },
+        "quote_cache": quote_cache.stats(),
+        "llm_response_cache": await run_in_threadpool(llm_response_cache.stats),
+        "llm_scheduler": llm_scheduler.stats(),
+        "llm_coalescing": llm_inflight.stats(),
+        "job_queue": await run_in_threadpool(job_queue.stats),
+        "startup": startup_timings
     }
 
 # Run the API server if executed directly
@@ -3,6 +3,7 @@ Pytest configuration and fixtures
 """
 import os
 import sys
+import tempfile
 import pytest
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
@@ -11,6 +12,13 @@ from fastapi.testclient import TestClient
 # Add the parent directory to the Python path so we can import app modules
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+# Keep test answers out of the persistent LLM response cache
+os.environ["LLM_RESPONSE_CACHE_PATH"] = ""
+
+# Keep test jobs out of the persistent job queue, and don't run its workers
+os.environ["JOB_QUEUE_PATH"] = os.path.join(tempfile.mkdtemp(), "jobs.sqlite3")
+os.environ["JOB_WORKERS"] = "0"
+
 from main import app
 from app.database.database import Base, get_db
 from app.database.vector_store import VectorStore
@@ -46,7 +54,7 @@ def test_db():
 
 
 @pytest.fixture(scope="function")
-def client(test_db):
+def client(test_db, monkeypatch):
     """
     Create a FastAPI test client with a test database
     """
@@ -59,6 +67,9 @@ def client(test_db):
     
     app.dependency_overrides[get_db] = override_get_db
     
+    # Sessions opened with db_session() go to the test database too
+    monkeypatch.setattr("app.database.database.SessionLocal", sessionmaker(bind=test_db.get_bind()))
+    
     with TestClient(app) as client:
         yield client
     
@@ -94,7 +105,7 @@ def mock_vector_store():
         pass
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture
 def mock_llm_service(monkeypatch):
     """
     Create a mock LLM service that doesn't make actual API calls
@@ -107,17 +118,18 @@ def mock_llm_service(monkeypatch):
             return f"Mock async response for: {prompt[:20]}..."
         
         async def agenerate(self, prompts):
-            class MockGenerations:
-                generations = [[MockGeneration()]]
-            
             class MockGeneration:
                 text = f"Mock generation for: {prompts[0][:20]}..."
             
+            class MockGenerations:
+                generations = [[MockGeneration()]]
+            
             return MockGenerations()
     
     # Patch the OllamaLLM initialization in LLMService
-    monkeypatch.setattr("app.services.llm_service.OllamaLLM", MockOllamaLLM)
+    monkeypatch.setattr("app.services.llm_service._create_llm", MockOllamaLLM)
     
-    # Create service with the mock
+    # Create service with the mock, building the lazy client while patched
     service = LLMService()
+    service.llm
     return service 
\ No newline at end of file
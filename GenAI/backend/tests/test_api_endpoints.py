@@ -188,4 +188,175 @@ def test_get_all_applications(client):
     # Check if our applications are in the list
     emails = [app["email"] for app in result]
     assert "user1@example.com" in emails
-    assert "user2@example.com" in emails 
\ No newline at end of file
+    assert "user2@example.com" in emails 
+
+def test_calculate_premium_repeated_profile_is_cached(client, monkeypatch):
+    """Test that a repeated profile is answered from the quote cache without pricing again"""
+    from app.services import premium_calculator
+    from app.services.quote_cache import QuoteCache
+
+    cache = QuoteCache(version_func=premium_calculator.rating_tables_version)
+    monkeypatch.setattr(premium_calculator, "quote_cache", cache)
+    request = {
+        "applicant_age": 38,
+        "coverage_amount": 300000,
+        "medical_history": {"conditions": ["asthma"]},
+        "risk_factors": {"smoking": False}
+    }
+
+    first = client.post("/api/insurance/calculate-premium/", json=request).json()
+    monkeypatch.setattr(premium_calculator, "price_application", lambda data: pytest.fail("priced again"))
+    second = client.post("/api/insurance/calculate-premium/", json=request).json()
+
+    assert first == second
+    assert cache.stats()["hits"] == 1
+
+
+def test_calculate_premium_batch(client):
+    """Test batch premium calculation with a per-item validation error"""
+    valid_request = {
+        "applicant_age": 45,
+        "coverage_amount": 500000,
+        "medical_history": {"conditions": ["diabetes"]},
+        "risk_factors": {"smoking": False}
+    }
+
+    response = client.post(
+        "/api/insurance/calculate-premium/batch",
+        json=[valid_request, {"applicant_age": 5}, valid_request]
+    )
+
+    # Validate the streamed NDJSON response
+    assert response.status_code == 200
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert [result["index"] for result in results] == [0, 1, 2]
+    assert "error" in results[1]
+    assert results[0]["premium_amount"] == results[2]["premium_amount"]
+
+    # The same profile through the single endpoint gives the same quote
+    single = client.post("/api/insurance/calculate-premium/", json=valid_request).json()
+    assert single == {name: value for name, value in results[0].items() if name != "index"}
+
+
+def test_calculate_premium_batch_size_limit(client, monkeypatch):
+    """Test that batches over the configured limit are rejected"""
+    from app.api.endpoints import insurance
+
+    monkeypatch.setattr(insurance, "PREMIUM_BATCH_MAX_ITEMS", 2)
+
+    response = client.post("/api/insurance/calculate-premium/batch", json=[{}, {}, {}])
+
+    assert response.status_code == 413
+
+
+def test_calculate_premium_batch_ndjson(client):
+    """Test batch premium calculation from an NDJSON body"""
+    lines = [
+        json.dumps({
+            "applicant_age": 30,
+            "coverage_amount": 100000,
+            "medical_history": {"conditions": []},
+            "risk_factors": {"smoking": True}
+        }),
+        "{not json"
+    ]
+
+    response = client.post(
+        "/api/insurance/calculate-premium/batch",
+        content="\n".join(lines),
+        headers={"Content-Type": "application/x-ndjson"}
+    )
+
+    assert response.status_code == 200
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert len(results) == 2
+    assert results[0]["risk_assessment"] == "medium"
+    assert "Invalid JSON" in results[1]["error"]
+
+
+def _parse_sse(text):
+    events = []
+    for block in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_evaluate_application_stream(client, monkeypatch):
+    """Test that the evaluation streams the decision ahead of the final result"""
+    from app.services import llm_service as llm_service_module
+    
+    answer = json.dumps({
+        "decision": "approve",
+        "reasoning": "Healthy applicant with no risk factors",
+        "premium_amount": 950.0,
+        "special_conditions": []
+    })
+    
+    class StreamingLLM:
+        async def astream(self, prompt):
+            yield "<think>Checking the rules.</think>"
+            for start in range(0, len(answer), 16):
+                yield answer[start:start + 16]
+    
+    monkeypatch.setattr(llm_service_module, "_create_llm", StreamingLLM)
+    monkeypatch.setattr(llm_service_module, "_llm_service", None)
+    
+    application = {
+        "id": "stream-1",
+        "applicant_age": 35,
+        "coverage_amount": 250000,
+        "medical_history": {"conditions": []},
+        "risk_factors": {"smoking": False}
+    }
+    response = client.post("/api/evaluate-application?stream=true", json=application)
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    
+    events = _parse_sse(response.text)
+    names = [event for event, _ in events]
+    assert names[0] == "progress"
+    assert ("reasoning", "Checking the rules.") in events
+    assert names.index("field") < names.index("result")
+    assert events[names.index("field")][1] == {"name": "decision", "value": "approve"}
+    
+    result = events[-1]
+    assert result[0] == "result"
+    assert result[1]["decision"] == "approve"
+    assert result[1]["premium_amount"] == 950.0
+
+
+def test_complex_application_runs_on_the_event_loop(client, monkeypatch, test_db):
+    """Test that the complex-case endpoint awaits the crew and stores the decision"""
+    import threading
+    from app.models.insurance import InsuranceApplication
+    
+    threads = []
+    
+    async def fake_process(application_data):
+        threads.append(threading.current_thread())
+        return {"approved": True, "decision": "approve", "premium_amount": 1200.0, "recommendation": "Low risk"}
+    
+    monkeypatch.setattr("app.api.endpoints.complex_cases.process_complex_application", fake_process)
+    
+    application = {
+        "applicant_name": "Jane Doe",
+        "applicant_age": 45,
+        "email": "jane@example.com",
+        "phone": "555-010-0100",
+        "medical_history": {"conditions": ["hypertension"]},
+        "risk_factors": {"smoking": False},
+        "coverage_amount": 250000
+    }
+    response = client.post("/api/complex/complex-application/", json=application)
+    
+    assert response.status_code == 201
+    data = response.json()
+    assert data["decision"] == "approve"
+    stored = test_db.query(InsuranceApplication).filter_by(id=data["application_id"]).one()
+    assert stored.is_approved is True
+    assert stored.premium_amount == 1200.0
+    
+    # The crew ran in the event loop's thread, not a thread pool worker
+    assert threads and not threads[0].name.startswith(("AnyIO", "ThreadPool"))
@@ -0,0 +1,46 @@
+"""
+Tests for the shared condition classifier
+"""
+from app.services.condition_classifier import (
+    ConditionClassifier,
+    pricing_classifier,
+    risk_analyst_classifier,
+    CONDITION_CODE_NONE,
+    CONDITION_CODE_MEDIUM,
+    CONDITION_CODE_HIGH
+)
+
+
+def test_classifier_matches_keyword_scan():
+    """Test that classification matches the original per-keyword substring scan"""
+    high = ["diabetes", "heart disease", "cancer"]
+    medium = ["asthma", "anxiety"]
+    classifier = ConditionClassifier(high, medium)
+
+    samples = ["Type 2 Diabetes", "asthma with anxiety", "anxiety and heart disease", "Broken arm", "", "  CANCER  "]
+    for sample in samples:
+        if any(keyword in sample.lower() for keyword in high):
+            expected = CONDITION_CODE_HIGH
+        elif any(keyword in sample.lower() for keyword in medium):
+            expected = CONDITION_CODE_MEDIUM
+        else:
+            expected = CONDITION_CODE_NONE
+        assert classifier.classify(sample) == expected
+
+
+def test_classifier_tables_differ_per_caller():
+    """Test that pricing and the risk analyst fallback keep their own keyword tables"""
+    assert pricing_classifier.classify("Hypertension") == CONDITION_CODE_HIGH
+    assert risk_analyst_classifier.classify("Hypertension") == CONDITION_CODE_MEDIUM
+
+
+def test_classifier_caches_normalized_conditions():
+    """Test that repeated conditions are served from the cache"""
+    classifier = ConditionClassifier(["diabetes"], ["asthma"])
+
+    classifier.classify("Diabetes")
+    classifier.classify(" diabetes ")
+
+    info = classifier.cache_info()
+    assert info.misses == 1
+    assert info.hits == 1
@@ -0,0 +1,131 @@
+"""
+Tests for CrewAI task graph execution
+"""
+import asyncio
+import pytest
+from app.services import crewai_orchestration
+from app.services.crewai_orchestration import Agent, AgentRegistry, Crew, get_agent_registry, process_complex_application
+
+
+class RecordingAgent(Agent):
+    """Agent that returns canned results and records what it was given"""
+    def __init__(self, name, role, result, log, delay=0.01):
+        self.name = name
+        self.role = role
+        self.goal = ""
+        self.result = result
+        self.log = log
+        self.delay = delay
+
+    async def execute_task(self, task, context, emit=None):
+        self.log.append(("start", task, dict(context.get("upstream", {}))))
+        await asyncio.sleep(self.delay)
+        self.log.append(("end", task))
+        return self.result
+
+
+def make_crew(log, medical_decision="proceed"):
+    agents = [
+        RecordingAgent("Risk Analyzer", "risk_analyst", {"risk_score": 0.4}, log),
+        RecordingAgent("Medical Expert", "medical_expert", {"recommendation": "Looks fine", "medical_decision": medical_decision}, log),
+        RecordingAgent("Underwriter", "underwriter", {"decision": "approve", "reason": "ok", "premium_amount": "$1,200"}, log)
+    ]
+    return Crew(agents, crewai_orchestration.COMPLEX_APPLICATION_TASKS)
+
+
+def test_independent_tasks_run_in_parallel_and_feed_downstream():
+    """Test that analysis tasks overlap and the underwriter sees their results"""
+    log = []
+    results = asyncio.run(make_crew(log).run({"applicant_age": 50}))
+
+    starts = [entry[1] for entry in log if entry[0] == "start"]
+    assert starts[:2] == ["analyze_risk", "evaluate_medical"]
+    assert log[2][0] == "end" and log[2][1] in ("analyze_risk", "evaluate_medical")
+
+    underwriter_start = next(entry for entry in log if entry[:2] == ("start", "evaluate_application"))
+    assert underwriter_start[2] == {
+        "analyze_risk": {"risk_score": 0.4},
+        "evaluate_medical": {"recommendation": "Looks fine", "medical_decision": "proceed"}
+    }
+    assert log.index(underwriter_start) > log.index(("end", "analyze_risk"))
+    assert results["evaluate_application"]["decision"] == "approve"
+
+
+def test_underwriter_is_skipped_on_medical_decline():
+    """Test that a medical decline saves the underwriter's model call"""
+    log = []
+    events = []
+    results = asyncio.run(make_crew(log, medical_decision="decline").run({}, emit=lambda e, d: events.append((e, d))))
+
+    assert ("start", "evaluate_application") not in [entry[:2] for entry in log]
+    assert results["evaluate_application"]["status"] == "skipped"
+    assert ("progress", {"task": "evaluate_application", "status": "skipped",
+                         "reason": results["evaluate_application"]["reason"]}) in events
+
+
+def test_invalid_task_graphs_are_rejected():
+    """Test that unknown dependencies and cycles fail at construction"""
+    with pytest.raises(ValueError, match="unknown"):
+        Crew([], [{"task": "a", "depends_on": ["missing"]}])
+    with pytest.raises(ValueError, match="cycle"):
+        Crew([], [{"task": "a", "depends_on": ["b"]}, {"task": "b", "depends_on": ["a"]}])
+
+
+def test_process_complex_application_summarizes_the_decision(monkeypatch):
+    """Test the overall decision built from the agents' results"""
+    log = []
+    registry = AgentRegistry(agents=[
+        RecordingAgent("Risk Analyzer", "risk_analyst", {"risk_score": "0.4"}, log),
+        RecordingAgent("Medical Expert", "medical_expert", {"recommendation": "Looks fine", "medical_decision": "proceed"}, log),
+        RecordingAgent("Underwriter", "underwriter", {"decision": "approve", "reason": "Low risk", "premium_amount": "$1,200"}, log)
+    ])
+    monkeypatch.setattr(crewai_orchestration, "get_agent_registry", lambda: registry)
+
+    result = asyncio.run(process_complex_application({"applicant_age": 50, "coverage_amount": 100000}))
+
+    assert result["approved"] is True
+    assert result["decision"] == "approve"
+    assert result["premium_amount"] == 1200.0
+    assert result["risk_score"] == 0.4
+    assert result["recommendation"] == "Low risk"
+    assert result["requires_review"] is False
+    assert set(result["agent_results"]) == {"analyze_risk", "evaluate_medical", "evaluate_application"}
+
+
+def test_process_complex_application_error_has_the_result_shape(monkeypatch):
+    """Test that a crew failure returns the same keys as a completed run, referred for review"""
+    def broken_registry():
+        raise RuntimeError("model server unreachable")
+
+    monkeypatch.setattr(crewai_orchestration, "get_agent_registry", broken_registry)
+
+    result = asyncio.run(process_complex_application({"applicant_age": 50}))
+
+    assert result["decision"] == "refer"
+    assert result["requires_review"] is True
+    assert result["approved"] is False
+    assert result["agent_results"] == {}
+    assert result["error"] == "model server unreachable"
+    assert {"premium_amount", "recommendation", "risk_score"} <= set(result)
+
+
+def test_agent_registry_is_built_once_with_compiled_prompts(monkeypatch):
+    """Test that requests share agents whose prompts were compiled up front"""
+    monkeypatch.setattr(crewai_orchestration, "_agent_registry", None)
+    registry = get_agent_registry()
+    calls = []
+
+    class RecordingService:
+        async def structured_generation(self, **kwargs):
+            calls.append(kwargs)
+            return {"risk_score": 0.2}
+
+    analyst = registry.get("risk_analyst")
+    analyst.llm_service = RecordingService()
+    asyncio.run(analyst.execute_task("analyze_risk", {"applicant_age": 40}))
+    asyncio.run(analyst.execute_task("analyze_risk", {"applicant_age": 60}))
+
+    assert get_agent_registry() is registry
+    assert [agent.role for agent in registry.agents] == ["risk_analyst", "medical_expert", "underwriter"]
+    assert all(call["compiled_prompt"] is analyst.compiled_prompt for call in calls)
+    assert "Applicant Age: 60" in analyst.compiled_prompt.render(calls[1]["input_variables"])
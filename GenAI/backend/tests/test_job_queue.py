@@ -0,0 +1,232 @@
+"""
+Tests for the persistent complex-application job queue
+"""
+import asyncio
+import time
+import pytest
+from app.services.job_queue import JobQueue, check_callback_url, JOB_COMPLETED, JOB_FAILED, JOB_QUEUED
+from app.services.llm_scheduler import PRIORITY_BATCH, current_request_options
+
+
+def make_queue(path, processor, saved=None, **kwargs):
+    return JobQueue(
+        str(path),
+        processor=processor,
+        save_result=(lambda application_id, result: saved.append((application_id, result))) if saved is not None else None,
+        poll_seconds=0.05,
+        **kwargs
+    )
+
+
+def test_jobs_run_at_batch_priority_and_results_are_saved(tmp_path):
+    """Test submit, long-poll until done, and the saved application result"""
+    seen = []
+    saved = []
+
+    async def processor(payload):
+        seen.append(current_request_options()[0])
+        await asyncio.sleep(0.05)
+        return {"approved": True, "decision": "approve", "premium_amount": 900.0, "applicant": payload["applicant_name"]}
+
+    queue = make_queue(tmp_path / "jobs.sqlite3", processor, saved)
+
+    async def run():
+        queue.start()
+        try:
+            job = await queue.submit({"applicant_name": "Jane"}, application_id=7)
+            assert job["status"] == JOB_QUEUED
+            return await queue.wait(job["id"], timeout=5)
+        finally:
+            await queue.stop()
+
+    job = asyncio.run(run())
+
+    assert job["status"] == JOB_COMPLETED
+    assert job["result"]["applicant"] == "Jane"
+    assert saved == [(7, job["result"])]
+    assert seen == [PRIORITY_BATCH]
+    assert queue.stats()["jobs"][JOB_COMPLETED] == 1
+
+
+def test_jobs_survive_a_restart(tmp_path):
+    """Test that queued jobs and jobs whose worker died run in a new process"""
+    path = tmp_path / "jobs.sqlite3"
+    runs = []
+
+    async def processor(payload):
+        runs.append(payload["n"])
+        return {"decision": "refer"}
+
+    # The first "process" queues two jobs and dies while running one of them
+    first = make_queue(path, processor, lease_seconds=0.1)
+    interrupted = first.enqueue({"n": 1})
+    waiting = first.enqueue({"n": 2})
+    assert first._claim()["id"] == interrupted["id"]
+    time.sleep(0.15)
+
+    second = make_queue(path, processor, lease_seconds=0.1)
+
+    async def run():
+        second.start()
+        try:
+            return [await second.wait(job["id"], timeout=5) for job in (interrupted, waiting)]
+        finally:
+            await second.stop()
+
+    recovered, queued = asyncio.run(run())
+
+    assert sorted(runs) == [1, 2]
+    assert recovered["status"] == JOB_COMPLETED and recovered["attempts"] == 2
+    assert queued["status"] == JOB_COMPLETED and queued["attempts"] == 1
+    assert second.stats()["recovered"] == 1
+
+
+def test_stale_worker_result_is_dropped(tmp_path):
+    """Test that a worker whose lease was taken over can't overwrite the new owner's result"""
+    saved = []
+
+    async def processor(payload):
+        return {"decision": "approve"}
+
+    queue = make_queue(tmp_path / "jobs.sqlite3", processor, saved)
+    job = queue.enqueue({"n": 1}, application_id=3)
+    stale = queue._claim()
+    with queue._connection() as connection:
+        connection.execute("UPDATE jobs SET lease_expires_at = 0 WHERE id = ?", (job["id"],))
+    owner = queue._claim()
+    assert owner["id"] == job["id"] and owner["worker"] != stale["worker"]
+
+    asyncio.run(queue._run(stale))
+    assert queue.get(job["id"])["status"] == "running"
+    assert saved == []
+
+    asyncio.run(queue._run(owner))
+    assert queue.get(job["id"])["status"] == JOB_COMPLETED
+    assert saved == [(3, {"decision": "approve"})]
+    assert queue.stats()["processed"] == 1
+
+
+def test_lease_renewal_survives_errors(tmp_path, monkeypatch):
+    """Test that a failed renewal is retried instead of ending the lease keeper"""
+    queue = make_queue(tmp_path / "jobs.sqlite3", None, lease_seconds=0.03)
+    renewals = []
+
+    def renew(job_id, claim):
+        renewals.append(job_id)
+        if len(renewals) == 1:
+            raise RuntimeError("database is locked")
+        return True
+
+    monkeypatch.setattr(queue, "_renew_lease", renew)
+
+    async def run():
+        keeper = asyncio.create_task(queue._keep_lease("job", "claim"))
+        await asyncio.sleep(0.1)
+        assert not keeper.done()
+        keeper.cancel()
+
+    asyncio.run(run())
+    assert len(renewals) >= 3
+
+
+def test_long_poll_events_do_not_accumulate(tmp_path):
+    """Test that timed-out waits and jobs finished elsewhere leave no wake-up events behind"""
+    async def processor(payload):
+        return {"decision": "refer"}
+
+    queue = make_queue(tmp_path / "jobs.sqlite3", processor)
+    other_process = make_queue(tmp_path / "jobs.sqlite3", processor)
+    job = queue.enqueue({"n": 1})
+
+    async def run():
+        timed_out = await queue.wait(job["id"], timeout=0.1)
+        assert len(queue._finished) == 0
+        other_process.start()
+        try:
+            finished = await queue.wait(job["id"], timeout=5)
+        finally:
+            await other_process.stop()
+        return timed_out, finished
+
+    timed_out, finished = asyncio.run(run())
+
+    assert timed_out["status"] == JOB_QUEUED
+    assert finished["status"] == JOB_COMPLETED
+    assert len(queue._finished) == 0
+
+
+def test_failures_and_callbacks(tmp_path, monkeypatch):
+    """Test that failed jobs record their error and both outcomes are POSTed to the callback"""
+    delivered = []
+
+    async def processor(payload):
+        if payload["fail"]:
+            raise RuntimeError("crew unavailable")
+        return {"decision": "approve"}
+
+    queue = make_queue(tmp_path / "jobs.sqlite3", processor)
+
+    async def post_callback(url, job):
+        delivered.append((url, job["status"]))
+
+    monkeypatch.setattr(queue, "_post_callback", post_callback)
+
+    async def run():
+        queue.start()
+        try:
+            ok = await queue.submit({"fail": False}, callback_url="http://client/ok")
+            bad = await queue.submit({"fail": True}, callback_url="http://client/bad")
+            await queue.wait(ok["id"], timeout=5)
+            await queue.wait(bad["id"], timeout=5)
+            await asyncio.sleep(0.1)
+            return queue.get(ok["id"]), queue.get(bad["id"])
+        finally:
+            await queue.stop()
+
+    ok, bad = asyncio.run(run())
+
+    assert bad["status"] == JOB_FAILED
+    assert bad["error"] == "crew unavailable"
+    assert sorted(delivered) == [("http://client/bad", JOB_FAILED), ("http://client/ok", JOB_COMPLETED)]
+    assert ok["callback_status"] == "delivered"
+
+
+def test_callback_urls_must_be_public_or_allowed():
+    """Test that callbacks to loopback, metadata and private addresses are refused"""
+    for url in ("ftp://93.184.216.34/", "http://127.0.0.1:8000/hook", "http://localhost/hook",
+                "http://169.254.169.254/latest/meta-data", "http://10.0.0.5/hook", "http://[::1]/hook"):
+        with pytest.raises(ValueError):
+            check_callback_url(url)
+
+    check_callback_url("https://93.184.216.34/hook")
+    check_callback_url("http://Hooks.Internal/job", allowed_hosts=["hooks.internal"])
+    with pytest.raises(ValueError, match="JOB_CALLBACK_ALLOWED_HOSTS"):
+        check_callback_url("https://93.184.216.34/hook", allowed_hosts=["hooks.internal"])
+
+
+def test_job_endpoints(client):
+    """Test submitting a job and reading it back"""
+    application = {
+        "applicant_name": "Jane Doe",
+        "applicant_age": 45,
+        "email": "jane@example.com",
+        "phone": "555-010-0100",
+        "medical_history": {"conditions": ["hypertension"]},
+        "risk_factors": {"smoking": False},
+        "coverage_amount": 250000
+    }
+
+    response = client.post("/api/complex/jobs/", json=application)
+    assert response.status_code == 202
+    job = response.json()
+    assert job["status"] == JOB_QUEUED
+    assert job["application_id"] is not None
+    assert job["status_url"].endswith(f"/api/complex/jobs/{job['id']}")
+
+    response = client.get(f"/api/complex/jobs/{job['id']}?wait=0.1")
+    assert response.status_code == 200
+    assert response.json()["id"] == job["id"]
+
+    assert client.get("/api/complex/jobs/unknown").status_code == 404
+    assert client.post("/api/complex/jobs/?callback_url=file:///etc/passwd", json=application).status_code == 422
+    assert client.post("/api/complex/jobs/?callback_url=http://169.254.169.254/", json=application).status_code == 422
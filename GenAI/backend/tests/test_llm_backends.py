@@ -0,0 +1,115 @@
+"""
+Tests for the pluggable LLM backends and the fake Ollama server
+"""
+import asyncio
+import json
+import random
+import pytest
+from fastapi.testclient import TestClient
+from app.services import llm_service as llm_service_module
+from app.services.llm_backends import FakeLLMBackend, FakeLLMError, LatencyDistribution, LLMBackend
+from app.services.fake_ollama_server import create_fake_ollama_app
+from app.services.llm_service import LLMService, ResponseSchema
+
+
+def test_latency_distributions():
+    """Test parsing and sampling of latency specs"""
+    rng = random.Random(0)
+
+    assert LatencyDistribution.parse("constant:0.5").sample(rng) == 0.5
+    assert 0.2 <= LatencyDistribution.parse("uniform:0.2,0.4").sample(rng) <= 0.4
+    assert LatencyDistribution.parse("normal:0,0.001").sample(rng) >= 0
+    assert LatencyDistribution.parse("lognormal:1.0,0.5").sample(rng) > 0
+    with pytest.raises(ValueError):
+        LatencyDistribution.parse("pareto:1,2")
+    with pytest.raises(ValueError):
+        LatencyDistribution.parse("uniform:1")
+
+
+def test_fake_backend_answers_structured_generation(monkeypatch):
+    """Test that the fake backend's answers parse and are reproducible for a seed"""
+    monkeypatch.setenv("LLM_BACKEND", "fake")
+    monkeypatch.setenv("FAKE_LLM_LATENCY", "constant:0")
+    monkeypatch.setenv("FAKE_LLM_TOKENS_PER_SECOND", "0")
+    monkeypatch.setattr(llm_service_module, "llm_response_cache", llm_service_module.LLMResponseCache(path=None))
+
+    async def generate():
+        service = LLMService()
+        return await service.structured_generation(
+            input_variables={"age": 45},
+            prompt_template="Evaluate an applicant aged {age}",
+            output_schemas=[
+                ResponseSchema(name="decision", description="The decision"),
+                ResponseSchema(name="risk_score", description="The risk score")
+            ]
+        ), service.backend_stats()
+
+    first, stats = asyncio.run(generate())
+    second, _ = asyncio.run(generate())
+
+    assert first == second
+    assert first["decision"] in ("approve", "refer", "decline")
+    assert 0 <= first["risk_score"] <= 1
+    assert stats["calls"] == 1
+
+
+def test_fake_backend_error_injection_and_streaming():
+    """Test injected failures and that streamed chunks join to the full answer"""
+    failing = FakeLLMBackend(error_rate=1.0)
+    with pytest.raises(FakeLLMError):
+        asyncio.run(failing.ainvoke("prompt"))
+    assert failing.stats()["errors"] == 1
+
+    backend = FakeLLMBackend(tokens_per_second=10000, reasoning_tokens=8, seed=3)
+    other = FakeLLMBackend(tokens_per_second=10000, reasoning_tokens=8, seed=3)
+
+    async def stream():
+        return [chunk async for chunk in backend.astream("Return a JSON object with the following keys:\n decision\n")]
+
+    chunks = asyncio.run(stream())
+    text = asyncio.run(other.ainvoke("Return a JSON object with the following keys:\n decision\n"))
+
+    assert len(chunks) > 10
+    assert "".join(chunks) == text
+    assert text.startswith("<think>")
+    assert backend.stats()["tokens"] == len(chunks)
+
+
+def test_backend_interface_and_bounded_prompt_history(monkeypatch):
+    """Test that backends must implement the interface and repeat counts stay bounded"""
+    with pytest.raises(TypeError):
+        LLMBackend()
+
+    monkeypatch.setattr(FakeLLMBackend, "PROMPT_HISTORY_SIZE", 2)
+    backend = FakeLLMBackend()
+    first = asyncio.run(backend.ainvoke("Return a JSON object with the following keys:\n risk_score\n"))
+    for prompt in ("a", "b", "c"):
+        asyncio.run(backend.ainvoke(prompt))
+
+    assert len(backend._seen) == 2
+    # The evicted prompt starts over, so it gets its first answer again
+    assert asyncio.run(backend.ainvoke("Return a JSON object with the following keys:\n risk_score\n")) == first
+
+
+def test_fake_ollama_server_speaks_the_generate_api():
+    """Test streaming and non-streaming /api/generate and error responses"""
+    client = TestClient(create_fake_ollama_app(FakeLLMBackend(), model="deepseek-r1:32b"))
+    prompt = "Return a JSON object with the following keys:\n decision, reason\n"
+
+    response = client.post("/api/generate", json={"model": "deepseek-r1:32b", "prompt": prompt, "stream": False})
+    assert response.status_code == 200
+    assert response.json()["done"] is True
+    assert json.loads(response.json()["response"].strip("`\njson"))["reason"] == "Simulated reason"
+
+    response = client.post("/api/generate", json={"model": "deepseek-r1:32b", "prompt": prompt})
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert all(not line["done"] for line in lines[:-1])
+    assert lines[-1]["done"] is True
+    assert lines[-1]["eval_count"] == len(lines) - 1
+
+    assert client.get("/api/tags").json()["models"][0]["name"] == "deepseek-r1:32b"
+
+    failing = TestClient(create_fake_ollama_app(FakeLLMBackend(error_rate=1.0)))
+    response = failing.post("/api/generate", json={"model": "x", "prompt": prompt})
+    assert response.status_code == 500
+    assert "error" in response.json()
@@ -0,0 +1,121 @@
+"""
+Tests for the persistent LLM response cache
+"""
+import asyncio
+import json
+from app.services.llm_response_cache import LLMResponseCache
+from app.services import llm_service as llm_service_module
+from app.services.llm_service import LLMService, ResponseSchema
+
+
+def test_key_depends_on_model_prompt_and_temperature():
+    """Test that every keyed field changes the key"""
+    key = LLMResponseCache.make_key("deepseek-r1:32b", "prompt", 0.1)
+
+    assert key == LLMResponseCache.make_key("deepseek-r1:32b", "prompt", 0.1)
+    assert key != LLMResponseCache.make_key("deepseek-r1:32b", "prompt", 0.1, backend="fake")
+    assert key != LLMResponseCache.make_key("deepseek-r1:7b", "prompt", 0.1)
+    assert key != LLMResponseCache.make_key("deepseek-r1:32b", "prompt ", 0.1)
+    assert key != LLMResponseCache.make_key("deepseek-r1:32b", "prompt", 0.2)
+
+
+def test_responses_persist_across_instances(tmp_path):
+    """Test that a new cache on the same file sees stored responses"""
+    path = str(tmp_path / "responses.sqlite3")
+    LLMResponseCache(path).set("key", '{"decision": "approve"}')
+
+    cache = LLMResponseCache(path)
+    assert cache.get("key") == '{"decision": "approve"}'
+    assert cache.get("missing") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_expired_and_least_recently_used_entries_are_dropped(tmp_path, monkeypatch):
+    """Test TTL expiry and size eviction"""
+    import app.services.llm_response_cache as cache_module
+
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "time", lambda: now[0])
+    cache = LLMResponseCache(str(tmp_path / "responses.sqlite3"), maxsize=2, ttl_seconds=60)
+
+    cache.set("a", "A")
+    now[0] += 1
+    cache.set("b", "B")
+    now[0] += 1
+    assert cache.get("a") == "A"
+
+    # "b" is the least recently used entry
+    now[0] += 1
+    cache.set("c", "C")
+    assert cache.get("b") is None
+    assert cache.stats()["evictions"] == 1
+
+    now[0] += 120
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_disabled_without_path():
+    """Test that an empty path turns the cache off"""
+    cache = LLMResponseCache(None)
+    cache.set("key", "value")
+
+    assert cache.get("key") is None
+    assert cache.stats()["enabled"] is False
+
+
+def test_structured_generation_uses_response_cache(tmp_path, monkeypatch):
+    """Test that identical prompts are answered from the cache unless bypassed"""
+    calls = []
+
+    class CountingLLM:
+        async def ainvoke(self, prompt):
+            calls.append(prompt)
+            return json.dumps({"decision": "approve", "reason": f"call {len(calls)}"})
+
+    monkeypatch.setattr(llm_service_module, "_create_llm", CountingLLM)
+    monkeypatch.setattr(
+        llm_service_module, "llm_response_cache", LLMResponseCache(str(tmp_path / "responses.sqlite3"))
+    )
+    service = LLMService()
+
+    async def generate(age, use_cache=True):
+        return await service.structured_generation(
+            input_variables={"age": age},
+            prompt_template="Evaluate an applicant aged {age}",
+            output_schemas=[ResponseSchema(name="decision", description="The decision")],
+            use_cache=use_cache
+        )
+
+    async def run_test():
+        return [
+            await generate(45),
+            await generate(45),
+            await generate(50),
+            await generate(45, use_cache=False)
+        ]
+
+    first, repeated, other, bypassed = asyncio.run(run_test())
+
+    assert repeated == first
+    assert other["reason"] == "call 2"
+    assert bypassed["reason"] == "call 3"
+    assert len(calls) == 3
+
+
+def test_service_keys_separate_backends_and_hosts(monkeypatch):
+    """Test that fake or stand-in answers are never keyed like the real model's"""
+    service = LLMService()
+
+    def key():
+        return service._prepare({"age": 40}, "Applicant aged {age}", [ResponseSchema(name="decision", description="d")])[2]
+
+    monkeypatch.setenv("LLM_BACKEND", "ollama")
+    real = key()
+    monkeypatch.setattr(llm_service_module, "OLLAMA_HOST", "http://localhost:11500")
+    stand_in = key()
+    monkeypatch.setenv("LLM_BACKEND", "fake")
+    fake = key()
+
+    assert len({real, stand_in, fake}) == 3
@@ -0,0 +1,121 @@
+"""
+Tests for the LLM request scheduler
+"""
+import asyncio
+import time
+import pytest
+from app.services.llm_scheduler import (
+    LLMScheduler,
+    LLMDeadlineExceeded,
+    PRIORITY_BATCH,
+    PRIORITY_INTERACTIVE,
+    current_request_options,
+    llm_request_options,
+)
+
+
+def test_concurrency_is_bounded():
+    """Test that no more than max_concurrency calls hold a slot at once"""
+    scheduler = LLMScheduler(max_concurrency=2)
+    running = []
+    peak = []
+
+    async def call():
+        async with scheduler.slot(PRIORITY_INTERACTIVE):
+            running.append(1)
+            peak.append(len(running))
+            await asyncio.sleep(0.01)
+            running.pop()
+
+    async def run():
+        await asyncio.gather(*[call() for _ in range(6)])
+
+    asyncio.run(run())
+
+    assert max(peak) == 2
+    stats = scheduler.stats()
+    assert stats["admitted"] == 6
+    assert stats["completed"] == 6
+    assert stats["active"] == 0
+    assert stats["max_queue_depth"] == 4
+
+
+def test_interactive_requests_run_before_batch():
+    """Test that queued interactive calls overtake queued batch calls"""
+    scheduler = LLMScheduler(max_concurrency=1)
+    order = []
+
+    async def call(name, priority):
+        async with scheduler.slot(priority):
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    async def run():
+        first = asyncio.ensure_future(call("first", PRIORITY_BATCH))
+        await asyncio.sleep(0)
+        queued = [
+            asyncio.ensure_future(call("batch-1", PRIORITY_BATCH)),
+            asyncio.ensure_future(call("batch-2", PRIORITY_BATCH)),
+            asyncio.ensure_future(call("interactive", PRIORITY_INTERACTIVE)),
+        ]
+        await asyncio.sleep(0)
+        assert scheduler.stats()["queued"] == {"interactive": 1, "batch": 2}
+        await asyncio.gather(first, *queued)
+
+    asyncio.run(run())
+
+    assert order == ["first", "interactive", "batch-1", "batch-2"]
+
+
+def test_expired_and_cancelled_waiters_never_run():
+    """Test that waiters leaving the queue don't reach the model or leak slots"""
+    scheduler = LLMScheduler(max_concurrency=1)
+    ran = []
+
+    async def call(name, deadline=None):
+        async with scheduler.slot(PRIORITY_INTERACTIVE, deadline):
+            ran.append(name)
+            await asyncio.sleep(0.05)
+
+    async def run():
+        holder = asyncio.ensure_future(call("holder"))
+        await asyncio.sleep(0)
+
+        expiring = asyncio.ensure_future(call("expiring", deadline=time.monotonic() + 0.01))
+        disconnected = asyncio.ensure_future(call("disconnected"))
+        await asyncio.sleep(0)
+        disconnected.cancel()
+
+        with pytest.raises(LLMDeadlineExceeded):
+            await expiring
+        with pytest.raises(asyncio.CancelledError):
+            await disconnected
+        await holder
+
+        # The slot is free again afterwards
+        await call("after")
+
+    asyncio.run(run())
+
+    assert ran == ["holder", "after"]
+    stats = scheduler.stats()
+    assert stats["expired"] == 1
+    assert stats["cancelled"] == 1
+    assert stats["queued"] == {"interactive": 0, "batch": 0}
+    assert stats["active"] == 0
+
+
+def test_request_options_are_inherited_by_tasks():
+    """Test that priority and deadline set for a request reach its agent tasks"""
+    async def agent_call():
+        return current_request_options()
+
+    async def run():
+        with llm_request_options(PRIORITY_BATCH, timeout=30):
+            return await asyncio.gather(agent_call(), agent_call())
+
+    results = asyncio.run(run())
+
+    assert all(priority == PRIORITY_BATCH for priority, _ in results)
+    assert all(deadline is not None and deadline > time.monotonic() for _, deadline in results)
+    assert current_request_options() == (PRIORITY_INTERACTIVE, None)
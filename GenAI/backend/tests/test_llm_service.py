@@ -1,8 +1,11 @@
 """
 Tests for the LLM service component
 """
+import os
+import json
 import pytest
 import asyncio
+from tenacity import RetryError, wait_none
 from app.services.llm_service import LLMService, ResponseSchema
 
 
@@ -33,26 +36,17 @@ def test_generate_text_sync(mock_llm_service, monkeypatch):
 
 def test_structured_generation(mock_llm_service, monkeypatch):
     """Test structured generation with schema"""
-    # Define a mock ainvoke method that returns structured data
-    async def mock_ainvoke(self, input_vars):
-        return {
+    # Define a mock ainvoke method that returns the model's JSON answer
+    async def mock_ainvoke(self, prompt):
+        return json.dumps({
             "premium": 1250.75,
             "risk_assessment": "Moderate risk due to medical history",
             "recommendation": "Standard coverage with slight premium increase"
-        }
+        })
     
     # Apply the mock
     monkeypatch.setattr(mock_llm_service.llm.__class__, "ainvoke", mock_ainvoke)
     
-    # Create a mock chain class
-    class MockChain:
-        async def ainvoke(self, input_vars):
-            return {
-                "premium": 1250.75,
-                "risk_assessment": "Moderate risk due to medical history",
-                "recommendation": "Standard coverage with slight premium increase"
-            }
-    
     # Test structured generation
     async def run_test():
         # Schema definition
@@ -62,9 +56,6 @@ def test_structured_generation(mock_llm_service, monkeypatch):
             ResponseSchema(name="recommendation", description="Recommendation for coverage")
         ]
         
-        # Override the LLMChain with our mock
-        monkeypatch.setattr("langchain.chains.LLMChain", lambda **kwargs: MockChain())
-        
         # Test input
         input_vars = {
             "age": 45,
@@ -87,8 +78,7 @@ def test_structured_generation(mock_llm_service, monkeypatch):
         assert "Moderate risk" in result["risk_assessment"]
     
     # Run the async test
-    loop = asyncio.get_event_loop()
-    loop.run_until_complete(run_test())
+    asyncio.run(run_test())
 
 
 def test_generate_text_with_retry(mock_llm_service, monkeypatch):
@@ -102,16 +92,17 @@ def test_generate_text_with_retry(mock_llm_service, monkeypatch):
         if call_count["count"] < 3:
             raise ConnectionError("Simulated connection error")
         
-        class MockGenerations:
-            generations = [[MockGeneration()]]
-        
         class MockGeneration:
             text = f"Success on attempt {call_count['count']}"
         
+        class MockGenerations:
+            generations = [[MockGeneration()]]
+        
         return MockGenerations()
     
-    # Apply the mock
+    # Apply the mock, retrying without the backoff delay
     monkeypatch.setattr(mock_llm_service.llm.__class__, "agenerate", mock_agenerate)
+    monkeypatch.setattr(LLMService.generate_text.retry, "wait", wait_none())
     
     # Test the retry mechanism
     async def run_test():
@@ -123,11 +114,10 @@ def test_generate_text_with_retry(mock_llm_service, monkeypatch):
         
         # Should succeed on the third attempt
         assert call_count["count"] == 3
-        assert "Success on attempt 3" in response.generations[0].text
+        assert "Success on attempt 3" in response.generations[0][0].text
     
     # Run the async test
-    loop = asyncio.get_event_loop()
-    loop.run_until_complete(run_test())
+    asyncio.run(run_test())
 
 
 def test_error_handling_exceeded_retries(mock_llm_service, monkeypatch):
@@ -136,18 +126,213 @@ def test_error_handling_exceeded_retries(mock_llm_service, monkeypatch):
     async def mock_agenerate(self, prompts):
         raise ConnectionError("Simulated persistent connection error")
     
-    # Apply the mock
+    # Apply the mock, retrying without the backoff delay
     monkeypatch.setattr(mock_llm_service.llm.__class__, "agenerate", mock_agenerate)
+    monkeypatch.setattr(LLMService.generate_text.retry, "wait", wait_none())
     
     # Test the retry mechanism
     async def run_test():
         # Test prompt
         test_prompt = "Test max retries exceeded"
         
-        # Should raise an error after max retries
-        with pytest.raises(ConnectionError):
+        # Should raise an error wrapping the last failure after max retries
+        with pytest.raises(RetryError) as excinfo:
             await mock_llm_service.generate_text(test_prompt)
+        assert isinstance(excinfo.value.last_attempt.exception(), ConnectionError)
+        assert excinfo.value.last_attempt.attempt_number == 3
     
     # Run the async test
-    loop = asyncio.get_event_loop()
-    loop.run_until_complete(run_test()) 
\ No newline at end of file
+    asyncio.run(run_test()) 
+
+def test_shared_calls_follow_each_callers_priority_and_deadline(monkeypatch):
+    """Test that an interactive joiner doesn't wait on a batch flight, nor on the first caller's deadline"""
+    import app.services.llm_service as llm_service_module
+    from app.services.llm_response_cache import LLMResponseCache
+    from app.services.llm_scheduler import (
+        LLMScheduler, LLMDeadlineExceeded, PRIORITY_BATCH, PRIORITY_INTERACTIVE,
+        current_request_options, llm_request_options
+    )
+    from app.services.single_flight import SingleFlight
+
+    calls = []
+
+    class SlowLLM:
+        async def ainvoke(self, prompt):
+            calls.append(current_request_options()[0])
+            await asyncio.sleep(0.1)
+            return json.dumps({"decision": "approve"})
+
+    scheduler = LLMScheduler(max_concurrency=1)
+    flight = SingleFlight()
+    monkeypatch.setattr(llm_service_module, "_create_llm", SlowLLM)
+    monkeypatch.setattr(llm_service_module, "llm_response_cache", LLMResponseCache(None))
+    monkeypatch.setattr(llm_service_module, "llm_scheduler", scheduler)
+    monkeypatch.setattr(llm_service_module, "llm_inflight", flight)
+    service = LLMService()
+
+    async def generate(priority, timeout=None):
+        with llm_request_options(priority, timeout=timeout):
+            return await service.structured_generation(
+                input_variables={"age": 45},
+                prompt_template="Evaluate an applicant aged {age}",
+                output_schemas=[ResponseSchema(name="decision", description="The decision")]
+            )
+
+    async def run():
+        # Hold the only model slot until every call is queued behind it
+        async with scheduler.slot(PRIORITY_BATCH):
+            batch = asyncio.ensure_future(generate(PRIORITY_BATCH))
+            await asyncio.sleep(0.01)
+            impatient = asyncio.ensure_future(generate(PRIORITY_INTERACTIVE, timeout=0.06))
+            await asyncio.sleep(0.01)
+            patient = asyncio.ensure_future(generate(PRIORITY_INTERACTIVE))
+            await asyncio.sleep(0.01)
+            assert scheduler.stats()["queued"] == {"interactive": 1, "batch": 1}
+        return await asyncio.gather(batch, impatient, patient, return_exceptions=True)
+
+    batch, impatient, patient = asyncio.run(run())
+
+    assert calls == [PRIORITY_INTERACTIVE, PRIORITY_BATCH]
+    assert batch == {"decision": "approve"}
+    assert patient == {"decision": "approve"}
+    assert isinstance(impatient, LLMDeadlineExceeded)
+    assert flight.stats()["started"] == 2
+    assert flight.stats()["coalesced"] == 1
+
+
+# Modules that must only be imported when the LLM or vector store is first used
+DEFERRED_MODULES = [
+    "langchain",
+    "langchain_core",
+    "langchain_ollama",
+    "langchain_chroma",
+    "langchain_huggingface",
+    "chromadb",
+    "sentence_transformers",
+]
+
+# Cumulative import time allowed for the service modules the API imports
+IMPORT_TIME_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "1500"))
+
+
+def test_service_import_time_budget():
+    """Test that importing the services stays within the startup budget (python -X importtime)"""
+    import subprocess
+    import sys
+    
+    modules = ["app.services.llm_service", "app.services.ai_underwriting", "app.services.crewai_orchestration"]
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import " + ", ".join(modules)],
+        capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+    
+    # Lines look like "import time:  self [us] | cumulative | imported package"
+    cumulative_us = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        cumulative_us[name.strip()] = int(cumulative)
+    
+    loaded_heavy = [name for name in cumulative_us if name.split(".")[0] in DEFERRED_MODULES]
+    assert loaded_heavy == []
+    
+    total_ms = sum(cumulative_us[module] for module in modules if module in cumulative_us) / 1000
+    assert total_ms <= IMPORT_TIME_BUDGET_MS, f"Service import time {total_ms:.1f}ms exceeds budget {IMPORT_TIME_BUDGET_MS:.0f}ms"
+
+
+def test_get_llm_service_defers_client_creation(monkeypatch):
+    """Test that the Ollama client is only built when first used"""
+    from app.services import llm_service as llm_service_module
+    
+    created = []
+    monkeypatch.setattr(llm_service_module, "_create_llm", lambda: created.append(object()) or created[-1])
+    monkeypatch.setattr(llm_service_module, "_llm_service", None)
+    
+    service = llm_service_module.get_llm_service()
+    assert service is llm_service_module.get_llm_service()
+    assert created == []
+    
+    assert service.llm is created[0]
+    assert service.llm is created[0]
+    assert len(created) == 1
+
+
+def test_structured_generation_reuses_compiled_prompts(monkeypatch):
+    """Test that prompt templates and parsers are compiled once per template and schema set"""
+    from app.services import llm_service as llm_service_module
+    
+    prompts = []
+    
+    class RecordingLLM:
+        async def ainvoke(self, prompt):
+            prompts.append(prompt)
+            return '```json\n{"decision": "approve", "reason": "Low risk"}\n```'
+    
+    monkeypatch.setattr(llm_service_module, "_create_llm", RecordingLLM)
+    monkeypatch.setattr(llm_service_module, "llm_response_cache", llm_service_module.LLMResponseCache(path=None))
+    llm_service_module.compile_prompt.cache_clear()
+    service = LLMService()
+    
+    output_schemas = [
+        ResponseSchema(name="decision", description="The underwriting decision"),
+        ResponseSchema(name="reason", description="Reasoning for the decision")
+    ]
+    template = "Evaluate an applicant aged {age} with history {medical_history}"
+    
+    async def run_test():
+        return [
+            await service.structured_generation(
+                input_variables={"age": age, "medical_history": json.dumps({"conditions": ["asthma"]})},
+                prompt_template=template,
+                output_schemas=output_schemas
+            )
+            for age in (30, 45, 60)
+        ]
+    
+    results = asyncio.run(run_test())
+    
+    assert results == [{"decision": "approve", "reason": "Low risk"}] * 3
+    assert "aged 45" in prompts[1]
+    assert '{"conditions": ["asthma"]}' in prompts[1]
+    assert "decision, reason" in prompts[0]
+    
+    cache_info = llm_service_module.compile_prompt.cache_info()
+    assert cache_info.misses == 1
+    assert cache_info.hits == 2
+
+
+def test_identical_in_flight_prompts_share_one_call(monkeypatch):
+    """Test that concurrent identical requests are coalesced into one model call"""
+    from app.services import llm_service as llm_service_module
+    from app.services.single_flight import SingleFlight
+    
+    calls = []
+    
+    class SlowLLM:
+        async def ainvoke(self, prompt):
+            calls.append(prompt)
+            await asyncio.sleep(0.05)
+            return json.dumps({"decision": "refer"})
+    
+    monkeypatch.setattr(llm_service_module, "_create_llm", SlowLLM)
+    monkeypatch.setattr(llm_service_module, "llm_response_cache", llm_service_module.LLMResponseCache(path=None))
+    monkeypatch.setattr(llm_service_module, "llm_inflight", SingleFlight())
+    service = LLMService()
+    
+    def generate(age):
+        return service.structured_generation(
+            input_variables={"age": age},
+            prompt_template="Evaluate an applicant aged {age}",
+            output_schemas=[ResponseSchema(name="decision", description="The decision")]
+        )
+    
+    async def run_test():
+        return await asyncio.gather(generate(45), generate(45), generate(45), generate(50))
+    
+    results = asyncio.run(run_test())
+    
+    assert results == [{"decision": "refer"}] * 4
+    assert len(calls) == 2
+    assert llm_service_module.llm_inflight.stats() == {"in_flight": 0, "started": 2, "coalesced": 2, "abandoned": 0}
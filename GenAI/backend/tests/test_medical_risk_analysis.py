@@ -0,0 +1,220 @@
+"""
+Tests for the medical risk analysis component
+"""
+import random
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.database.database import Base
+from app.models.insurance import MedicalCondition
+from app.services.condition_index import ConditionIndex
+from app.services.medical_risk_analysis import VectorStore, analyze_medical_risk
+
+
+def linear_search(conditions, query, top_k=3):
+    """Reference implementation: the original scan over every condition"""
+    results = []
+    query = query.lower()
+    for condition, data in conditions.items():
+        if query in condition or condition in query:
+            results.append({"condition": condition, "similarity": 0.9, "data": data})
+        elif any(word in condition for word in query.split()):
+            results.append({"condition": condition, "similarity": 0.7, "data": data})
+    results.sort(key=lambda x: x["similarity"], reverse=True)
+    return results[:top_k]
+
+
+def test_index_matches_linear_scan_on_builtin_catalogue():
+    """Test that the index returns the same records as a linear scan"""
+    store = VectorStore()
+    queries = [
+        "Type 2 diabetes", "High blood pressure", "heart", "art", "a", "",
+        "chronic heart disease and asthma", "seasonal allergies", "HYPERTENSION", "broken leg"
+    ]
+    for query in queries:
+        for top_k in (1, 3, 10):
+            assert store.search(query, top_k) == linear_search(store.medical_conditions, query, top_k)
+
+
+def test_index_matches_linear_scan_on_large_catalogue():
+    """Test equivalence on a generated catalogue with overlapping names"""
+    rng = random.Random(7)
+    words = ["".join(rng.choice("abcdeio") for _ in range(rng.randint(2, 7))) for _ in range(300)]
+    conditions = {}
+    while len(conditions) < 5000:
+        name = " ".join(rng.sample(words, rng.randint(1, 3)))
+        conditions[name] = {"risk_score": rng.random(), "description": name.title(), "complications": [name]}
+
+    index = ConditionIndex.from_dict(conditions)
+    for _ in range(300):
+        query = " ".join(rng.sample(words, rng.randint(1, 2)))
+        if rng.random() < 0.3:
+            query = query[rng.randint(0, len(query) - 1):]
+        assert index.search(query, 5) == linear_search(conditions, query, 5)
+
+
+def test_index_matches_linear_scan_on_repetitive_names():
+    """Test that repeated and overlapping grams don't produce false substring matches"""
+    rng = random.Random(11)
+    conditions = {}
+    while len(conditions) < 2000:
+        name = "".join(rng.choice(["ab", "aba", "b", "ba ", "a"]) for _ in range(rng.randint(1, 8))).strip()
+        if name:
+            conditions[name] = {"risk_score": rng.random(), "description": "", "complications": []}
+
+    index = ConditionIndex.from_dict(conditions)
+    names = list(conditions)
+    for _ in range(300):
+        name = rng.choice(names)
+        start = rng.randint(0, len(name) - 1)
+        query = name[start:start + rng.randint(1, 9)] + rng.choice(["", "a", "b", "ab", " ba"])
+        for top_k in (3, 50):
+            assert index.search(query, top_k) == linear_search(conditions, query, top_k)
+
+
+def test_analyze_medical_risk():
+    """Test medical risk assessment from matched conditions"""
+    result = analyze_medical_risk({"conditions": ["Lung cancer", "mild asthma"]})
+
+    assert [c["matched_condition"] for c in result["identified_conditions"]] == ["cancer", "asthma"]
+    assert result["risk_score"] == (0.90 + 0.45) / 2
+    assert result["risk_assessment"] == "High risk due to serious medical conditions."
+
+
+def test_catalogue_loads_from_database_and_reloads_on_change():
+    """Test that the snapshot is replaced only when the table changes"""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    store = VectorStore(session_factory=session_factory)
+
+    # An empty table keeps the built-in catalogue
+    assert store.load_from_database() is False
+    assert store.search("diabetes")[0]["condition"] == "diabetes"
+
+    db = session_factory()
+    db.add(MedicalCondition(name="Chronic Kidney Disease", description="Loss of kidney function", base_risk_score=0.7))
+    db.commit()
+
+    assert store.load_from_database() is True
+    assert store.load_from_database() is False
+    results = store.search("kidney disease")
+    assert results[0]["condition"] == "Chronic Kidney Disease"
+    assert results[0]["data"]["risk_score"] == 0.7
+    assert store.search("diabetes") == []
+
+    db.add(MedicalCondition(name="Diabetes", base_risk_score=0.75))
+    db.commit()
+    db.close()
+
+    assert store.load_from_database() is True
+    assert store.search("diabetes")[0]["data"]["risk_score"] == 0.75
+
+
+def test_analyze_medical_risk_batch_matches_single():
+    """Test that batch analysis matches analyzing each history on its own"""
+    from app.services.medical_risk_analysis import analyze_medical_risk_batch
+
+    histories = [
+        {"conditions": ["Type 2 diabetes", "High blood pressure"]},
+        {"conditions": []},
+        {},
+        {"conditions": ["broken leg"]},
+        {"conditions": ["asthma", "Type 2 diabetes", "anxiety", "seasonal allergies"]},
+        {"conditions": ["Lung cancer"]},
+        {"conditions": ["depression", "arthritis"]}
+    ]
+
+    assert analyze_medical_risk_batch(histories) == [analyze_medical_risk(history) for history in histories]
+    assert analyze_medical_risk_batch([]) == []
+
+
+def test_analyze_medical_risk_batch_without_conditions():
+    """Test that missing or null condition lists count as no conditions"""
+    from app.services.medical_risk_analysis import analyze_medical_risk_batch
+
+    histories = [{"conditions": None}, {}, {"conditions": ["asthma"]}]
+    results = analyze_medical_risk_batch(histories)
+
+    assert results[0] == analyze_medical_risk({"conditions": None})
+    assert results[1] == analyze_medical_risk({})
+    assert results[2] == analyze_medical_risk({"conditions": ["asthma"]})
+
+
+class KeywordEmbeddings:
+    """Deterministic stand-in for the sentence-transformers model"""
+    vocabulary = ["blood", "pressure", "hypertension", "sugar", "diabetes", "heart", "lung"]
+    synonyms = {"hypertension": ["blood", "pressure"], "diabetes": ["blood", "sugar"]}
+
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        vectors = []
+        for text in texts:
+            words = []
+            for word in text.lower().split():
+                words.extend(self.synonyms.get(word, [word]))
+            vectors.append([float(words.count(term)) for term in self.vocabulary])
+        return vectors
+
+
+def test_semantic_matcher_top_k_and_query_cache(tmp_path):
+    """Test embedding matching, on-disk matrix reuse and query embedding caching"""
+    from app.services.semantic_condition_matcher import SemanticConditionMatcher
+
+    store = VectorStore()
+    embeddings = KeywordEmbeddings()
+    matcher = SemanticConditionMatcher(store.index, embeddings=embeddings, cache_dir=str(tmp_path))
+
+    results = matcher.search_batch(["high blood pressure", "blood sugar"], top_k=2)
+    assert results[0][0]["condition"] == "hypertension"
+    assert results[1][0]["condition"] == "diabetes"
+    assert results[0][0]["similarity"] >= results[0][1]["similarity"]
+
+    # Repeated queries are not embedded again
+    matcher.search("high blood pressure")
+    assert embeddings.calls[-1] == ["high blood pressure", "blood sugar"]
+
+    # A second matcher memory-maps the saved catalogue matrix instead of re-embedding it
+    reloaded = SemanticConditionMatcher(store.index, embeddings=KeywordEmbeddings(), cache_dir=str(tmp_path))
+    assert reloaded.search("blood sugar")[0]["condition"] == "diabetes"
+    assert reloaded.embeddings.calls == [["blood sugar"]]
+
+
+def test_search_falls_back_to_semantic_matching(tmp_path, monkeypatch):
+    """Test that conditions with no name match use embedding similarity"""
+    monkeypatch.setattr("app.services.medical_risk_analysis.CONDITION_EMBEDDING_DIR", str(tmp_path))
+    store = VectorStore(semantic_matching=True, embeddings=KeywordEmbeddings())
+
+    assert store.search("asthma")[0]["similarity"] == 0.9
+    assert store.search("pressure")[0]["condition"] == "hypertension"
+
+
+def test_refresh_embeds_catalogue_off_the_request_path(tmp_path, monkeypatch):
+    """Test that refresh builds each snapshot's matrix and removes the previous one"""
+    monkeypatch.setattr("app.services.medical_risk_analysis.CONDITION_EMBEDDING_DIR", str(tmp_path))
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    embeddings = KeywordEmbeddings()
+    store = VectorStore(session_factory=session_factory, semantic_matching=True, embeddings=embeddings)
+
+    # Startup keeps the built-in catalogue but still embeds it
+    assert store.refresh() is False
+    assert len(embeddings.calls) == 1
+    assert len(list(tmp_path.glob("*.npy"))) == 1
+    assert store.search("pressure")[0]["condition"] == "hypertension"
+    assert embeddings.calls[1:] == [["pressure"]]
+
+    db = session_factory()
+    db.add(MedicalCondition(name="Hypertension", base_risk_score=0.6))
+    db.add(MedicalCondition(name="Heart Disease", base_risk_score=0.8))
+    db.commit()
+    db.close()
+
+    assert store.refresh() is True
+    assert sorted(embeddings.calls[2]) == ["heart disease", "hypertension"]
+    assert [path.name for path in tmp_path.glob("*.npy")] == [store.semantic_matcher.matrix_path.split("/")[-1]]
+    assert store.search("blood pressure")[0]["condition"] == "Hypertension"
+    assert len(embeddings.calls) == 4
@@ -0,0 +1,127 @@
+"""
+Tests for the premium calculator component
+"""
+import random
+import numpy as np
+from app.schemas.insurance import PremiumCalculationRequest
+from app.services.premium_calculator import (
+    llm_service,
+    calculate_premium,
+    price_application,
+    calculate_premiums_batch,
+    calculate_premium_quotes,
+    encode_conditions,
+    CONDITION_CODE_NONE,
+    CONDITION_CODE_MEDIUM,
+    CONDITION_CODE_HIGH
+)
+
+
+def test_encode_conditions():
+    """Test that condition lists are encoded into a padded code matrix"""
+    codes = encode_conditions([["Type 2 diabetes", "asthma"], [], ["broken arm"]])
+
+    assert codes.shape == (3, 2)
+    assert codes[0].tolist() == [CONDITION_CODE_HIGH, CONDITION_CODE_MEDIUM]
+    assert codes[1].tolist() == [CONDITION_CODE_NONE, CONDITION_CODE_NONE]
+    assert codes[2].tolist() == [CONDITION_CODE_NONE, CONDITION_CODE_NONE]
+
+
+def test_batch_matches_scalar_pricing():
+    """Test that the batch engine gives the same results as pricing one applicant at a time"""
+    rng = random.Random(42)
+    conditions = ["diabetes", "Asthma", "broken arm", "Heart Disease", "anxiety", "cancer"]
+
+    ages = [rng.randint(18, 100) for _ in range(2000)]
+    coverage = [rng.choice([0, 100000, 250000.5, rng.uniform(1, 10000000)]) for _ in range(2000)]
+    smoking = [rng.random() < 0.3 for _ in range(2000)]
+    applicant_conditions = [rng.sample(conditions, rng.randint(0, 4)) for _ in range(2000)]
+
+    result = calculate_premiums_batch(ages, coverage, smoking, applicant_conditions)
+
+    for i in range(len(ages)):
+        expected = llm_service.price(ages[i], coverage[i], smoking[i], applicant_conditions[i])
+        assert result["premium_amount"][i] == expected["premium_amount"]
+        assert result["risk_assessment"][i] == expected["risk_assessment"]
+        assert result["ai_recommendation"][i] == expected["ai_recommendation"]
+        assert {name: values[i] for name, values in result["factors"].items()} == expected["factors"]
+
+
+def test_batch_accepts_condition_codes():
+    """Test pricing from a precomputed condition code matrix"""
+    codes = np.array([[CONDITION_CODE_HIGH, CONDITION_CODE_HIGH], [CONDITION_CODE_NONE, CONDITION_CODE_NONE]])
+
+    result = calculate_premiums_batch([25, 65], [100000, 200000], [False, True], codes)
+
+    assert result["premium_amount"].tolist() == [845.0, 4500.0]
+    assert result["risk_assessment"].tolist() == ["high", "high"]
+
+
+def test_empty_batch():
+    """Test that an empty batch returns empty arrays"""
+    result = calculate_premiums_batch([], [], [], [])
+
+    assert len(result["premium_amount"]) == 0
+    assert len(result["risk_assessment"]) == 0
+
+
+def test_price_application_from_request_and_dict():
+    """Test that the structured path prices requests and dicts identically"""
+    request = PremiumCalculationRequest(
+        applicant_age=52,
+        coverage_amount=300000,
+        medical_history={"conditions": ["Coverage gap after cage implant", "Asthma"]},
+        risk_factors={"smoking": True}
+    )
+
+    from_request = price_application(request)
+    from_dict = calculate_premium(request.to_dict())
+
+    assert from_request == from_dict
+    # 500 * age 2.0 * coverage 3.0 * smoking 1.5 * asthma 1.1
+    assert from_request["premium_amount"] == 4950.0
+    assert from_request["risk_assessment"] == "high"
+    assert from_request["factors"]["age_factor"] == 2.0
+
+
+def test_calculate_premium_skips_prompt_round_trip(monkeypatch):
+    """Test that pricing reads the structured fields, not a rendered prompt"""
+    def fail_generate(prompt, system_prompt=None):
+        raise AssertionError("prompt should not be rendered and parsed")
+
+    monkeypatch.setattr(llm_service, "generate_response", fail_generate)
+
+    result = calculate_premium({
+        "applicant_age": 25,
+        "coverage_amount": 100000,
+        "medical_history": {"conditions": []},
+        "risk_factors": {"smoking": False}
+    })
+
+    assert result["premium_amount"] == 500.0
+    assert result["risk_assessment"] == "low"
+
+
+def test_calculate_premium_quotes_share_the_quote_cache(monkeypatch):
+    """Test that batch quotes match calculate_premium and fill and read the same cache"""
+    from app.services import premium_calculator
+    from app.services.quote_cache import QuoteCache
+
+    cache = QuoteCache(version_func=premium_calculator.rating_tables_version)
+    monkeypatch.setattr(premium_calculator, "quote_cache", cache)
+    applications = [
+        {"applicant_age": age, "coverage_amount": 250000, "medical_history": {"conditions": conditions},
+         "risk_factors": {"smoking": smoking}}
+        for age, conditions, smoking in ((30, ["asthma"], False), (61, None, True), (45, ["diabetes", "cancer"], False))
+    ]
+
+    single = calculate_premium(applications[0])
+    quotes = calculate_premium_quotes(applications)
+
+    assert quotes[0] == single
+    assert cache.stats()["hits"] == 1
+    for application, quote in zip(applications[1:], quotes[1:]):
+        assert calculate_premium(application) == quote
+        assert price_application(application) == quote
+    assert cache.stats()["hits"] == 3
+
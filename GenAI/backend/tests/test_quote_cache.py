@@ -0,0 +1,94 @@
+"""
+Tests for the premium quote cache
+"""
+from app.services.quote_cache import QuoteCache, make_quote_key
+from app.services import premium_calculator
+
+
+def _profile(**overrides):
+    profile = {
+        "applicant_age": 40,
+        "coverage_amount": 250000,
+        "medical_history": {"conditions": ["Asthma", "diabetes"], "medications": ["Metformin"]},
+        "risk_factors": {"smoking": False, "dangerous_activities": ["skydiving", "diving"]}
+    }
+    profile.update(overrides)
+    return profile
+
+
+def test_quote_key_is_canonical():
+    """Test that ordering and case of list fields don't change the key"""
+    reordered = _profile(
+        coverage_amount=250000.0,
+        medical_history={"conditions": ["diabetes", "asthma"], "medications": ["metformin"]},
+        risk_factors={"dangerous_activities": ["diving", "skydiving"], "smoking": False}
+    )
+
+    assert make_quote_key(_profile()) == make_quote_key(reordered)
+    assert make_quote_key(_profile()) != make_quote_key(_profile(applicant_age=41))
+    assert make_quote_key(_profile()) != make_quote_key(_profile(), namespace="other")
+
+
+def test_cache_hits_misses_and_evictions():
+    """Test LRU eviction and hit/miss counters"""
+    cache = QuoteCache(maxsize=2, ttl_seconds=60)
+
+    cache.set("a", {"premium_amount": 1})
+    cache.set("b", {"premium_amount": 2})
+    assert cache.get("a") == {"premium_amount": 1}
+    cache.set("c", {"premium_amount": 3})
+
+    assert cache.get("b") is None
+    assert cache.get("c") == {"premium_amount": 3}
+
+    stats = cache.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["evictions"] == 1
+    assert stats["size"] == 2
+
+
+def test_cache_expires_entries():
+    """Test that entries past their TTL are not returned"""
+    cache = QuoteCache(maxsize=10, ttl_seconds=-1)
+
+    cache.set("a", {"premium_amount": 1})
+
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_cache_invalidated_when_rating_tables_change(monkeypatch):
+    """Test that changing the rating tables drops cached quotes"""
+    cache = QuoteCache(version_func=premium_calculator.rating_tables_version)
+    cache.set("a", {"premium_amount": 1})
+
+    monkeypatch.setattr(premium_calculator, "BASE_PREMIUM", 600)
+
+    assert cache.get("a") is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_calculate_premium_uses_cache(monkeypatch):
+    """Test that a repeated profile is answered without pricing again"""
+    cache = QuoteCache(version_func=premium_calculator.rating_tables_version)
+    monkeypatch.setattr(premium_calculator, "quote_cache", cache)
+
+    first = premium_calculator.calculate_premium(_profile())
+    second = premium_calculator.calculate_premium(_profile())
+
+    assert first == second
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_cached_quotes_are_isolated_from_callers():
+    """Test that mutating a returned quote, nested factors included, leaves the cache intact"""
+    cache = QuoteCache(maxsize=10, ttl_seconds=60)
+    quote = {"premium_amount": 1, "factors": {"age_factor": 1.5}}
+    cache.set("a", quote)
+
+    quote["factors"]["age_factor"] = 9
+    cache.get("a")["factors"]["age_factor"] = 9
+
+    assert cache.get("a") == {"premium_amount": 1, "factors": {"age_factor": 1.5}}
@@ -0,0 +1,71 @@
+"""
+Tests for single-flight call coalescing
+"""
+import asyncio
+import pytest
+from app.services.single_flight import SingleFlight
+
+
+def test_concurrent_callers_share_the_result_and_errors():
+    """Test that callers with the same key share one run, including its failure"""
+    flight = SingleFlight()
+    runs = []
+    
+    async def work(value):
+        runs.append(value)
+        await asyncio.sleep(0.01)
+        if value == "bad":
+            raise ValueError("model server error")
+        return value
+    
+    async def run():
+        shared = await asyncio.gather(*[flight.do("key", lambda: work("ok")) for _ in range(3)])
+        failed = await asyncio.gather(*[flight.do("other", lambda: work("bad")) for _ in range(2)], return_exceptions=True)
+        again = await flight.do("key", lambda: work("ok"))
+        return shared, failed, again
+    
+    shared, failed, again = asyncio.run(run())
+    
+    assert shared == ["ok"] * 3
+    assert all(isinstance(error, ValueError) for error in failed)
+    assert again == "ok"
+    assert runs == ["ok", "bad", "ok"]
+    assert flight.stats() == {"in_flight": 0, "started": 3, "coalesced": 3, "abandoned": 0}
+
+
+def test_cancelling_one_caller_keeps_the_shared_call_running():
+    """Test that the work is only cancelled when every caller has gone"""
+    flight = SingleFlight()
+    started = []
+    finished = []
+    
+    async def work():
+        started.append(1)
+        await asyncio.sleep(0.05)
+        finished.append(1)
+        return "done"
+    
+    async def run():
+        leader = asyncio.ensure_future(flight.do("key", work))
+        follower = asyncio.ensure_future(flight.do("key", work))
+        await asyncio.sleep(0)
+        
+        # The leader's client disconnects; the follower still gets the answer
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        assert await follower == "done"
+        
+        # When every caller leaves, the work itself is cancelled
+        lonely = asyncio.ensure_future(flight.do("other", work))
+        await asyncio.sleep(0)
+        lonely.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await lonely
+        await asyncio.sleep(0.1)
+    
+    asyncio.run(run())
+    
+    assert len(started) == 2
+    assert len(finished) == 1
+    assert flight.stats() == {"in_flight": 0, "started": 2, "coalesced": 1, "abandoned": 1}
@@ -0,0 +1,62 @@
+"""
+Tests for the incremental JSON parser used for streamed LLM answers
+"""
+import json
+import random
+from app.services.streaming_json import IncrementalJSONParser
+
+
+ANSWER = {
+    "decision": "approve",
+    "reasoning": "Low \"risk\" {profile}, stable history\n",
+    "premium_amount": 1234.5,
+    "special_conditions": ["annual check-up", {"exclusions": [1, 2]}],
+    "requires_review": False,
+    "notes": None
+}
+
+
+def _feed_in_chunks(text, seed):
+    rng = random.Random(seed)
+    parser = IncrementalJSONParser()
+    events = []
+    position = 0
+    while position < len(text):
+        size = rng.randint(1, 8)
+        events.extend(parser.feed(text[position:position + size]))
+        position += size
+    return parser, events
+
+
+def test_fields_match_full_parse_for_any_chunking():
+    """Test that fields are reassembled exactly whatever the chunk boundaries"""
+    text = "<think>Weigh the {rules} first.</think>\n```json\n" + json.dumps(ANSWER, indent=2) + "\n```"
+    
+    for seed in range(50):
+        parser, events = _feed_in_chunks(text, seed)
+        
+        assert "".join(data for event, data in events if event == "reasoning") == "Weigh the {rules} first."
+        assert dict(data for event, data in events if event == "field") == ANSWER
+        assert parser.fields == ANSWER
+        assert parser.done
+
+
+def test_decision_is_emitted_before_the_answer_is_complete():
+    """Test that a field is surfaced as soon as its value closes"""
+    parser = IncrementalJSONParser()
+    
+    assert parser.feed('{"decision": "decl') == []
+    assert parser.feed('ine", "reasoning": "Applicant exce') == [("field", ("decision", "decline"))]
+    assert parser.feed('eds age limit", "premium_amount": 12') == [("field", ("reasoning", "Applicant exceeds age limit"))]
+    assert parser.feed('00}') == [("field", ("premium_amount", 1200))]
+    assert parser.done
+
+
+def test_text_after_the_object_is_ignored():
+    """Test that trailing output doesn't produce events"""
+    parser = IncrementalJSONParser()
+    
+    events = parser.feed('{"decision": "refer"}\n{"decision": "approve"}')
+    
+    assert events == [("field", ("decision", "refer"))]
+    assert parser.feed("more text") == []
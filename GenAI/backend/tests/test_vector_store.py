@@ -107,4 +107,245 @@ def test_error_handling(monkeypatch):
     
     # Test delete_collection error handling
     with pytest.raises(ValueError):
-        vector_store.delete_collection() 
\ No newline at end of file
+        vector_store.delete_collection() 
+
+def test_cached_embeddings_skip_repeated_texts(tmp_path):
+    """Test that the embedding cache only runs the model for new texts"""
+    from app.database.embedding_cache import EmbeddingCache, CachedEmbeddings
+
+    class CountingEmbeddings:
+        def __init__(self):
+            self.documents = []
+            self.queries = []
+
+        def embed_documents(self, texts):
+            self.documents.extend(texts)
+            return [[float(len(text)), 1.0] for text in texts]
+
+        def embed_query(self, text):
+            self.queries.append(text)
+            return [float(len(text)), 0.5]
+
+    cache_path = str(tmp_path / "embeddings.sqlite3")
+    model = CountingEmbeddings()
+    embeddings = CachedEmbeddings(model, "test-model", cache=EmbeddingCache(path=cache_path))
+
+    first = embeddings.embed_documents(["diabetes", "asthma", "diabetes"])
+    second = embeddings.embed_documents(["asthma", "cancer"])
+    assert first == [[8.0, 1.0], [6.0, 1.0], [8.0, 1.0]]
+    assert second == [[6.0, 1.0], [6.0, 1.0]]
+    assert model.documents == ["diabetes", "asthma", "cancer"]
+
+    embeddings.embed_query("underwriting guidelines")
+    embeddings.embed_query("underwriting guidelines")
+    assert model.queries == ["underwriting guidelines"]
+
+    # A fresh process-level cache is filled from the on-disk store
+    restarted_model = CountingEmbeddings()
+    restarted = CachedEmbeddings(restarted_model, "test-model", cache=EmbeddingCache(path=cache_path))
+    assert restarted.embed_documents(["diabetes"]) == [[8.0, 1.0]]
+    assert restarted.embed_query("underwriting guidelines") == [23.0, 0.5]
+    assert restarted_model.documents == []
+    assert restarted_model.queries == []
+
+
+def test_embedding_cache_bounded_by_bytes():
+    """Test that cached vectors are float32 arrays evicted by total size"""
+    import numpy as np
+    from app.database.embedding_cache import EmbeddingCache
+
+    cache = EmbeddingCache(maxsize=100, max_bytes=3 * 384 * 4)
+    cache.set_many({f"key-{i}": [float(i)] * 384 for i in range(5)})
+
+    found = cache.get_many([f"key-{i}" for i in range(5)])
+    assert sorted(found) == ["key-2", "key-3", "key-4"]
+    assert found["key-4"].dtype == np.float32
+    assert cache.stats()["bytes"] == 3 * 384 * 4
+
+
+def test_cached_similarity_search_invalidated_by_writes(tmp_path):
+    """Test that repeated retrievals are cached until any process changes the collection"""
+    from langchain_chroma import Chroma
+
+    class LengthEmbeddings:
+        def embed_documents(self, texts):
+            return [[float(len(text)), 1.0] for text in texts]
+
+        def embed_query(self, text):
+            return [float(len(text)), 1.0]
+
+    def make_store():
+        # Built without __init__ so the test doesn't need the sentence-transformers model
+        store = VectorStore.__new__(VectorStore)
+        store.collection_name = "test_retrieval_cache"
+        store.embedding_model = LengthEmbeddings()
+        store.db = Chroma(
+            collection_name=store.collection_name,
+            embedding_function=store.embedding_model,
+            persist_directory=str(tmp_path / "retrieval_cache_db")
+        )
+        store._init_search_cache()
+        store.searches = 0
+        search = store.similarity_search
+
+        def counting_search(query, k=5):
+            store.searches += 1
+            return search(query, k=k)
+
+        store.similarity_search = counting_search
+        return store
+
+    vector_store = make_store()
+    vector_store.add_documents(["Existing guideline"])
+
+    first = vector_store.cached_similarity_search("underwriting guidelines", k=3)
+    second = vector_store.cached_similarity_search("underwriting guidelines", k=3)
+    assert first == second
+    assert vector_store.searches == 1
+
+    # A different k is a different retrieval
+    vector_store.cached_similarity_search("underwriting guidelines", k=1)
+    assert vector_store.searches == 2
+
+    vector_store.add_documents(["New guideline"])
+    refreshed = vector_store.cached_similarity_search("underwriting guidelines", k=3)
+    assert vector_store.searches == 3
+    assert len(refreshed) == 2
+
+    # Writes through another instance (another worker, a reseed) are seen too
+    other = make_store()
+    other.add_documents(["Guideline from another worker"])
+    assert len(vector_store.cached_similarity_search("underwriting guidelines", k=3)) == 3
+    assert vector_store.searches == 4
+    vector_store.cached_similarity_search("underwriting guidelines", k=3)
+    assert vector_store.searches == 4
+
+
+def test_similarity_search_batch_matches_single_queries(mock_vector_store):
+    """Test that batched search returns the same results as one query at a time"""
+    mock_vector_store.add_documents([
+        "Insurance policy for diabetes covers medication and regular check-ups",
+        "Health insurance for heart conditions requires additional premium",
+        "Travel insurance coverage for medical emergencies abroad"
+    ])
+    
+    queries = ["heart condition insurance", "diabetes medication coverage", "heart condition insurance"]
+    batch = mock_vector_store.similarity_search_batch(queries, k=2)
+    
+    assert len(batch) == len(queries)
+    for query, results in zip(queries, batch):
+        single = mock_vector_store.similarity_search(query, k=2)
+        assert [r["content"] for r in results] == [r["content"] for r in single]
+        assert [r["similarity"] for r in results] == pytest.approx([r["similarity"] for r in single], abs=1e-5)
+    
+    assert mock_vector_store.similarity_search_batch([], k=2) == []
+
+
+def test_similarity_search_batch_falls_back_without_collection_handle():
+    """Test per-query search when the Chroma wrapper has no collection handle"""
+    searched = []
+
+    class WrapperWithoutCollection:
+        # Mirrors langchain-chroma 1.x after delete_collection
+        _chroma_collection = None
+
+        @property
+        def _collection(self):
+            raise ValueError("Chroma collection not initialized. ")
+
+        def similarity_search_with_score(self, query, k):
+            searched.append(query)
+            from langchain_core.documents import Document
+            return [(Document(page_content=f"about {query}", metadata={}), 0.2)]
+
+    vector_store = VectorStore.__new__(VectorStore)
+    vector_store.db = WrapperWithoutCollection()
+
+    results = vector_store.similarity_search_batch(["diabetes", "asthma", "diabetes"], k=1)
+
+    assert [r[0]["content"] for r in results] == ["about diabetes", "about asthma", "about diabetes"]
+    assert searched == ["diabetes", "asthma"]
+
+
+def test_async_operations_run_off_the_event_loop(mock_vector_store):
+    """Test that the async variants return the same results without blocking the loop"""
+    import asyncio
+    import threading
+    
+    loop_thread = threading.get_ident()
+    worker_threads = set()
+    original_search = mock_vector_store.similarity_search
+    
+    def tracking_search(query, k=5):
+        worker_threads.add(threading.get_ident())
+        return original_search(query, k=k)
+    
+    mock_vector_store.similarity_search = tracking_search
+    
+    async def run():
+        await mock_vector_store.aadd_documents(
+            ["Health insurance for heart conditions requires additional premium"],
+            metadatas=[{"category": "health"}]
+        )
+        return await asyncio.gather(*[
+            mock_vector_store.asimilarity_search("heart condition insurance", k=1)
+            for _ in range(3)
+        ])
+    
+    results = asyncio.run(run())
+    
+    assert all(r[0]["content"] == results[0][0]["content"] for r in results)
+    assert "heart" in results[0][0]["content"].lower()
+    assert worker_threads and loop_thread not in worker_threads
+
+
+def test_get_vector_store_is_lazy_and_thread_safe(monkeypatch):
+    """Test that the singleton is only built on first use, once, across threads"""
+    import threading
+    import time
+    from app.database import vector_store as vector_store_module
+    
+    created = []
+    
+    class SlowVectorStore:
+        def __init__(self):
+            time.sleep(0.05)
+            created.append(self)
+            self.init_seconds = 0.05
+    
+    monkeypatch.setattr(vector_store_module, "VectorStore", SlowVectorStore)
+    monkeypatch.setattr(vector_store_module, "_vector_store", None)
+    assert vector_store_module.vector_store_status()["initialized"] is False
+    
+    stores = []
+    threads = [
+        threading.Thread(target=lambda: stores.append(vector_store_module.get_vector_store()))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert len(created) == 1
+    assert all(store is created[0] for store in stores)
+    assert vector_store_module.vector_store_status() == {"initialized": True, "init_seconds": 0.05}
+
+
+def test_import_does_not_load_embedding_model():
+    """Test that importing the module leaves the embedding model and Chroma unloaded"""
+    import os
+    import subprocess
+    import sys
+    
+    code = (
+        "import sys\n"
+        "import app.database.vector_store as module\n"
+        "assert module._vector_store is None\n"
+        "assert 'sentence_transformers' not in sys.modules\n"
+        "assert 'langchain_chroma' not in sys.modules\n"
+    )
+    subprocess.run(
+        [sys.executable, "-c", code], check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )